@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.metricas.MetricasMiddleware',
+    'app.instrumentacion.InstrumentacionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -92,6 +94,139 @@ DATABASES = {
 }
 
 
+# Caché de procesos (local-memory); las categorías se invalidan desde las vistas de admin
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "gamesranking",
+        # Por defecto 300: se quedaría corto con los fragmentos de plantilla (uno por juego y por ranking)
+        "OPTIONS": {"MAX_ENTRIES": 20000},
+    }
+}
+CATEGORIAS_CACHE_TTL = 300
+
+# Sesiones y usuario autenticado (app/sesiones.py); "python manage.py benchmark_sesiones" compara las opciones.
+# SESSION_ENGINE: "...backends.db" lee y escribe SQLite en cada petición con sesión; "...backends.cached_db" lee
+# de la caché y solo va a SQLite en un fallo o al escribir; "...backends.signed_cookies" no usa la BD (la sesión
+# viaja firmada en la cookie y no se puede revocar desde el servidor hasta que caduca)
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+# Las páginas de solo lectura no escriben la sesión: solo se guarda si cambia (login, logout) y los mensajes
+# van en su propia cookie en lugar de en la sesión
+SESSION_SAVE_EVERY_REQUEST = False
+MESSAGE_STORAGE = "django.contrib.messages.storage.cookie.CookieStorage"
+# Segundos que se reutiliza el Usuario de request.user entre peticiones (0 = leerlo de SQLite siempre)
+AUTHENTICATION_BACKENDS = ["app.sesiones.BackendUsuarioCacheado"]
+USUARIO_CACHE_TTL = 60
+
+# Índice de búsqueda en memoria (app/busqueda.py): se rehace al cambiar el catálogo o al expirar
+BUSQUEDA_TTL = 600
+
+# Instantánea en memoria de la colección games (app/catalogo.py). Se recarga cuando cambia su versión en la caché;
+# con LocMemCache cada proceso tiene la suya y este tope de segundos limita cuánto puede quedar desfasada.
+CATALOGO_TTL = 600
+
+# Métodos de consenso de /estadisticas/?metodo= (app/consenso.py). El resultado se guarda en caché hasta el
+# siguiente cambio en ranking o, como mucho, CONSENSO_CACHE_TTL segundos (lo mismo que el resto de instantáneas);
+# Schulze se limita a los mejores candidatos por Borda porque es O(n³).
+CONSENSO_PRIOR = 3
+CONSENSO_MAX_CANDIDATOS = 100
+CONSENSO_PL_ITERACIONES = 100
+CONSENSO_CACHE_TTL = 600
+
+# Rankings admitidos en una petición a /guardar_rankings/
+RANKINGS_LOTE_MAXIMO = 100
+
+# GET condicional (app/versiones.py): ver_juegos, estadisticas y obtener_valoracion responden 304 mientras no cambien
+# las colecciones de las que dependen. Con LocMemCache cada proceso lleva sus contadores, así que el ETag además
+# cambia cada ETAG_TTL segundos (0 = solo por versiones; usar con una caché compartida como Redis o Memcached)
+ETAG_TTL = 60
+
+# Segundos que se reutilizan los totales y últimas valoraciones de /supervision/ (los usuarios se paginan aparte)
+SUPERVISION_CACHE_TTL = 30
+
+# Fragmentos {% cache %} de las tarjetas de juego y de /mis_rankings/ (app/fragmentos.py). La clave lleva la
+# versión del catálogo o la de los rankings del usuario, así que el TTL solo limpia los que ya no se piden
+FRAGMENTOS_CACHE_TTL = 600
+
+# Segundos que se guarda cada página de /api/comentarios/; valorar_juego invalida las del juego al momento
+COMENTARIOS_CACHE_TTL = 60
+
+
+# Miniaturas de Games.ImagePath (app/miniaturas.py, necesita Pillow). Se generan en segundo plano al pedirlas por
+# primera vez y en bloque tras cargar_datos/sincronizar_api ("python manage.py generar_miniaturas" para todo el
+# catálogo). Solo se descargan por http(s) de MINIATURAS_HOSTS (o sus subdominios) y de direcciones públicas;
+# las imágenes de otros hosts se sirven como la original.
+# MINIATURAS_ORIGENES reescribe prefijos de URL antes de descargar, p. ej. hacia un servidor local de pruebas:
+# {"https://cf.geekdo-images.com": "http://localhost:8001"}
+MINIATURAS_DIR = BASE_DIR / "miniaturas"
+MINIATURAS_TAMANOS = {"mini": 150, "tarjeta": 320}
+MINIATURAS_HOSTS = ["picsum.photos", "cf.geekdo-images.com"]
+MINIATURAS_ORIGENES = {}
+MINIATURAS_TIMEOUT = 10
+MINIATURAS_MAX_BYTES = 10 * 1024 * 1024
+MINIATURAS_CONCURRENCIA = 8
+MINIATURAS_MAX_AGE = 31536000
+MINIATURAS_TRAS_IMPORTAR = True
+
+
+# Cálculo de /estadisticas/: "agregado" (tabla mantenida en escritura),
+# "pipeline" (agregaciones en MongoDB) o "escaneo" (recorrido en Python)
+ESTADISTICAS_BACKEND = "agregado"
+
+# Crea al arrancar los índices de app/indices.py que falten (idempotente).
+# Sin esto: "python manage.py crear_indices" o "check --database mongodb" para revisarlos
+MONGO_ASEGURAR_INDICES = False
+
+# Cola de tareas en proceso (app/tareas.py): importaciones CSV y sincronización API.
+# TAREAS_SINCRONAS ejecuta las tareas dentro de la petición (útil en tests)
+TAREAS_MAX_WORKERS = 2
+TAREAS_SINCRONAS = False
+TAREAS_DIR = None  # Directorio para los CSV pendientes; None usa el temporal del sistema
+# Al arrancar la cola se marcan como fallidas las tareas que quedaron pendientes o en curso: con 0, todas las
+# anteriores al arranque (un proceso); con varios procesos, las que llevan estos segundos sin avanzar
+TAREAS_ABANDONADAS_TRAS = 0
+
+# Sincronización con la API externa (app/sincronizacion.py); las claves omitidas usan CONFIG_POR_DEFECTO
+SINCRONIZACION_API = {
+    "url": "https://freetestapi.com/api/v1/games",
+    "tam_pagina": 50,
+    "concurrencia": 4,
+    "timeout": 10,
+}
+
+# Instrumentación por petición (app/instrumentacion.py): comandos de Mongo (ORM y PyMongo), SQL y tiempos.
+# PRESUPUESTO: comandos de Mongo por petición a partir de los que se registra un aviso (None = sin límite).
+# SERVER_TIMING expone los tiempos al navegador; mejor solo en desarrollo.
+# BYTES suma el tamaño de cada respuesta de Mongo volviendo a serializarla a BSON: solo para investigar, no en
+# mediciones de rendimiento.
+# La línea de cada petición va en DEBUG (subir app.instrumentacion a DEBUG en LOGGING para verla); los avisos
+# de presupuesto, en WARNING
+INSTRUMENTACION_ACTIVA = True
+INSTRUMENTACION_PRESUPUESTO = 20
+INSTRUMENTACION_BYTES = False
+INSTRUMENTACION_SERVER_TIMING = DEBUG
+
+# /metrics en formato Prometheus (app/metricas.py); solo responde a las IPs de METRICAS_IPS
+METRICAS_ACTIVAS = True
+METRICAS_IPS = ["127.0.0.1", "::1"]
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "consola": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "app": {"handlers": ["consola"], "level": "INFO"},
+    },
+}
+
+
+# Lecturas /api/async/ bajo ASGI: AsyncMongoClient compartido por proceso (PyMongo >= 4.9).
+# Con WSGI o MONGO_ASYNC = False esas vistas usan la versión síncrona
+MONGO_ASYNC = True
+MONGO_ASYNC_MAX_POOL = 100
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
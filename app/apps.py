@@ -1,5 +1,36 @@
+import logging
+
 from django.apps import AppConfig
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
 
 
 class AppConfig(AppConfig):
     name = 'app'
+
+    def ready(self):
+        from app import checks  # noqa: F401 registra los checks del proyecto
+        from app.sesiones import conectar_senales
+
+        conectar_senales()
+
+        if getattr(settings, "INSTRUMENTACION_ACTIVA", False):
+            from app.instrumentacion import registrar_monitor
+            registrar_monitor()
+        if getattr(settings, "METRICAS_ACTIVAS", False):
+            from app.metricas import registrar_monitor as registrar_monitor_metricas
+            registrar_monitor_metricas()
+
+        if getattr(settings, "MONGO_ASEGURAR_INDICES", False):
+            from django.db import connections
+            from app.indices import asegurar_indices
+
+            try:
+                for coleccion, nombre, error in asegurar_indices(connections["mongodb"].database):
+                    if error:
+                        logger.warning("No se pudo crear el índice %s.%s: %s", coleccion, nombre, error)
+                    else:
+                        logger.info("Índice creado: %s.%s", coleccion, nombre)
+            except Exception as e:
+                logger.warning("No se pudieron comprobar los índices de MongoDB: %s", e)
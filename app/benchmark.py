@@ -0,0 +1,665 @@
+import csv
+import json
+import logging
+import platform
+import random
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+import django
+from bson import ObjectId
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client
+from django.urls import get_resolver, reverse
+
+from app.busqueda import invalidar_indice
+from app.catalogo import invalidar_catalogo
+from app.estadisticas import BACKENDS as BACKENDS_ESTADISTICAS, reconstruir_agregado
+from app.importacion import _convertir_fila
+from app.indices import asegurar_indices
+from app.models import Tarea, Usuario
+
+MOTORES = ("mongomock", "inmemory", "uri")
+
+ESCALA_POR_DEFECTO = {"juegos": 500, "usuarios": 50, "rankings": 200, "valoraciones": 2000, "categorias": 10}
+
+# Métodos de colección que suponen una ida y vuelta al servidor (los cursores cuentan al crearse)
+OPERACIONES_MONGO = {
+    "find", "find_one", "aggregate", "count_documents", "estimated_document_count", "distinct",
+    "insert_one", "insert_many", "update_one", "update_many", "replace_one", "delete_one", "delete_many",
+    "find_one_and_update", "find_one_and_replace", "find_one_and_delete", "bulk_write",
+    "create_indexes", "index_information", "drop",
+}
+
+# Rutas que no se miden: dependen de la red o encolan trabajo en segundo plano
+EXCLUIDAS = {
+    "sincronizar_api": "encola una descarga de la API externa",
+    "miniatura": "encola la descarga de la imagen original de un servidor externo",
+    "archivo_miniatura": "sirve un fichero ya generado en MINIATURAS_DIR",
+}
+
+COMENTARIOS = ["", "", "Muy bueno", "Imprescindible", "No me convenció", "Para jugar en familia"]
+
+MARGEN_MS = 1.0  # por debajo de esta diferencia un p95 más alto se considera ruido
+
+
+class Contadores:
+    def __init__(self):
+        self.mongo = 0
+        self.sql = 0
+
+    def reiniciar(self):
+        self.mongo = 0
+        self.sql = 0
+
+
+class _ColeccionContada:
+    def __init__(self, coleccion, contadores):
+        self._coleccion = coleccion
+        self._contadores = contadores
+
+    def __getattr__(self, nombre):
+        valor = getattr(self._coleccion, nombre)
+        if nombre not in OPERACIONES_MONGO:
+            return valor
+
+        def contada(*args, **kwargs):
+            self._contadores.mongo += 1
+            return valor(*args, **kwargs)
+        return contada
+
+
+class _BaseContada:
+    # Envuelve la base de datos para que db.x y db["x"] devuelvan colecciones que cuentan operaciones
+    def __init__(self, db, contadores):
+        self._db = db
+        self._contadores = contadores
+        self._clase_coleccion = type(db["games"])
+
+    def __getitem__(self, nombre):
+        return _ColeccionContada(self._db[nombre], self._contadores)
+
+    def __getattr__(self, nombre):
+        valor = getattr(self._db, nombre)
+        if isinstance(valor, self._clase_coleccion):
+            return _ColeccionContada(valor, self._contadores)
+        if nombre == "command":
+            def contada(*args, **kwargs):
+                self._contadores.mongo += 1
+                return valor(*args, **kwargs)
+            return contada
+        return valor
+
+
+def crear_cliente_mongo(motor, uri=None):
+    # Devuelve (cliente, nombre de la base); los motores son dependencias opcionales de desarrollo
+    if motor == "mongomock":
+        try:
+            import mongomock
+        except ImportError:
+            raise ImportError("El motor 'mongomock' necesita el paquete mongomock (pip install mongomock).")
+        return mongomock.MongoClient(), "benchmark"
+    if motor == "inmemory":
+        try:
+            import pymongo_inmemory
+        except ImportError:
+            raise ImportError("El motor 'inmemory' necesita pymongo_inmemory (pip install pymongo_inmemory).")
+        return pymongo_inmemory.MongoClient(), "benchmark"
+    if motor == "uri":
+        if not uri:
+            raise ValueError("El motor 'uri' necesita --uri (p. ej. mongodb://localhost:27017).")
+        from pymongo import MongoClient
+        return MongoClient(uri), f"{settings.DATABASES['mongodb']['NAME']}_benchmark"
+    raise ValueError(f"Motor desconocido: {motor}")
+
+
+_CLAVES_CONEXION = ("connection", "database", "get_collection")
+
+
+@contextmanager
+def mongo_sustituto(cliente, nombre, contadores):
+    """
+    Sustituye la conexión 'mongodb' (consultas crudas y ORM) por el cliente local mientras dura el bloque.
+    Las conexiones son por hilo, así que también se sustituyen las que abran otros hilos (prueba de carga,
+    sync_to_async) para que ninguno llegue a conectar con el Mongo de settings.
+    """
+    cliente.drop_database(nombre)
+    db = _BaseContada(cliente[nombre], contadores)
+    sustituidas = []
+
+    def sustituir(conexion):
+        previos = {k: conexion.__dict__[k] for k in _CLAVES_CONEXION if k in conexion.__dict__}
+        conexion.connection = cliente
+        conexion.database = db
+        conexion.get_collection = lambda coleccion, **kwargs: db[coleccion]
+        sustituidas.append((conexion, previos))
+        return conexion
+
+    crear_original = connections.create_connection
+
+    def crear(alias):
+        conexion = crear_original(alias)
+        return sustituir(conexion) if alias == "mongodb" else conexion
+
+    sustituir(connections['mongodb'])
+    connections.create_connection = crear
+    cache.clear()
+    invalidar_indice()
+    invalidar_catalogo()
+    try:
+        yield db
+    finally:
+        del connections.create_connection
+        cliente.drop_database(nombre)
+        for conexion, previos in sustituidas:
+            for clave in _CLAVES_CONEXION:
+                conexion.__dict__.pop(clave, None)
+            conexion.__dict__.update(previos)
+        cache.clear()
+        invalidar_indice()
+        invalidar_catalogo()
+
+
+def _juegos_base():
+    with open(settings.BASE_DIR / "games_seed.csv", encoding="utf-8-sig", newline="") as f:
+        return [_convertir_fila(row) for row in csv.DictReader(f)]
+
+
+def sembrar(db, escala, semilla=0):
+    """
+    Genera datos sintéticos con la forma real de cada colección: games copia las filas de
+    games_seed.csv (renombradas a partir de la segunda vuelta), los usuarios van a la base
+    'default' y los rankings/valoraciones a Mongo. Devuelve los ids que usan los escenarios.
+    """
+    azar = random.Random(semilla)
+    base = _juegos_base()
+
+    juegos = []
+    for i in range(escala["juegos"]):
+        vuelta, fila = divmod(i, len(base))
+        juego = dict(base[fila])
+        if vuelta:
+            juego["BGGId"] += vuelta * 1_000_000
+            juego["Name"] = f"{juego['Name']} {vuelta + 1}"
+        juegos.append(juego)
+    if juegos:
+        db.games.insert_many(juegos)
+    ids_juegos = [j["BGGId"] for j in juegos]
+    por_id = {j["BGGId"]: j for j in juegos}
+
+    categorias = []
+    for k in range(escala["categorias"]):
+        lista = azar.sample(ids_juegos, min(len(ids_juegos), azar.randint(10, 30)))
+        categorias.append({"_id": ObjectId(), "nombre": f"Categoría {k + 1}", "lista_juegos": lista})
+    if categorias:
+        db.categoria.insert_many(categorias)
+
+    Usuario.objects.bulk_create([
+        Usuario(email=f"usuario{k}@benchmark.local", nombre=f"usuario{k}", rol="cliente")
+        for k in range(max(escala["usuarios"], 1))
+    ])
+    usuarios = list(Usuario.objects.filter(email__endswith="@benchmark.local").order_by("pk"))
+    admin = Usuario.objects.create_superuser("admin@benchmark.local", "admin")
+
+    # Un ranking por (usuario, categoría); el primer usuario tiene uno en cada categoría para mis_rankings
+    pares = [(usuarios[0], c) for c in categorias]
+    otros = [(u, c) for u in usuarios[1:] for c in categorias]
+    azar.shuffle(otros)
+    pares = (pares + otros)[:escala["rankings"]]
+    rankings = []
+    for usuario, categoria in pares:
+        elegidos = azar.sample(categoria["lista_juegos"], min(10, len(categoria["lista_juegos"])))
+        rankings.append({
+            "user": usuario.nombre,
+            "user_id": usuario.pk,
+            "category_id": categoria["_id"],
+            "category_name": categoria["nombre"],
+            "positions": {
+                str(pos): {"id": str(g), "name": por_id[g]["Name"], "image": por_id[g]["ImagePath"]}
+                for pos, g in enumerate(elegidos, start=1)
+            },
+        })
+    if rankings:
+        db.ranking.insert_many(rankings)
+
+    vistos = set()
+    valoraciones = []
+    intentos = 0
+    while ids_juegos and len(valoraciones) < escala["valoraciones"] and intentos < escala["valoraciones"] * 5:
+        intentos += 1
+        clave = (azar.choice(ids_juegos), azar.choice(usuarios).nombre)
+        if clave in vistos:
+            continue
+        vistos.add(clave)
+        valoraciones.append({
+            "game_id": clave[0], "usuario": clave[1],
+            "estrellas": azar.randint(1, 5), "comentario": azar.choice(COMENTARIOS),
+        })
+    if valoraciones:
+        db.valoraciones.insert_many(valoraciones)
+
+    reconstruir_agregado(db)
+    asegurar_indices(db)
+
+    tarea = Tarea.objects.create(tipo="importar_csv", estado=Tarea.COMPLETADA, usuario=admin.nombre)
+    return {
+        "usuario": usuarios[0],
+        "admin": admin,
+        "categoria_id": str(categorias[0]["_id"]) if categorias else str(ObjectId()),
+        "game_id": ids_juegos[0] if ids_juegos else 13,
+        "busqueda": base[0]["Name"][:3] if base else "cat",
+        "tarea_id": tarea.pk,
+    }
+
+
+def escenarios(datos):
+    # (nombre, ruta, método get/post/json, URL, cuerpo, rol); cada ruta de app/urls.py tiene al menos uno
+    idcat, game_id = datos["categoria_id"], datos["game_id"]
+    inexistente = str(ObjectId())
+    lista = [
+        ("inicio", "login", "get", reverse("login"), None, None),
+        ("login", "login", "get", "/login/", None, None),
+        ("register", "register", "get", reverse("register"), None, None),
+        ("logout", "logout", "get", reverse("logout"), None, "usuario"),
+        ("home", "home", "get", reverse("home"), None, "usuario"),
+        ("ranking", "ranking", "get", reverse("ranking"), None, "usuario"),
+        ("crear_tierlist", "crear_tierlist", "get", reverse("crear_tierlist"), None, "usuario"),
+        ("ver_juegos", "ver_juegos", "get", reverse("ver_juegos"), None, "usuario"),
+        ("ver_juegos_busqueda", "ver_juegos", "get",
+         f"{reverse('ver_juegos')}?nombre={datos['busqueda']}", None, "usuario"),
+        ("elegir_categoria", "elegir_categoria_ranking", "get", reverse("elegir_categoria_ranking"), None, "usuario"),
+        ("crear_ranking", "crear_ranking", "get", reverse("crear_ranking", args=[idcat]), None, "usuario"),
+        ("guardar_ranking", "guardar_ranking", "json", reverse("guardar_ranking"), {
+            "category_id": idcat, "category_name": "Categoría 1",
+            "ranking": {"1": {"id": str(game_id), "name": "", "image": ""}},
+        }, "usuario"),
+        # Un elemento válido y otro que falla la validación: se miden los dos caminos
+        ("guardar_rankings", "guardar_rankings", "json", reverse("guardar_rankings"), {"rankings": [
+            {"category_id": idcat, "category_name": "Categoría 1",
+             "ranking": {"1": {"id": str(game_id), "name": "", "image": ""}}},
+            {"category_id": "no-es-un-id", "ranking": {}},
+        ]}, "usuario"),
+        ("mis_rankings", "mis_rankings", "get", reverse("mis_rankings"), None, "usuario"),
+        ("eliminar_ranking", "eliminar_ranking", "post", reverse("eliminar_ranking", args=[inexistente]), {}, "usuario"),
+        ("valorar_juego", "valorar_juego", "json", reverse("valorar_juego"),
+         {"game_id": game_id, "estrellas": 4, "comentario": "Benchmark"}, "usuario"),
+        ("obtener_valoracion", "obtener_valoracion", "get",
+         reverse("obtener_valoracion", args=[game_id]), None, "usuario"),
+        ("comentarios", "obtener_comentarios_juego", "get",
+         reverse("obtener_comentarios_juego", args=[game_id]), None, "usuario"),
+        ("estadisticas", "ver_estadisticas", "get", reverse("ver_estadisticas"), None, "usuario"),
+        ("admin_view", "admin_view", "get", reverse("admin_view"), None, "admin"),
+        ("estado_tarea", "estado_tarea", "get", reverse("estado_tarea", args=[datos["tarea_id"]]), None, "admin"),
+        ("cargar_datos", "cargar_datos", "get", reverse("cargar_datos"), None, "admin"),
+        ("editar_categoria", "editar_categoria", "get", reverse("editar_categoria"), None, "admin"),
+        ("detalle_categoria", "detalle_categoria", "get", reverse("detalle_categoria", args=[idcat]), None, "admin"),
+        # Las rutas de borrado se miden con ids inexistentes para no alterar los datos entre repeticiones
+        ("eliminar_categoria", "eliminar_categoria", "post",
+         reverse("eliminar_categoria", args=[inexistente]), {}, "admin"),
+        ("eliminar_juego", "eliminar_juego", "post", reverse("eliminar_juego", args=[0]), {}, "admin"),
+        ("supervision", "supervision_admin", "get", reverse("supervision_admin"), None, "admin"),
+        ("metricas", "metricas", "get", reverse("metricas"), None, None),
+        # Con el cliente WSGI las vistas async usan su versión síncrona; la comparación ASGI está en prueba_carga
+        ("valoracion_async", "obtener_valoracion_async", "get",
+         reverse("obtener_valoracion_async", args=[game_id]), None, "usuario"),
+        ("comentarios_async", "obtener_comentarios_juego_async", "get",
+         reverse("obtener_comentarios_juego_async", args=[game_id]), None, "usuario"),
+        ("estadisticas_async", "estadisticas_async", "get", reverse("estadisticas_async"), None, "usuario"),
+        ("catalogo_async", "catalogo_async", "get", reverse("catalogo_async"), None, "usuario"),
+    ]
+    for backend in BACKENDS_ESTADISTICAS:
+        lista.append((f"estadisticas_{backend}", "ver_estadisticas", "get",
+                      f"{reverse('ver_estadisticas')}?backend={backend}", None, "admin"))
+    return lista
+
+
+def rutas_sin_escenario(lista):
+    cubiertas = {ruta for _, ruta, *_ in lista}
+    nombres = {p.name for p in get_resolver().url_patterns if getattr(p, "name", None)}
+    return sorted(nombres - cubiertas - set(EXCLUIDAS))
+
+
+def percentil(valores, p):
+    # Rango más cercano, como los p50/p95 de cualquier herramienta de carga
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = max(int(round(p / 100 * len(ordenados) + 0.5)) - 1, 0)
+    return ordenados[min(indice, len(ordenados) - 1)]
+
+
+def _peticion(cliente, metodo, url, cuerpo):
+    if metodo == "get":
+        return cliente.get(url)
+    if metodo == "json":
+        return cliente.post(url, data=json.dumps(cuerpo), content_type="application/json")
+    return cliente.post(url, data=cuerpo or {})
+
+
+def medir(cliente, metodo, url, cuerpo, contadores, repeticiones, calentamiento):
+    for _ in range(calentamiento):
+        _peticion(cliente, metodo, url, cuerpo)
+
+    tiempos, mongo, sql, estados = [], [], [], set()
+    for _ in range(repeticiones):
+        contadores.reiniciar()
+        inicio = time.perf_counter()
+        respuesta = _peticion(cliente, metodo, url, cuerpo)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        mongo.append(contadores.mongo)
+        sql.append(contadores.sql)
+        estados.add(respuesta.status_code)
+
+    # La memoria se mide en una pasada aparte: tracemalloc ralentiza y falsearía las latencias
+    tracemalloc.start()
+    try:
+        _peticion(cliente, metodo, url, cuerpo)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "estados": sorted(estados),
+        "p50_ms": round(percentil(tiempos, 50), 3),
+        "p95_ms": round(percentil(tiempos, 95), 3),
+        "max_ms": round(max(tiempos), 3),
+        "mongo": max(mongo),
+        "sql": max(sql),
+        "memoria_kib": round(pico / 1024, 1),
+    }
+
+
+@contextmanager
+def entorno(escala, motor="mongomock", uri=None, semilla=0):
+    """
+    Prepara una base 'default' de pruebas y un Mongo local sembrado con sembrar(); devuelve
+    (db, datos, contadores, cliente) y lo deshace todo al salir. La conexión de settings no se toca.
+    """
+    from django.test.utils import setup_databases, setup_test_environment, teardown_databases, \
+        teardown_test_environment
+
+    cliente_mongo, nombre = crear_cliente_mongo(motor, uri)
+    contadores = Contadores()
+
+    def contar_sql(execute, sql, params, many, context):
+        contadores.sql += 1
+        return execute(sql, params, many, context)
+
+    # Los errores y las mediciones ya van al informe; sin esto cada petición escribe su traza o línea en stderr
+    loggers = [logging.getLogger(n) for n in ("django.request", "app.instrumentacion")]
+    niveles_previos = [lg.level for lg in loggers]
+    for lg in loggers:
+        lg.setLevel(logging.CRITICAL)
+
+    setup_test_environment()
+    config_bd = setup_databases(verbosity=0, interactive=False, aliases={"default"})
+    try:
+        with mongo_sustituto(cliente_mongo, nombre, contadores) as db, \
+                connections["default"].execute_wrapper(contar_sql):
+            yield db, sembrar(db, escala, semilla), contadores, cliente_mongo
+    finally:
+        teardown_databases(config_bd, verbosity=0)
+        teardown_test_environment()
+        cliente_mongo.close()
+        for lg, nivel in zip(loggers, niveles_previos):
+            lg.setLevel(nivel)
+
+
+def _meta(motor, escala, semilla, **extra):
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "motor": motor,
+        "escala": escala,
+        "semilla": semilla,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        **extra,
+    }
+
+
+def ejecutar(escala=None, motor="mongomock", uri=None, repeticiones=20, calentamiento=2, semilla=0,
+             solo=None, progreso=None):
+    """
+    Siembra los datos en un Mongo local y una base 'default' de pruebas, recorre los escenarios con
+    el cliente de pruebas de Django y devuelve el informe (el mismo formato que se guarda como línea base).
+    """
+    escala = {**ESCALA_POR_DEFECTO, **(escala or {})}
+    with entorno(escala, motor, uri, semilla) as (db, datos, contadores, _):
+        clientes = {None: Client(), "usuario": Client(), "admin": Client()}
+        clientes["usuario"].force_login(datos["usuario"])
+        clientes["admin"].force_login(datos["admin"])
+
+        lista = escenarios(datos)
+        vistas = {}
+        for nombre_escenario, _, metodo, url, cuerpo, rol in lista:
+            if solo and nombre_escenario not in solo:
+                continue
+            try:
+                vistas[nombre_escenario] = medir(clientes[rol], metodo, url, cuerpo, contadores,
+                                                 repeticiones, calentamiento)
+            except Exception as e:
+                # DatabaseError envuelve el error del motor (p. ej. un operador que mongomock no implementa)
+                causa = e.__cause__ or e
+                vistas[nombre_escenario] = {"error": f"{type(causa).__name__}: {causa}"}
+            if progreso:
+                progreso(nombre_escenario, vistas[nombre_escenario])
+            # logout cierra la sesión del cliente; se vuelve a entrar para los siguientes escenarios
+            if rol:
+                clientes[rol].force_login(datos[rol])
+
+    return {
+        "meta": _meta(motor, escala, semilla, repeticiones=repeticiones, sin_escenario=rutas_sin_escenario(lista)),
+        "vistas": vistas,
+    }
+
+
+# --- Prueba de carga: las mismas rutas /api/async/ servidas por WSGI (hilos) y por ASGI (bucle de eventos) ---
+
+RUTAS_CARGA = {
+    "valoracion": lambda datos: reverse("obtener_valoracion_async", args=[datos["game_id"]]),
+    "comentarios": lambda datos: reverse("obtener_comentarios_juego_async", args=[datos["game_id"]]),
+    "estadisticas": lambda datos: reverse("estadisticas_async"),
+    "catalogo": lambda datos: reverse("catalogo_async"),
+}
+
+
+def _cliente_async(motor, cliente_mongo):
+    # Con mongomock no hay servidor al que conectar: las vistas async delegan en su versión síncrona
+    if motor == "mongomock":
+        return None
+    try:
+        from pymongo import AsyncMongoClient
+    except ImportError:
+        return None
+    host, puerto = cliente_mongo.address
+    return AsyncMongoClient(host, puerto)
+
+
+def _resumen(tiempos, duracion, estados, hilos):
+    return {
+        "peticiones": len(tiempos),
+        "rps": round(len(tiempos) / duracion, 1) if duracion else None,
+        "p50_ms": round(percentil(tiempos, 50), 3),
+        "p95_ms": round(percentil(tiempos, 95), 3),
+        "estados": sorted(estados),
+        "hilos_max": hilos,
+    }
+
+
+def _carga_wsgi(url, usuario, peticiones, concurrencia):
+    import queue
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Las sesiones se crean antes: varios hilos haciendo login a la vez bloquean la tabla de sesiones de SQLite
+    libres = queue.Queue()
+    for _ in range(concurrencia):
+        cliente = Client()
+        cliente.force_login(usuario)
+        libres.put(cliente)
+    tiempos, estados, hilos = [], set(), [threading.active_count()]
+
+    def una(_):
+        cliente = libres.get()
+        try:
+            inicio = time.perf_counter()
+            respuesta = cliente.get(url)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            estados.add(respuesta.status_code)
+            hilos.append(threading.active_count())
+        finally:
+            libres.put(cliente)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+        list(executor.map(una, range(peticiones)))
+    return _resumen(tiempos, time.perf_counter() - inicio, estados, max(hilos))
+
+
+def _carga_asgi(bucle, url, usuario, peticiones, concurrencia):
+    import asyncio
+    import threading
+    from django.test import AsyncClient
+
+    clientes = [AsyncClient() for _ in range(concurrencia)]
+    for cliente in clientes:
+        cliente.force_login(usuario)
+    tiempos, estados, hilos = [], set(), [threading.active_count()]
+
+    async def trabajador(cliente, cuota):
+        for _ in range(cuota):
+            inicio = time.perf_counter()
+            respuesta = await cliente.get(url)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            estados.add(respuesta.status_code)
+            hilos.append(threading.active_count())
+
+    async def principal():
+        cuotas = [peticiones // concurrencia + (1 if i < peticiones % concurrencia else 0) for i in range(concurrencia)]
+        await asyncio.gather(*(trabajador(c, n) for c, n in zip(clientes, cuotas)))
+
+    inicio = time.perf_counter()
+    bucle.run_until_complete(principal())
+    return _resumen(tiempos, time.perf_counter() - inicio, estados, max(hilos))
+
+
+def prueba_carga(escala=None, motor="mongomock", uri=None, peticiones=500, concurrencia=20, semilla=0,
+                 rutas=None, progreso=None):
+    """
+    Lanza `peticiones` GET con `concurrencia` simultáneas contra cada ruta /api/async/, primero por el
+    manejador WSGI (un hilo por petición en curso) y luego por el ASGI (AsyncMongoClient si el motor es un
+    mongod real). Devuelve {ruta: {"wsgi": resumen, "asgi": resumen}}.
+    """
+    import asyncio
+    from functools import partial
+
+    from app.mongo_async import restablecer, usar_cliente
+
+    escala = {**ESCALA_POR_DEFECTO, **(escala or {})}
+    resultados = {}
+    # Un único bucle para toda la parte ASGI, como un worker de uvicorn: el AsyncMongoClient queda ligado a él
+    bucle = asyncio.new_event_loop()
+    with entorno(escala, motor, uri, semilla) as (db, datos, _, cliente_mongo):
+        cliente_async = _cliente_async(motor, cliente_mongo)
+        usar_cliente(cliente_async, db.name)
+        try:
+            for nombre, ruta in RUTAS_CARGA.items():
+                if rutas and nombre not in rutas:
+                    continue
+                url = ruta(datos)
+                resultados[nombre] = {}
+                for modo, funcion in (("wsgi", _carga_wsgi), ("asgi", partial(_carga_asgi, bucle))):
+                    try:
+                        resultados[nombre][modo] = funcion(url, datos["usuario"], peticiones, concurrencia)
+                    except Exception as e:
+                        causa = e.__cause__ or e
+                        resultados[nombre][modo] = {"error": f"{type(causa).__name__}: {causa}"}
+                    if progreso:
+                        progreso(nombre, modo, resultados[nombre][modo])
+        finally:
+            restablecer()
+            if cliente_async is not None:
+                bucle.run_until_complete(cliente_async.close())
+            bucle.close()
+
+    return {
+        "meta": _meta(motor, escala, semilla, peticiones=peticiones, concurrencia=concurrencia,
+                      cliente_async=cliente_async is not None),
+        "rutas": resultados,
+    }
+
+
+# --- Sesiones: coste de autenticar cada petición según SESSION_ENGINE y USUARIO_CACHE_TTL ---
+
+MOTORES_SESION = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "firmada": "django.contrib.sessions.backends.signed_cookies",
+}
+
+# ranking_view solo pinta una plantilla: lo que se mide es casi todo sesión y usuario
+RUTAS_SESION = {
+    "ranking": lambda datos: reverse("ranking"),
+    "obtener_valoracion": lambda datos: reverse("obtener_valoracion", args=[datos["game_id"]]),
+}
+
+
+def prueba_sesiones(escala=None, motor="mongomock", uri=None, repeticiones=200, calentamiento=5, semilla=0,
+                    usuario_ttl=60, progreso=None):
+    """
+    Mide las rutas de RUTAS_SESION con cada motor de MOTORES_SESION, sin y con caché del Usuario
+    (USUARIO_CACHE_TTL = 0 y usuario_ttl). La primera combinación (db sin caché) es la configuración de partida.
+    Devuelve {"motor+cache": {ruta: resultado de medir()}}.
+    """
+    from django.test.utils import override_settings
+
+    escala = {**ESCALA_POR_DEFECTO, **(escala or {})}
+    resultados = {}
+    with entorno(escala, motor, uri, semilla) as (db, datos, contadores, _):
+        for nombre_motor, engine in MOTORES_SESION.items():
+            for ttl in (0, usuario_ttl):
+                combinacion = f"{nombre_motor}+{'usuario_cacheado' if ttl else 'usuario_sql'}"
+                resultados[combinacion] = {}
+                # Cliente nuevo por combinación: SessionMiddleware lee SESSION_ENGINE al construirse
+                with override_settings(SESSION_ENGINE=engine, USUARIO_CACHE_TTL=ttl):
+                    cache.clear()
+                    cliente = Client()
+                    cliente.force_login(datos["usuario"])
+                    for nombre, ruta in RUTAS_SESION.items():
+                        try:
+                            resultado = medir(cliente, "get", ruta(datos), None, contadores,
+                                              repeticiones, calentamiento)
+                        except Exception as e:
+                            causa = e.__cause__ or e
+                            resultado = {"error": f"{type(causa).__name__}: {causa}"}
+                        resultados[combinacion][nombre] = resultado
+                        if progreso:
+                            progreso(combinacion, nombre, resultado)
+
+    return {
+        "meta": _meta(motor, escala, semilla, repeticiones=repeticiones, usuario_ttl=usuario_ttl),
+        "combinaciones": resultados,
+    }
+
+
+def comparar(actual, base, tolerancia=0.2):
+    # Devuelve [(vista, motivo)] con las regresiones respecto a la línea base
+    regresiones = []
+    for vista, datos in actual["vistas"].items():
+        previo = base.get("vistas", {}).get(vista)
+        if not previo or "error" in previo:
+            continue
+        if "error" in datos:
+            regresiones.append((vista, f"ahora falla: {datos['error']}"))
+            continue
+        for campo in ("mongo", "sql"):
+            if datos[campo] > previo[campo]:
+                regresiones.append((vista, f"{campo}: {previo[campo]} -> {datos[campo]} operaciones"))
+        limite = previo["p95_ms"] * (1 + tolerancia)
+        if datos["p95_ms"] > limite and datos["p95_ms"] - previo["p95_ms"] > MARGEN_MS:
+            regresiones.append((vista, f"p95: {previo['p95_ms']} -> {datos['p95_ms']} ms"))
+    return regresiones
@@ -0,0 +1,124 @@
+import bisect
+import re
+import threading
+import time
+import unicodedata
+
+from django.conf import settings
+
+from app.catalogo import obtener_catalogo
+from app.metricas import registrar_cache
+
+PESO_NOMBRE = 3.0
+PESO_DESCRIPCION = 1.0
+FACTOR_PREFIJO = 0.7
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def normalizar(texto):
+    # Minúsculas y sin acentos, para que "catán" encuentre "Catan"
+    texto = unicodedata.normalize("NFKD", texto or "").lower()
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def tokenizar(texto):
+    return _TOKEN.findall(normalizar(texto))
+
+
+class IndiceJuegos:
+    """
+    Índice invertido en memoria sobre Name y Description de la colección games.
+    Admite prefijos (búsqueda binaria sobre los términos ordenados) y, si no hay coincidencias
+    por palabra, cae a una búsqueda por subcadena en los nombres como hacía Name__icontains.
+    """
+
+    def __init__(self, juegos):
+        self.terminos = {}  # término -> {BGGId: peso}
+        self.nombres = {}   # BGGId -> nombre normalizado
+        for bgg_id, nombre, descripcion in juegos:
+            self.nombres[bgg_id] = normalizar(nombre)
+            for token in tokenizar(nombre):
+                self._agregar(token, bgg_id, PESO_NOMBRE)
+            for token in set(tokenizar(descripcion)):
+                self._agregar(token, bgg_id, PESO_DESCRIPCION)
+        self.ordenados = sorted(self.terminos)
+        self.creado = time.monotonic()
+
+    def _agregar(self, token, bgg_id, peso):
+        pesos = self.terminos.setdefault(token, {})
+        pesos[bgg_id] = max(pesos.get(bgg_id, 0.0), peso)
+
+    def _puntuar_token(self, token):
+        puntos = dict(self.terminos.get(token, {}))
+        for i in range(bisect.bisect_right(self.ordenados, token), len(self.ordenados)):
+            termino = self.ordenados[i]
+            if not termino.startswith(token):
+                break
+            for bgg_id, peso in self.terminos[termino].items():
+                puntos[bgg_id] = max(puntos.get(bgg_id, 0.0), peso * FACTOR_PREFIJO)
+        return puntos
+
+    def buscar(self, consulta):
+        # Devuelve los BGGId ordenados por relevancia; todas las palabras deben aparecer
+        tokens = tokenizar(consulta)
+        if not tokens:
+            return []
+
+        puntos = None
+        for token in tokens:
+            del_token = self._puntuar_token(token)
+            if puntos is None:
+                puntos = del_token
+            else:
+                puntos = {g: p + del_token[g] for g, p in puntos.items() if g in del_token}
+            if not puntos:
+                break
+
+        if not puntos:
+            subcadena = normalizar(consulta).strip()
+            puntos = {g: PESO_NOMBRE for g, nombre in self.nombres.items() if subcadena in nombre}
+
+        return sorted(puntos, key=lambda g: (-puntos[g], self.nombres.get(g, ""), g))
+
+
+_indice = None
+_lock = threading.Lock()
+
+
+def _cargar_juegos(catalogo):
+    for juego in catalogo.ordenados:
+        yield juego.BGGId, juego.Name, juego.Description or ""
+
+
+def reconstruir_indice(catalogo=None):
+    global _indice
+    catalogo = catalogo or obtener_catalogo()
+    nuevo = IndiceJuegos(_cargar_juegos(catalogo))
+    nuevo.catalogo = catalogo
+    with _lock:
+        _indice = nuevo
+    return nuevo
+
+
+def obtener_indice():
+    # Se construye al primer uso desde la instantánea del catálogo y se rehace cuando esta cambia
+    # (invalidar_catalogo) o tras BUSQUEDA_TTL segundos
+    indice = _indice
+    catalogo = obtener_catalogo()
+    ttl = getattr(settings, "BUSQUEDA_TTL", 600)
+    vigente = indice is not None and indice.catalogo is catalogo and time.monotonic() - indice.creado <= ttl
+    registrar_cache("busqueda", vigente)
+    if not vigente:
+        indice = reconstruir_indice(catalogo)
+    return indice
+
+
+def invalidar_indice():
+    global _indice
+    with _lock:
+        _indice = None
+
+
+def buscar_juegos(consulta):
+    return obtener_indice().buscar(consulta)
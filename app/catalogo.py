@@ -0,0 +1,147 @@
+import bisect
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from app.metricas import registrar_cache
+from app.versiones import incrementar_version, version as version_coleccion
+
+# Instantánea de solo lectura de la colección games en cada proceso. La versión es la de games en app.versiones:
+# cargar_datos, sincronizar_api y eliminar_juego_completo la incrementan y cada proceso recarga al verla cambiar.
+
+CAMPOS = ("BGGId", "Name", "Description", "YearPublished", "GameWeight", "AvgRating",
+          "MinPlayers", "MaxPlayers", "ImagePath")
+
+
+class JuegoCatalogo:
+    # Lo que usan las plantillas de un Games, sin el coste de una instancia del ORM
+    __slots__ = CAMPOS
+
+    def __init__(self, doc):
+        for campo in CAMPOS:
+            setattr(self, campo, doc.get(campo))
+        self.Name = self.Name or ""
+
+    def __str__(self):
+        return f"{self.Name} - ({self.YearPublished})"
+
+
+def _entero(valor):
+    if valor is None or valor == "":
+        return None
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+class Catalogo:
+    """
+    Juegos ordenados por (Name, BGGId), que es el orden de los listados, con índices por BGGId,
+    por año y por número de jugadores. Los filtros devuelven BGGId en ese mismo orden.
+    """
+
+    def __init__(self, docs, version):
+        self.version = version
+        self.creado = time.monotonic()
+        self.ordenados = sorted((JuegoCatalogo(doc) for doc in docs), key=lambda j: (j.Name, j.BGGId or 0))
+        self.claves = [(j.Name, j.BGGId or 0) for j in self.ordenados]
+
+        self.posicion = {}  # BGGId -> posición en ordenados (el primero si hay repetidos)
+        self.por_year = {}  # año -> [posición]
+        for i, juego in enumerate(self.ordenados):
+            self.posicion.setdefault(juego.BGGId, i)
+            self.por_year.setdefault(juego.YearPublished, []).append(i)
+
+        # (valor, posición) ordenados: un rango de jugadores es un corte con bisect
+        por_min = sorted((j.MinPlayers or 0, i) for i, j in enumerate(self.ordenados))
+        por_max = sorted((j.MaxPlayers or 0, i) for i, j in enumerate(self.ordenados))
+        self.min_valores = [v for v, _ in por_min]
+        self.min_posiciones = [i for _, i in por_min]
+        self.max_valores = [v for v, _ in por_max]
+        self.max_posiciones = [i for _, i in por_max]
+
+    def __len__(self):
+        return len(self.ordenados)
+
+    def juego(self, bgg_id):
+        posicion = self.posicion.get(bgg_id)
+        return None if posicion is None else self.ordenados[posicion]
+
+    def juegos(self, ids):
+        return [self.ordenados[self.posicion[g]] for g in ids if g in self.posicion]
+
+    def filtrar(self, year=None, min_players=None, max_players=None, ids=None, excluir=()):
+        # Mismos filtros que hacían las vistas con el ORM; un valor que no es un entero se ignora
+        posiciones = None
+
+        def acotar(conjunto):
+            return conjunto if posiciones is None else posiciones & conjunto
+
+        if ids is not None:
+            posiciones = acotar({self.posicion[g] for g in ids if g in self.posicion})
+        year, min_players, max_players = _entero(year), _entero(min_players), _entero(max_players)
+        if year is not None:
+            posiciones = acotar(set(self.por_year.get(year, ())))
+        if min_players is not None:
+            posiciones = acotar(set(self.min_posiciones[bisect.bisect_left(self.min_valores, min_players):]))
+        if max_players is not None:
+            posiciones = acotar(set(self.max_posiciones[:bisect.bisect_right(self.max_valores, max_players)]))
+
+        if posiciones is None:
+            seleccion = range(len(self.ordenados))
+        else:
+            seleccion = sorted(posiciones)
+        excluir = set(excluir)
+        return [self.ordenados[i].BGGId for i in seleccion if self.ordenados[i].BGGId not in excluir]
+
+    def siguientes(self, nombre, bgg_id, limite):
+        # Keyset en memoria: los 'limite' juegos posteriores a (nombre, bgg_id), o los primeros sin cursor
+        inicio = 0 if nombre is None else bisect.bisect_right(self.claves, (nombre, bgg_id))
+        return self.ordenados[inicio:inicio + limite]
+
+
+_catalogo = None
+_lock = threading.Lock()
+
+
+def _cargar_juegos():
+    db = connections['mongodb'].database
+    return db.games.find({}, {"_id": 0, **{campo: 1 for campo in CAMPOS}})
+
+
+def _ttl():
+    # Tope de antigüedad por si la versión se pierde de la caché (p. ej. LocMemCache con varios procesos)
+    return getattr(settings, "CATALOGO_TTL", 600)
+
+
+def obtener_catalogo():
+    catalogo = _catalogo
+    version = version_coleccion("games")
+    vigente = (catalogo is not None and catalogo.version == version
+               and time.monotonic() - catalogo.creado <= _ttl())
+    registrar_cache("catalogo", vigente)
+    if vigente:
+        return catalogo
+    return _recargar(version)
+
+
+def _recargar(version):
+    global _catalogo
+    # Con el lock, las peticiones que llegan a la vez esperan a una sola carga en lugar de repetirla
+    with _lock:
+        catalogo = _catalogo
+        if catalogo is not None and catalogo.version == version and time.monotonic() - catalogo.creado <= _ttl():
+            return catalogo
+        _catalogo = Catalogo(_cargar_juegos(), version)
+        return _catalogo
+
+
+def invalidar_catalogo():
+    # Llamar tras cualquier escritura en games; también descarta la instantánea de este proceso
+    global _catalogo
+    incrementar_version("games")
+    with _lock:
+        _catalogo = None
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from app.metricas import registrar_cache
+from app.versiones import incrementar_version
+
+CLAVE_CACHE = "categorias:todas"
+
+
+def _ttl():
+    return getattr(settings, "CATEGORIAS_CACHE_TTL", 300)
+
+
+def _cargar_categorias():
+    db = connections['mongodb'].database
+    return [{
+        "id": str(doc["_id"]),
+        "pk": str(doc["_id"]),
+        "nombre": doc.get("nombre"),
+        "lista_juegos": doc.get("lista_juegos") or [],
+    } for doc in db.categoria.find({}, {"nombre": 1, "lista_juegos": 1})]
+
+
+def obtener_categorias():
+    # Catálogo de categorías desde la caché; solo va a Mongo tras una invalidación o al expirar el TTL
+    categorias = cache.get(CLAVE_CACHE)
+    registrar_cache("categorias", categorias is not None)
+    if categorias is None:
+        categorias = _cargar_categorias()
+        cache.set(CLAVE_CACHE, categorias, _ttl())
+    return categorias
+
+
+def obtener_categoria(idcat):
+    for categoria in obtener_categorias():
+        if categoria["id"] == str(idcat):
+            return categoria
+    return None
+
+
+def categorias_con_juegos():
+    return [c for c in obtener_categorias() if c["lista_juegos"]]
+
+
+def invalidar_categorias():
+    # Llamar desde toda vista que modifique la colección categoria
+    cache.delete(CLAVE_CACHE)
+    incrementar_version("categoria")
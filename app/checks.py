@@ -0,0 +1,20 @@
+from django.core.checks import Tags, Warning, register
+from django.db import connections
+
+
+@register(Tags.database)
+def comprobar_indices_mongo(app_configs, databases=None, **kwargs):
+    # Solo se ejecuta con "check --database mongodb" (o migrate), nunca en cada arranque
+    if not databases or "mongodb" not in databases:
+        return []
+
+    from app.indices import indices_faltantes
+
+    return [
+        Warning(
+            f"Falta el índice {coleccion}.{modelo.document['name']} en MongoDB.",
+            hint="Ejecute 'python manage.py crear_indices'.",
+            id="app.W001",
+        )
+        for coleccion, modelo in indices_faltantes(connections["mongodb"].database)
+    ]
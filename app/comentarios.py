@@ -0,0 +1,145 @@
+import base64
+import hashlib
+import json
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.conf import settings
+from django.core.cache import cache
+
+from app.metricas import registrar_cache
+
+# Orden de cada listado; el _id desempata y hace de "recientes" (se asigna al crear la valoración)
+ORDENES = {
+    "recientes": [("_id", -1)],
+    "estrellas": [("estrellas", -1), ("_id", -1)],
+}
+ORDEN_POR_DEFECTO = "recientes"
+LIMITE_POR_DEFECTO = 20
+LIMITE_MAXIMO = 50
+
+PROYECCION = {"usuario": 1, "comentario": 1, "estrellas": 1}
+
+
+def _ttl():
+    return getattr(settings, "COMENTARIOS_CACHE_TTL", 60)
+
+
+def parametros(get):
+    # Normaliza ?orden=&limite=&cursor=; los valores inválidos caen en los de por defecto
+    orden = get.get("orden", ORDEN_POR_DEFECTO)
+    if orden not in ORDENES:
+        orden = ORDEN_POR_DEFECTO
+    try:
+        limite = min(max(int(get.get("limite", LIMITE_POR_DEFECTO)), 1), LIMITE_MAXIMO)
+    except (TypeError, ValueError):
+        limite = LIMITE_POR_DEFECTO
+    return orden, limite, get.get("cursor") or ""
+
+
+def codificar_cursor(orden, doc):
+    datos = {"o": orden, "id": str(doc["_id"])}
+    if orden == "estrellas":
+        datos["e"] = doc.get("estrellas")
+    texto = json.dumps(datos, separators=(",", ":"))
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor, orden):
+    # Un cursor ilegible o de otro orden equivale a la primera página
+    if not cursor:
+        return None
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+        if datos.get("o") != orden:
+            return None
+        # "e" va tal cual al filtro: solo un número, nunca un objeto que Mongo leería como operador ({"$ne": null})
+        estrellas = datos.get("e")
+        if orden == "estrellas" and (isinstance(estrellas, bool) or not isinstance(estrellas, (int, float))):
+            return None
+        datos["id"] = ObjectId(datos["id"])
+        return datos
+    except (ValueError, KeyError, TypeError, InvalidId):
+        return None
+
+
+def filtro(game_id, orden, datos_cursor):
+    consulta = {"game_id": game_id, "comentario": {"$ne": ""}}
+    if datos_cursor:
+        if orden == "estrellas":
+            consulta["$or"] = [
+                {"estrellas": {"$lt": datos_cursor["e"]}},
+                {"estrellas": datos_cursor["e"], "_id": {"$lt": datos_cursor["id"]}},
+            ]
+        else:
+            consulta["_id"] = {"$lt": datos_cursor["id"]}
+    return consulta
+
+
+def construir_pagina(docs, orden, limite):
+    # docs trae limite + 1 documentos como mucho: el sobrante solo indica que hay página siguiente
+    siguiente = codificar_cursor(orden, docs[limite - 1]) if len(docs) > limite else None
+    cuerpo = json.dumps({
+        "comentarios": [{
+            "usuario": doc.get("usuario", "Anónimo"),
+            "comentario": doc.get("comentario", ""),
+            "estrellas": doc.get("estrellas", 0)
+        } for doc in docs[:limite]],
+        "orden": orden,
+        "siguiente": siguiente,
+    }, ensure_ascii=False)
+    return cuerpo, '"%s"' % hashlib.md5(cuerpo.encode()).hexdigest()
+
+
+def _clave_version(game_id):
+    return f"comentarios:version:{game_id}"
+
+
+def _clave_pagina(game_id, version, orden, limite, cursor):
+    return f"comentarios:{game_id}:{version}:{orden}:{limite}:{cursor}"
+
+
+def version_comentarios(game_id):
+    return cache.get(_clave_version(game_id), 0)
+
+
+def invalidar_comentarios(game_id):
+    # Cambiar la versión deja huérfanas todas las páginas cacheadas del juego (caducan solas por TTL)
+    clave = _clave_version(game_id)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, 1, None)
+
+
+def pagina_comentarios(db, game_id, get):
+    """
+    Devuelve (cuerpo JSON, ETag) de una página de comentarios del juego. Las páginas se guardan en caché
+    COMENTARIOS_CACHE_TTL segundos bajo la versión del juego, que valorar_juego incrementa.
+    """
+    orden, limite, cursor = parametros(get)
+    clave = _clave_pagina(game_id, version_comentarios(game_id), orden, limite, cursor)
+    pagina = cache.get(clave)
+    registrar_cache("comentarios", pagina is not None)
+    if pagina is None:
+        docs = list(db.valoraciones.find(
+            filtro(game_id, orden, decodificar_cursor(cursor, orden)), PROYECCION
+        ).sort(ORDENES[orden]).limit(limite + 1))
+        pagina = construir_pagina(docs, orden, limite)
+        cache.set(clave, pagina, _ttl())
+    return pagina
+
+
+async def pagina_comentarios_async(db, game_id, get):
+    # La misma página con una base de AsyncMongoClient y la API asíncrona de la caché
+    orden, limite, cursor = parametros(get)
+    clave = _clave_pagina(game_id, await cache.aget(_clave_version(game_id), 0), orden, limite, cursor)
+    pagina = await cache.aget(clave)
+    registrar_cache("comentarios", pagina is not None)
+    if pagina is None:
+        docs = await db.valoraciones.find(
+            filtro(game_id, orden, decodificar_cursor(cursor, orden)), PROYECCION
+        ).sort(ORDENES[orden]).limit(limite + 1).to_list(None)
+        pagina = construir_pagina(docs, orden, limite)
+        await cache.aset(clave, pagina, _ttl())
+    return pagina
@@ -0,0 +1,234 @@
+import math
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.conf import settings
+from django.core.cache import cache
+
+from app.consultas import resolver_juegos
+from app.metricas import registrar_cache
+from app.versiones import incrementar_version, version
+
+# Métodos de consenso sobre la colección ranking. Cada ranking se trata como una lista ordenada de juegos
+# (el mejor primero) y cada método devuelve {g_id: puntuación}; salvo la media, más alto es mejor.
+# La caché va por la versión de ranking en app.versiones, que sube con cada cambio (ver aplicar_deltas_ranking).
+
+
+def _parametro(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def listas_de_ranking(positions):
+    # [(puesto, g_id, game_data)] válidos de un documento en orden de puesto, sin repetidos; mismas reglas que
+    # contribuciones_ranking. El puesto es la clave guardada, que puede tener huecos
+    puestos = []
+    for pos_str, game_data in (positions or {}).items():
+        if not game_data or not isinstance(game_data, dict) or game_data.get("id") is None:
+            continue
+        try:
+            puestos.append((int(pos_str), str(game_data["id"]), game_data))
+        except (TypeError, ValueError):
+            continue
+    puestos.sort(key=lambda p: p[0])
+    vistos = set()
+    lista = []
+    for puesto in puestos:
+        if puesto[1] not in vistos:
+            vistos.add(puesto[1])
+            lista.append(puesto)
+    return lista
+
+
+def cargar_rankings(db, category_id=None):
+    # Devuelve ([[g_id, ...], ...], [[puesto, ...], ...], {g_id: (nombre, imagen)}) de todos los rankings
+    # o de una categoría; cada lista de puestos va en paralelo a su lista de g_id
+    filtro = {}
+    if category_id:
+        try:
+            filtro["category_id"] = {"$in": [ObjectId(category_id), category_id]}
+        except (InvalidId, TypeError):
+            filtro["category_id"] = category_id
+    listas, puestos, nombres = [], [], {}
+    for doc in db.ranking.find(filtro, {"_id": 0, "positions": 1}):
+        lista = listas_de_ranking(doc.get("positions"))
+        for _, g_id, game_data in lista:
+            nombres.setdefault(g_id, (game_data.get("name", "Sin nombre"), game_data.get("image", "")))
+        if lista:
+            listas.append([g_id for _, g_id, _ in lista])
+            puestos.append([puesto for puesto, _, _ in lista])
+    return listas, puestos, nombres
+
+
+def _apariciones(listas):
+    conteo = {}
+    for lista in listas:
+        for g_id in lista:
+            conteo[g_id] = conteo.get(g_id, 0) + 1
+    return conteo
+
+
+def media(listas, puestos=None):
+    # La media posicional de siempre (más bajo es mejor), con el puesto guardado en el ranking como en
+    # media_posicion; sin puestos, el orden en la lista
+    suma, conteo = {}, {}
+    for i, lista in enumerate(listas):
+        posiciones = puestos[i] if puestos is not None else range(1, len(lista) + 1)
+        for posicion, g_id in zip(posiciones, lista):
+            suma[g_id] = suma.get(g_id, 0) + posicion
+            conteo[g_id] = conteo.get(g_id, 0) + 1
+    return {g_id: suma[g_id] / conteo[g_id] for g_id in suma}
+
+
+def borda(listas):
+    # Borda normalizada: en una lista de k juegos el puesto p vale (k - p + 1) / k, así que listas largas
+    # no pesan más que las cortas; la puntuación es la suma sobre todos los rankings
+    puntos = {}
+    for lista in listas:
+        k = len(lista)
+        for posicion, g_id in enumerate(lista, start=1):
+            puntos[g_id] = puntos.get(g_id, 0.0) + (k - posicion + 1) / k
+    return puntos
+
+
+def bayesiana(listas):
+    """
+    Posición relativa media ((p - 1) / (k - 1): 0 el primero, 1 el último) con un prior de CONSENSO_PRIOR
+    apariciones en la media global, para que un juego con una sola aparición no encabece la tabla.
+    Se devuelve 1 - media, de modo que más alto es mejor.
+    """
+    m = _parametro("CONSENSO_PRIOR", 3)
+    suma, conteo = {}, {}
+    for lista in listas:
+        k = len(lista)
+        for posicion, g_id in enumerate(lista, start=1):
+            suma[g_id] = suma.get(g_id, 0.0) + ((posicion - 1) / (k - 1) if k > 1 else 0.5)
+            conteo[g_id] = conteo.get(g_id, 0) + 1
+    total = sum(conteo.values())
+    global_ = sum(suma.values()) / total if total else 0.5
+    return {g_id: 1 - (suma[g_id] + m * global_) / (conteo[g_id] + m) for g_id in suma}
+
+
+def preferencias(listas, candidatos):
+    # Matriz dispersa {(a, b): usuarios que ponen a por encima de b}; solo pares que comparten ranking
+    d = {}
+    for lista in listas:
+        lista = [g for g in lista if g in candidatos]
+        for i, a in enumerate(lista):
+            for b in lista[i + 1:]:
+                d[(a, b)] = d.get((a, b), 0) + 1
+    return d
+
+
+def schulze(listas):
+    """
+    Método de Schulze (aproxima el consenso de Kemeny) sobre los CONSENSO_MAX_CANDIDATOS mejores por Borda:
+    el camino más fuerte es O(n³), así que se acota n. La puntuación es el número de duelos ganados;
+    el resto de juegos no aparece.
+    """
+    maximo = _parametro("CONSENSO_MAX_CANDIDATOS", 100)
+    por_borda = borda(listas)
+    candidatos = sorted(por_borda, key=lambda g: (-por_borda[g], g))[:maximo]
+    indice = {g: i for i, g in enumerate(candidatos)}
+    n = len(candidatos)
+    d = preferencias(listas, indice)
+
+    p = [[0] * n for _ in range(n)]
+    for (a, b), votos in d.items():
+        if votos > d.get((b, a), 0):
+            p[indice[a]][indice[b]] = votos
+    for k in range(n):
+        fila_k = p[k]
+        for i in range(n):
+            p_ik = p[i][k]
+            if i == k or not p_ik:
+                continue
+            fila_i = p[i]
+            for j in range(n):
+                if j != i and j != k:
+                    via = p_ik if p_ik < fila_k[j] else fila_k[j]
+                    if via > fila_i[j]:
+                        fila_i[j] = via
+
+    # Desempate por Borda (fracción menor que un duelo)
+    return {
+        g: sum(1 for j in range(n) if p[i][j] > p[j][i]) + por_borda[g] / (len(listas) + 1)
+        for g, i in indice.items()
+    }
+
+
+def plackett_luce(listas):
+    """
+    Ajuste de Plackett-Luce por el algoritmo MM de Hunter con un prior Gamma(2, 1), que mantiene finitas
+    las fuerzas de los juegos que nunca ganan. Cada iteración es lineal en el número de puestos:
+    las sumas de 1/S_j (S_j = fuerza de los que quedan en la etapa j) se acumulan por prefijos.
+    """
+    iteraciones = _parametro("CONSENSO_PL_ITERACIONES", 100)
+    tolerancia = 1e-6
+    victorias = {}
+    for lista in listas:
+        for g_id in lista[:-1]:  # la última etapa no es una elección
+            victorias[g_id] = victorias.get(g_id, 0) + 1
+        victorias.setdefault(lista[-1], 0)
+    fuerza = {g_id: 1.0 for g_id in victorias}
+
+    for _ in range(iteraciones):
+        denominador = dict.fromkeys(fuerza, 0.0)
+        for lista in listas:
+            restante = [0.0] * len(lista)
+            acumulado = 0.0
+            for j in range(len(lista) - 1, -1, -1):
+                acumulado += fuerza[lista[j]]
+                restante[j] = acumulado
+            prefijo = 0.0
+            for j, g_id in enumerate(lista):
+                if j < len(lista) - 1:
+                    prefijo += 1 / restante[j]
+                denominador[g_id] += prefijo
+        nueva = {g_id: (victorias[g_id] + 1) / (denominador[g_id] + 1) for g_id in fuerza}
+        cambio = max((abs(math.log(nueva[g] / fuerza[g])) for g in fuerza), default=0)
+        fuerza = nueva
+        if cambio < tolerancia:
+            break
+    return fuerza
+
+
+# nombre -> (etiqueta, función, más bajo es mejor)
+METODOS = {
+    "media": ("Media posicional", media, True),
+    "borda": ("Borda normalizada", borda, False),
+    "bayesiana": ("Media bayesiana con prior", bayesiana, False),
+    "schulze": ("Schulze (Condorcet)", schulze, False),
+    "plackett_luce": ("Plackett-Luce", plackett_luce, False),
+}
+
+
+def invalidar_consenso():
+    incrementar_version("ranking")
+
+
+def calcular_consenso(db, metodo, category_id=None):
+    # Lista para la plantilla [{nombre, imagen, apariciones, puntuacion}], en caché hasta el próximo cambio en ranking
+    clave = f"consenso:{version('ranking')}:{metodo}:{category_id or 'global'}"
+    resultado = cache.get(clave)
+    registrar_cache("consenso", resultado is not None)
+    if resultado is not None:
+        return resultado
+
+    listas, puestos, nombres = cargar_rankings(db, category_id)
+    _, funcion, ascendente = METODOS[metodo]
+    # Solo la media usa el valor del puesto; el resto, el orden
+    puntuaciones = funcion(listas, puestos) if funcion is media else funcion(listas)
+    apariciones = _apariciones(listas)
+    juegos = resolver_juegos(puntuaciones)
+    resultado = []
+    for g_id, puntuacion in puntuaciones.items():
+        juego = juegos.get(int(g_id)) if g_id.isdigit() else None
+        nombre, imagen = (juego.Name, juego.ImagePath) if juego else nombres.get(g_id, ("Sin nombre", ""))
+        resultado.append({
+            "nombre": nombre or "Sin nombre", "imagen": imagen or "",
+            "apariciones": apariciones.get(g_id, 0), "puntuacion": round(puntuacion, 3),
+        })
+    signo = 1 if ascendente else -1
+    resultado.sort(key=lambda x: (signo * x["puntuacion"], -x["apariciones"], x["nombre"]))
+    cache.set(clave, resultado, _parametro("CONSENSO_CACHE_TTL", 600))
+    return resultado
@@ -0,0 +1,38 @@
+from app.catalogo import obtener_catalogo
+from app.categorias import obtener_categorias
+
+
+def normalizar_game_id(game_id):
+    # Los rankings guardan el id como texto ("13") y la colección games como entero
+    try:
+        return int(game_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def game_id_de_posicion(pos_data):
+    if not pos_data or pos_data == "null":
+        return None
+    return pos_data.get('id') if isinstance(pos_data, dict) else pos_data
+
+
+def resolver_juegos(game_ids):
+    # Sale de la instantánea del catálogo en memoria, sin consultas; devuelve {BGGId: JuegoCatalogo}
+    ids = {normalizar_game_id(g) for g in game_ids}
+    ids.discard(None)
+    if not ids:
+        return {}
+    return {juego.BGGId: juego for juego in obtener_catalogo().juegos(ids)}
+
+
+def resolver_categorias(nombres):
+    # Sale de la caché de categorías; devuelve {nombre: id en texto}
+    nombres = {n for n in nombres if n}
+    if not nombres:
+        return {}
+
+    resultado = {}
+    for cat in obtener_categorias():
+        if cat["nombre"] in nombres:
+            resultado.setdefault(cat["nombre"], cat["id"])
+    return resultado
@@ -0,0 +1,567 @@
+import asyncio
+import importlib.util
+
+from django.conf import settings
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.consenso import invalidar_consenso
+from app.consultas import resolver_juegos
+from app.versiones import incrementar_version
+
+# Colección materializada con un documento por juego (ver reconstruir_agregado)
+COLECCION_AGREGADO = "ranking_global"
+
+# Histograma de estrellas: votos_1 ... votos_5
+CAMPOS_HISTOGRAMA = tuple(f"votos_{n}" for n in range(1, 6))
+
+CAMPOS_AGREGADO = ("suma_posiciones", "apariciones", "suma_estrellas", "num_votos") + CAMPOS_HISTOGRAMA
+
+# Comentarios más recientes con 4 o más estrellas que se guardan en cada documento (los más nuevos primero)
+MAX_COMENTARIOS_TOP = 5
+
+
+def contribuciones_ranking(positions):
+    # Devuelve {game_id: (suma_posiciones, apariciones, nombre, imagen)} para un documento de ranking
+    contribuciones = {}
+    for pos_str, game_data in (positions or {}).items():
+        if not game_data or not isinstance(game_data, dict):
+            continue
+        if game_data.get("id") is None:
+            continue
+        try:
+            posicion = int(pos_str)
+        except (TypeError, ValueError):
+            continue
+        g_id = str(game_data.get("id"))
+        suma, apariciones, _, _ = contribuciones.get(g_id, (0, 0, None, None))
+        contribuciones[g_id] = (
+            suma + posicion, apariciones + 1,
+            game_data.get("name", "Sin nombre"), game_data.get("image", "")
+        )
+    return contribuciones
+
+
+def _actualizacion_agregado(incrementos, datos=None):
+    # Pipeline de actualización: suma los deltas y recalcula las medias en la misma operación atómica
+    suma = {
+        campo: {"$add": [{"$ifNull": [f"${campo}", 0]}, valor]}
+        for campo, valor in incrementos.items()
+    }
+    suma.update(datos or {})
+    return [
+        {"$set": suma},
+        {"$set": {
+            "media_posicion": {"$cond": [
+                {"$gt": [{"$ifNull": ["$apariciones", 0]}, 0]},
+                {"$divide": ["$suma_posiciones", "$apariciones"]},
+                None
+            ]},
+            "media_estrellas": {"$cond": [
+                {"$gt": [{"$ifNull": ["$num_votos", 0]}, 0]},
+                {"$divide": ["$suma_estrellas", "$num_votos"]},
+                None
+            ]},
+        }},
+    ]
+
+
+def aplicar_delta_ranking(db, positions_anteriores, positions_nuevas):
+    aplicar_deltas_ranking(db, [(positions_anteriores, positions_nuevas)])
+
+
+def aplicar_deltas_ranking(db, cambios):
+    # cambios: [(positions_anteriores, positions_nuevas)]; los deltas se suman por juego y van en un solo bulk_write
+    invalidar_consenso()
+    deltas = {}  # g_id -> [suma_posiciones, apariciones, nombre, imagen]
+    for positions_anteriores, positions_nuevas in cambios:
+        for g_id, (suma, apariciones, _, _) in contribuciones_ranking(positions_anteriores).items():
+            delta = deltas.setdefault(g_id, [0, 0, None, None])
+            delta[0] -= suma
+            delta[1] -= apariciones
+        for g_id, (suma, apariciones, nombre, imagen) in contribuciones_ranking(positions_nuevas).items():
+            delta = deltas.setdefault(g_id, [0, 0, None, None])
+            delta[0] += suma
+            delta[1] += apariciones
+            delta[2], delta[3] = nombre, imagen
+
+    operaciones = []
+    for g_id, (suma, apariciones, nombre, imagen) in deltas.items():
+        if suma == 0 and apariciones == 0:
+            continue
+        # nombre e imagen vienen del cliente: en $literal para que un "$..." o un {"$op": ...} no se evalúen
+        datos = {"nombre": {"$literal": nombre}, "imagen": {"$literal": imagen}} if nombre is not None else None
+        operaciones.append(UpdateOne(
+            {"_id": g_id},
+            _actualizacion_agregado({"suma_posiciones": suma, "apariciones": apariciones}, datos),
+            upsert=True
+        ))
+
+    if operaciones:
+        db[COLECCION_AGREGADO].bulk_write(operaciones, ordered=False)
+
+
+def _estrellas(valor):
+    # Como en escanear_totales: un valor que no es un número no cuenta como voto
+    try:
+        return float(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _campo_histograma(estrellas):
+    # Las estrellas fuera de 1-5 o no enteras suman en la media pero no en el histograma
+    estrellas = _estrellas(estrellas)
+    if estrellas is not None and estrellas.is_integer() and 1 <= estrellas <= 5:
+        return f"votos_{int(estrellas)}"
+    return None
+
+
+def es_comentario_top(estrellas, comentario):
+    # El mismo criterio que usan las estadísticas por pipeline: 4 o más estrellas y texto
+    try:
+        return float(estrellas) >= 4 and bool(comentario)
+    except (TypeError, ValueError):
+        return False
+
+
+def _comentarios_top(usuario, estrellas, comentario):
+    # Quita la entrada anterior del usuario y, si la nueva valoración es top, la pone la primera.
+    # Los valores del usuario van en $literal para que un "$..." no se lea como ruta de campo.
+    lista = {"$filter": {
+        "input": {"$ifNull": ["$comentarios_top", []]},
+        "cond": {"$ne": ["$$this.usuario", {"$literal": usuario}]},
+    }}
+    if es_comentario_top(estrellas, comentario):
+        nuevo = {"usuario": usuario, "comentario": comentario, "estrellas": estrellas}
+        lista = {"$concatArrays": [{"$literal": [nuevo]}, lista]}
+    return {"$slice": [lista, MAX_COMENTARIOS_TOP]}
+
+
+def aplicar_delta_valoracion(db, game_id, estrellas_anteriores, estrellas_nuevas, usuario=None, comentario=""):
+    # estrellas_anteriores es None cuando la valoración no existía. Se interpretan como en escanear_totales:
+    # unas estrellas guardadas que no son un número no se contaron y no se restan
+    anteriores = _estrellas(estrellas_anteriores) if estrellas_anteriores is not None else None
+    nuevas = _estrellas(estrellas_nuevas)
+    incrementos = {"suma_estrellas": (nuevas or 0.0) - (anteriores or 0.0)}
+    num_votos = (nuevas is not None) - (anteriores is not None)
+    if num_votos:
+        incrementos["num_votos"] = num_votos
+    campo_anterior = _campo_histograma(anteriores)
+    campo_nuevo = _campo_histograma(nuevas)
+    if campo_anterior != campo_nuevo:
+        if campo_anterior:
+            incrementos[campo_anterior] = -1
+        if campo_nuevo:
+            incrementos[campo_nuevo] = 1
+    datos = {"comentarios_top": _comentarios_top(usuario, estrellas_nuevas, comentario)} if usuario else None
+    db[COLECCION_AGREGADO].update_one(
+        {"_id": str(game_id)},
+        _actualizacion_agregado(incrementos, datos),
+        upsert=True
+    )
+
+
+def guardar_ranking_con_delta(db, filtro, actualizacion):
+    anterior = db.ranking.find_one_and_update(
+        filtro, actualizacion, upsert=True, return_document=ReturnDocument.BEFORE
+    )
+    positions_anteriores = anterior.get("positions", {}) if anterior else {}
+    aplicar_delta_ranking(db, positions_anteriores, actualizacion["$set"].get("positions", {}))
+    return anterior
+
+
+def guardar_rankings_con_delta(db, user_id, rankings):
+    """
+    Guarda varios rankings de un usuario: rankings es [(category_id, campos de $set)] sin categorías repetidas.
+    Lee los anteriores en una consulta, escribe todos con un bulk_write(ordered=False) y aplica al agregado
+    el delta de los que se han escrito. Devuelve [(creado, error o None)] en el mismo orden.
+    A diferencia de guardar_ranking_con_delta la lectura previa no es atómica con la escritura; si dos lotes
+    del mismo usuario se cruzan, reconstruir_ranking_global corrige el agregado.
+    """
+    if not rankings:
+        return []
+    anteriores = {
+        doc["category_id"]: doc.get("positions", {})
+        for doc in db.ranking.find(
+            {"user_id": user_id, "category_id": {"$in": [cat for cat, _ in rankings]}},
+            {"category_id": 1, "positions": 1}
+        )
+    }
+    escrituras = [
+        UpdateOne({"user_id": user_id, "category_id": cat}, {"$set": campos}, upsert=True)
+        for cat, campos in rankings
+    ]
+    try:
+        resultado = db.ranking.bulk_write(escrituras, ordered=False)
+        creados, errores = set(resultado.upserted_ids), {}
+    except BulkWriteError as e:
+        creados = {item["index"] for item in e.details.get("upserted", [])}
+        errores = {item["index"]: item.get("errmsg", "Error de escritura") for item in e.details.get("writeErrors", [])}
+
+    aplicar_deltas_ranking(db, [
+        (anteriores.get(cat, {}), campos.get("positions", {}))
+        for i, (cat, campos) in enumerate(rankings) if i not in errores
+    ])
+    return [(i in creados, errores.get(i)) for i in range(len(rankings))]
+
+
+def eliminar_ranking_con_delta(db, filtro):
+    eliminado = db.ranking.find_one_and_delete(filtro)
+    if eliminado:
+        aplicar_delta_ranking(db, eliminado.get("positions", {}), {})
+    return eliminado
+
+
+def valorar_con_delta(db, filtro, actualizacion):
+    anterior = db.valoraciones.find_one_and_update(
+        filtro, actualizacion, upsert=True, return_document=ReturnDocument.BEFORE
+    )
+    estrellas_anteriores = anterior.get("estrellas", 0) if anterior else None
+    aplicar_delta_valoracion(
+        db, filtro["game_id"], estrellas_anteriores, actualizacion["$set"]["estrellas"],
+        usuario=filtro["usuario"], comentario=actualizacion["$set"].get("comentario", "")
+    )
+    incrementar_version("valoraciones")
+    return anterior
+
+
+def escanear_totales(db):
+    # Recorre ranking y valoraciones completos; es la fuente de verdad para reconstruir y comprobar
+    totales = {}
+
+    def entrada(g_id):
+        return totales.setdefault(g_id, {
+            "suma_posiciones": 0, "apariciones": 0,
+            "suma_estrellas": 0.0, "num_votos": 0,
+            **{campo: 0 for campo in CAMPOS_HISTOGRAMA},
+            "comentarios_top": [],
+            "nombre": None, "imagen": None
+        })
+
+    for doc in db.ranking.find({}, {"positions": 1}):
+        for g_id, (suma, apariciones, nombre, imagen) in contribuciones_ranking(doc.get("positions")).items():
+            info = entrada(g_id)
+            info["suma_posiciones"] += suma
+            info["apariciones"] += apariciones
+            if info["nombre"] is None:
+                info["nombre"], info["imagen"] = nombre, imagen
+
+    # Del más nuevo al más antiguo, para quedarse con los últimos comentarios top de cada juego
+    proyeccion = {"game_id": 1, "estrellas": 1, "usuario": 1, "comentario": 1}
+    for voto in db.valoraciones.find({}, proyeccion).sort("_id", -1):
+        estrellas = _estrellas(voto.get("estrellas", 0))
+        if estrellas is None:
+            continue
+        info = entrada(str(voto.get("game_id")))
+        info["suma_estrellas"] += estrellas
+        info["num_votos"] += 1
+        campo = _campo_histograma(estrellas)
+        if campo:
+            info[campo] += 1
+        if len(info["comentarios_top"]) < MAX_COMENTARIOS_TOP and es_comentario_top(estrellas, voto.get("comentario")):
+            info["comentarios_top"].append({
+                "usuario": voto.get("usuario"), "comentario": voto["comentario"], "estrellas": voto.get("estrellas")
+            })
+
+    return totales
+
+
+def reconstruir_agregado(db):
+    totales = escanear_totales(db)
+    operaciones = [
+        UpdateOne({"_id": g_id}, _actualizacion_agregado({}, {
+            **{campo: info[campo] for campo in CAMPOS_AGREGADO},
+            "comentarios_top": {"$literal": info["comentarios_top"]},
+            "nombre": {"$literal": info["nombre"]}, "imagen": {"$literal": info["imagen"]}
+        }), upsert=True)
+        for g_id, info in totales.items()
+    ]
+    coleccion = db[COLECCION_AGREGADO]
+    if operaciones:
+        coleccion.bulk_write(operaciones, ordered=False)
+    coleccion.delete_many({"_id": {"$nin": list(totales)}})
+    return len(totales)
+
+
+def comprobar_agregado(db):
+    # Devuelve la lista de discrepancias (g_id, campo, escaneo, agregado)
+    totales = escanear_totales(db)
+    agregado = {doc["_id"]: doc for doc in db[COLECCION_AGREGADO].find()}
+    diferencias = []
+    for g_id in sorted(set(totales) | set(agregado)):
+        esperado = totales.get(g_id, {})
+        actual = agregado.get(g_id, {})
+        for campo in CAMPOS_AGREGADO:
+            valor_esperado = esperado.get(campo, 0)
+            valor_actual = actual.get(campo, 0) or 0
+            if abs(valor_esperado - valor_actual) > 1e-9:
+                diferencias.append((g_id, campo, valor_esperado, valor_actual))
+    return diferencias
+
+
+def _formatear_ranking_global(filas):
+    lista = [{
+        "nombre": info.get("nombre") or "Sin nombre", "imagen": info.get("imagen") or "",
+        "apariciones": info["apariciones"],
+        "media_posicion": round(info["suma_posiciones"] / info["apariciones"], 2)
+    } for info in filas if info.get("apariciones", 0) > 0]
+    return sorted(lista, key=lambda x: (x['media_posicion'], -x['apariciones'], x['nombre']))
+
+
+def _formatear_votos(filas, juegos, comentarios):
+    # juegos: {g_id: (nombre, imagen)}; comentarios: {g_id: [comentario, ...]}
+    lista = []
+    for info in filas:
+        if not info.get("num_votos"):
+            continue
+        g_id = info["_id"]
+        media = round(info["suma_estrellas"] / info["num_votos"], 1)
+        if media >= 4.0:
+            nombre, imagen = juegos.get(g_id, (f"Juego {g_id}", ""))
+            lista.append({
+                "nombre": nombre,
+                "imagen": imagen,
+                "media_usuarios": media,
+                "total_votos": info["num_votos"],
+                "comentarios": comentarios.get(g_id, [])[:2]  # Cogemos máximo 2 comentarios top
+            })
+    return sorted(lista, key=lambda x: (-x['media_usuarios'], x['nombre']))
+
+
+def _formatear_categorias(filas):
+    # filas: [{"nombre", "suma", "volumen"}] para cada categoría con juegos
+    promedios = [{
+        "nombre": fila["nombre"],
+        "promedio": round(fila["suma"] / fila["volumen"], 1) if fila["volumen"] > 0 else 0,
+        "volumen": fila["volumen"]
+    } for fila in filas]
+    return sorted(promedios, key=lambda x: (-x['promedio'], x['nombre'] or ""))
+
+
+def _id_juego(g_id):
+    return int(g_id) if g_id.isdigit() else g_id
+
+
+def _candidatos(filas):
+    # Ids (como en games) de los juegos con media >= 4, los únicos que necesitan nombre y comentarios
+    return [
+        _id_juego(doc["_id"]) for doc in filas
+        if doc.get("num_votos") and round(doc["suma_estrellas"] / doc["num_votos"], 1) >= 4.0
+    ]
+
+
+FILTRO_CATEGORIAS = {"lista_juegos.0": {"$exists": True}}
+
+
+def _filas_categoria(categorias, filas):
+    totales_por_juego = {doc["_id"]: doc for doc in filas}
+    filas_categoria = []
+    for cat in categorias:
+        totales = [totales_por_juego.get(str(g_id), {}) for g_id in cat["lista_juegos"]]
+        filas_categoria.append({
+            "nombre": cat.get("nombre"),
+            "suma": sum(info.get("suma_estrellas", 0) for info in totales),
+            "volumen": sum(info.get("num_votos", 0) for info in totales),
+        })
+    return filas_categoria
+
+
+def _componer(filas, juegos, categorias, total_valoraciones):
+    # Los comentarios top ya vienen en cada fila del agregado; no hace falta leer valoraciones
+    comentarios = {
+        doc["_id"]: [c["comentario"] for c in doc.get("comentarios_top") or []] for doc in filas
+    }
+    return {
+        'ranking_global': _formatear_ranking_global(filas),
+        'juegos_votos': _formatear_votos(filas, juegos, comentarios),
+        'total_valoraciones': total_valoraciones,
+        'promedios_categoria': _formatear_categorias(_filas_categoria(categorias, filas))
+    }
+
+
+def _estadisticas(db, filas):
+    ids = _candidatos(filas)
+    juegos = {}
+    if ids:
+        juegos = {
+            str(bgg_id): (juego.Name, juego.ImagePath)
+            for bgg_id, juego in resolver_juegos(ids).items()
+        }
+
+    categorias = db.categoria.find(FILTRO_CATEGORIAS, {"nombre": 1, "lista_juegos": 1})
+    return _componer(filas, juegos, categorias, db.valoraciones.estimated_document_count())
+
+
+def estadisticas_desde_agregado(db):
+    # Lee la tabla materializada (ya ordenada por media_posicion) en lugar de escanear ranking y valoraciones
+    filas = list(db[COLECCION_AGREGADO].find().sort([("media_posicion", 1), ("apariciones", -1)]))
+    return _estadisticas(db, filas)
+
+
+async def estadisticas_desde_agregado_async(db):
+    # Igual que estadisticas_desde_agregado con una base de AsyncMongoClient; las lecturas independientes van a la vez
+    filas = await db[COLECCION_AGREGADO].find().sort([("media_posicion", 1), ("apariciones", -1)]).to_list(None)
+    ids = _candidatos(filas)
+
+    async def juegos():
+        if not ids:
+            return {}
+        resultado = {}
+        cursor = db.games.find({"BGGId": {"$in": ids}}, {"_id": 0, "BGGId": 1, "Name": 1, "ImagePath": 1})
+        for doc in await cursor.to_list(None):
+            resultado.setdefault(str(doc["BGGId"]), (doc.get("Name"), doc.get("ImagePath")))
+        return resultado
+
+    juegos, categorias, total = await asyncio.gather(
+        juegos(),
+        db.categoria.find(FILTRO_CATEGORIAS, {"nombre": 1, "lista_juegos": 1}).to_list(None),
+        db.valoraciones.estimated_document_count(),
+    )
+    return _componer(filas, juegos, categorias, total)
+
+
+def resumen_valoraciones(db, game_ids):
+    # {game_id: {"media", "votos", "histograma"}} leyendo solo el agregado por _id; los juegos sin votos no aparecen
+    if not game_ids:
+        return {}
+    proyeccion = {"suma_estrellas": 1, "num_votos": 1, **{campo: 1 for campo in CAMPOS_HISTOGRAMA}}
+    resumen = {}
+    for doc in db[COLECCION_AGREGADO].find({"_id": {"$in": [str(g) for g in game_ids]}}, proyeccion):
+        if not doc.get("num_votos"):
+            continue
+        resumen[_id_juego(doc["_id"])] = {
+            "media": round(doc["suma_estrellas"] / doc["num_votos"], 1),
+            "votos": doc["num_votos"],
+            "histograma": [doc.get(campo, 0) for campo in CAMPOS_HISTOGRAMA],
+        }
+    return resumen
+
+
+def estadisticas_por_escaneo(db):
+    filas = [{"_id": g_id, **info} for g_id, info in escanear_totales(db).items()]
+    return _estadisticas(db, filas)
+
+
+# --- Modo pipeline: los tres cálculos se ejecutan como agregaciones en MongoDB ---
+
+PIPELINE_POSICIONES = [
+    {"$project": {"posicion": {"$objectToArray": {"$ifNull": ["$positions", {}]}}}},
+    {"$unwind": "$posicion"},
+    {"$match": {"posicion.v": {"$type": "object"}, "posicion.v.id": {"$ne": None}}},
+    {"$project": {
+        "g_id": {"$toString": "$posicion.v.id"},
+        "puesto": {"$convert": {"input": "$posicion.k", "to": "int", "onError": None, "onNull": None}},
+        "nombre": {"$ifNull": ["$posicion.v.name", "Sin nombre"]},
+        "imagen": {"$ifNull": ["$posicion.v.image", ""]},
+    }},
+    {"$match": {"puesto": {"$ne": None}}},
+    {"$group": {
+        "_id": "$g_id",
+        "suma_posiciones": {"$sum": "$puesto"},
+        "apariciones": {"$sum": 1},
+        "nombre": {"$first": "$nombre"},
+        "imagen": {"$first": "$imagen"},
+    }},
+]
+
+# Igual que el escaneo: sin campo estrellas cuenta como 0 y lo que no se puede convertir a número (null incluido)
+# no cuenta
+ESTRELLAS_VALIDAS = [
+    {"$addFields": {"_estrellas": {"$convert": {
+        "input": {"$cond": [{"$eq": [{"$type": "$estrellas"}, "missing"]}, 0, "$estrellas"]},
+        "to": "double", "onError": None, "onNull": None,
+    }}}},
+    {"$match": {"_estrellas": {"$ne": None}}},
+]
+
+# Agrupa por el id como texto, igual que el escaneo: los votos de un juego con game_id 10 y "10" se suman.
+# Del más nuevo al más antiguo para que $push deje primero los últimos comentarios top
+PIPELINE_VOTOS = ESTRELLAS_VALIDAS + [
+    {"$sort": {"_id": -1}},
+    {"$group": {
+        "_id": {"$toString": "$game_id"},
+        "suma_estrellas": {"$sum": "$_estrellas"},
+        "num_votos": {"$sum": 1},
+        "comentarios": {"$push": {"$cond": [
+            {"$and": [{"$gte": ["$_estrellas", 4.0]}, {"$gt": ["$comentario", ""]}]},
+            "$comentario",
+            None
+        ]}},
+    }},
+    {"$addFields": {"comentarios": {"$slice": [
+        {"$filter": {"input": "$comentarios", "cond": {"$ne": ["$$this", None]}}}, 2
+    ]}}},
+]
+
+# Los votos de cada categoría se cruzan por el id como texto en los dos lados, igual que en el escaneo: una
+# categoría con 10 cuenta los votos guardados con game_id "10". Esa comparación no usa el índice de game_id,
+# así que es una lectura de valoraciones por categoría (este backend es para comparar, no el de por defecto).
+# Los votos se agrupan por juego y se reparten después por lista_juegos para que un juego repetido cuente dos veces
+PIPELINE_CATEGORIAS = [
+    {"$match": {"lista_juegos.0": {"$exists": True}}},
+    {"$set": {"lista_juegos": {"$map": {"input": "$lista_juegos", "in": {"$toString": "$$this"}}}}},
+    {"$lookup": {
+        "from": "valoraciones", "let": {"juegos": "$lista_juegos"}, "as": "votos",
+        "pipeline": [
+            {"$match": {"$expr": {"$in": [{"$toString": "$game_id"}, "$$juegos"]}}},
+        ] + ESTRELLAS_VALIDAS + [
+            {"$group": {"_id": {"$toString": "$game_id"}, "suma": {"$sum": "$_estrellas"}, "volumen": {"$sum": 1}}},
+        ],
+    }},
+    {"$unwind": "$lista_juegos"},
+    {"$set": {"votos": {"$first": {"$filter": {"input": "$votos", "cond": {"$eq": ["$$this._id", "$lista_juegos"]}}}}}},
+    {"$group": {
+        "_id": "$_id",
+        "nombre": {"$first": "$nombre"},
+        "suma": {"$sum": {"$ifNull": ["$votos.suma", 0]}},
+        "volumen": {"$sum": {"$ifNull": ["$votos.volumen", 0]}},
+    }},
+]
+
+
+def estadisticas_por_pipeline(db):
+    filas = {doc["_id"]: doc for doc in db.ranking.aggregate(PIPELINE_POSICIONES)}
+
+    comentarios = {}
+    for doc in db.valoraciones.aggregate(PIPELINE_VOTOS):
+        fila = filas.setdefault(doc["_id"], {"_id": doc["_id"]})
+        fila["suma_estrellas"] = doc["suma_estrellas"]
+        fila["num_votos"] = doc["num_votos"]
+        comentarios[doc["_id"]] = doc["comentarios"]
+
+    # Con el _id como texto ya no se puede cruzar con games.BGGId en un $lookup: los nombres de los candidatos
+    # se resuelven igual que en el escaneo
+    filas = list(filas.values())
+    ids = _candidatos(filas)
+    juegos = {
+        str(bgg_id): (juego.Name, juego.ImagePath) for bgg_id, juego in resolver_juegos(ids).items()
+    } if ids else {}
+    return {
+        'ranking_global': _formatear_ranking_global(filas),
+        'juegos_votos': _formatear_votos(filas, juegos, comentarios),
+        'total_valoraciones': db.valoraciones.estimated_document_count(),
+        'promedios_categoria': _formatear_categorias(db.categoria.aggregate(PIPELINE_CATEGORIAS))
+    }
+
+
+def estadisticas_vectorizadas(db):
+    # numpy es opcional: el backend solo se ofrece si está instalado
+    from app.estadisticas_numpy import estadisticas_numpy
+    return estadisticas_numpy(db)
+
+
+BACKENDS = {
+    "agregado": estadisticas_desde_agregado,
+    "escaneo": estadisticas_por_escaneo,
+    "pipeline": estadisticas_por_pipeline,
+}
+if importlib.util.find_spec("numpy") is not None:
+    BACKENDS["numpy"] = estadisticas_vectorizadas
+
+
+def calcular_estadisticas(db, backend=None):
+    backend = backend or getattr(settings, "ESTADISTICAS_BACKEND", "agregado")
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend de estadísticas desconocido: {backend}")
+    return BACKENDS[backend](db)
@@ -0,0 +1,198 @@
+import time
+
+import numpy as np
+
+from app.consultas import resolver_juegos
+from app.estadisticas import (CAMPOS_HISTOGRAMA, FILTRO_CATEGORIAS, _formatear_categorias, _formatear_ranking_global,
+                              _formatear_votos, es_comentario_top)
+
+# Motor vectorizado: posiciones y votos se cargan en arrays paralelos (índice de juego, valor) y todas las
+# sumas, medias e histogramas salen de np.bincount. Necesita numpy, que es opcional (pip install numpy).
+
+TAM_LOTE = 10000
+PUESTOS_MATRIZ = 10  # columnas de la matriz juego x puesto
+COMENTARIOS_POR_JUEGO = 2  # los que muestra la página de estadísticas
+
+
+class Matrices:
+    """
+    ids: id de cada índice de juego, como texto igual que en el escaneo ("13" y 13 son el mismo juego), e indices
+    la inversa {id: índice}. pos_juego/pos_puesto: una entrada por puesto de cada ranking. voto_juego/voto_estrellas:
+    una entrada por valoración. nombres: {id: (nombre, imagen)} de los rankings. comentarios: {id: [texto]} con
+    los últimos comentarios top. categorias: [(nombre, índices de sus juegos)].
+    """
+
+    def __init__(self, indices, pos_juego, pos_puesto, voto_juego, voto_estrellas, nombres, comentarios, categorias,
+                 segundos):
+        self.ids = list(indices)
+        self.indices = indices
+        self.pos_juego = pos_juego
+        self.pos_puesto = pos_puesto
+        self.voto_juego = voto_juego
+        self.voto_estrellas = voto_estrellas
+        self.nombres = nombres
+        self.comentarios = comentarios
+        self.categorias = categorias
+        self.segundos = segundos
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def _posiciones(db, indice, nombres):
+    # Mismas reglas que contribuciones_ranking: se ignoran huecos, ids vacíos y puestos que no son enteros, y el
+    # nombre de cada juego es el del primer ranking que lo trae (el de su último puesto dentro de ese ranking)
+    for doc in db.ranking.find({}, {"_id": 0, "positions": 1}, batch_size=TAM_LOTE):
+        nombres_doc = {}
+        for pos_str, game_data in (doc.get("positions") or {}).items():
+            if not game_data or not isinstance(game_data, dict):
+                continue
+            if game_data.get("id") is None:
+                continue
+            try:
+                posicion = int(pos_str)
+            except (TypeError, ValueError):
+                continue
+            g_id = str(game_data.get("id"))
+            nombres_doc[g_id] = (game_data.get("name", "Sin nombre"), game_data.get("image", ""))
+            yield indice(g_id), posicion
+        for g_id, nombre in nombres_doc.items():
+            nombres.setdefault(g_id, nombre)
+
+
+def _votos(db, indice, comentarios):
+    # Como escanear_totales: del más nuevo al más antiguo, las estrellas que no son número no cuentan y los
+    # comentarios top se eligen con es_comentario_top (solo hacen falta POR_JUEGO de cada juego)
+    proyeccion = {"game_id": 1, "estrellas": 1, "comentario": 1}
+    for voto in db.valoraciones.find({}, proyeccion, batch_size=TAM_LOTE).sort("_id", -1):
+        try:
+            estrellas = float(voto.get("estrellas", 0))
+        except (TypeError, ValueError):
+            continue
+        g_id = str(voto.get("game_id"))
+        if es_comentario_top(estrellas, voto.get("comentario")):
+            lista = comentarios.setdefault(g_id, [])
+            if len(lista) < COMENTARIOS_POR_JUEGO:
+                lista.append(voto["comentario"])
+        yield indice(g_id), estrellas
+
+
+def cargar(db):
+    inicio = time.perf_counter()
+    indices, nombres, comentarios = {}, {}, {}
+
+    def indice(g_id):
+        # Un único índice de juego para posiciones y votos, en orden de aparición
+        return indices.setdefault(g_id, len(indices))
+
+    posiciones = np.fromiter(_posiciones(db, indice, nombres), dtype=[("juego", np.int64), ("puesto", np.int64)])
+    votos = np.fromiter(_votos(db, indice, comentarios), dtype=[("juego", np.int64), ("estrellas", np.float64)])
+    # Los juegos de una categoría sin puestos ni votos no tienen índice y no suman nada
+    categorias = [
+        (cat.get("nombre"), np.array([indices[str(g)] for g in cat["lista_juegos"] if str(g) in indices],
+                                     dtype=np.int64))
+        for cat in db.categoria.find(FILTRO_CATEGORIAS, {"nombre": 1, "lista_juegos": 1})
+    ]
+    return Matrices(
+        indices, posiciones["juego"], posiciones["puesto"], votos["juego"], votos["estrellas"],
+        nombres, comentarios, categorias, time.perf_counter() - inicio
+    )
+
+
+def _dividir(numerador, denominador):
+    return np.divide(numerador, denominador, out=np.full(len(numerador), np.nan), where=denominador > 0)
+
+
+def calcular(matrices, bayes_minimo=None):
+    """
+    Devuelve un dict de arrays por índice de juego: apariciones, suma_posiciones, media_posicion, num_votos,
+    suma_estrellas, media_estrellas, histograma (n x 5), puestos (n x PUESTOS_MATRIZ) y bayesiana, más
+    media_global y bayes_minimo. La media bayesiana acerca a la media global los juegos con pocos votos:
+    (suma + m * C) / (votos + m), con m = bayes_minimo o, si no se da, la mediana de votos por juego.
+    """
+    n = len(matrices)
+    pj, puesto = matrices.pos_juego, matrices.pos_puesto
+    vj, estrellas = matrices.voto_juego, matrices.voto_estrellas
+
+    apariciones = np.bincount(pj, minlength=n)
+    suma_posiciones = np.bincount(pj, weights=puesto, minlength=n)
+    num_votos = np.bincount(vj, minlength=n)
+    suma_estrellas = np.bincount(vj, weights=estrellas, minlength=n)
+
+    enteras = (estrellas == np.floor(estrellas)) & (estrellas >= 1) & (estrellas <= 5)
+    histograma = np.bincount(
+        vj[enteras] * 5 + estrellas[enteras].astype(np.int64) - 1, minlength=n * 5
+    ).reshape(n, 5)
+
+    en_matriz = (puesto >= 1) & (puesto <= PUESTOS_MATRIZ)
+    puestos = np.bincount(
+        pj[en_matriz] * PUESTOS_MATRIZ + puesto[en_matriz] - 1, minlength=n * PUESTOS_MATRIZ
+    ).reshape(n, PUESTOS_MATRIZ)
+
+    total_votos = num_votos.sum()
+    media_global = suma_estrellas.sum() / total_votos if total_votos else 0.0
+    if bayes_minimo is None:
+        con_votos = num_votos[num_votos > 0]
+        bayes_minimo = float(np.median(con_votos)) if len(con_votos) else 0.0
+
+    return {
+        "apariciones": apariciones,
+        "suma_posiciones": suma_posiciones,
+        "media_posicion": _dividir(suma_posiciones, apariciones),
+        "num_votos": num_votos,
+        "suma_estrellas": suma_estrellas,
+        "media_estrellas": _dividir(suma_estrellas, num_votos),
+        "histograma": histograma,
+        "puestos": puestos,
+        "bayesiana": _dividir(suma_estrellas + bayes_minimo * media_global, num_votos + bayes_minimo),
+        "media_global": float(media_global),
+        "bayes_minimo": bayes_minimo,
+    }
+
+
+def medias_categoria(matrices, resultado):
+    # [{"nombre", "suma", "volumen"}]: suma y votos de los juegos de cada categoría agrupados con bincount
+    if not matrices.categorias:
+        return []
+    miembros = [juegos for _, juegos in matrices.categorias]
+    categoria = np.repeat(np.arange(len(miembros)), [len(juegos) for juegos in miembros])
+    indices = np.concatenate(miembros)
+
+    suma = np.bincount(categoria, weights=resultado["suma_estrellas"][indices], minlength=len(miembros))
+    volumen = np.bincount(categoria, weights=resultado["num_votos"][indices], minlength=len(miembros))
+    return [{"nombre": nombre, "suma": float(s), "volumen": int(v)}
+            for (nombre, _), s, v in zip(matrices.categorias, suma, volumen)]
+
+
+def filas(matrices, resultado):
+    # Un dict por juego con los campos del agregado, para reutilizar los formateadores de app.estadisticas
+    lista = []
+    for i, g_id in enumerate(matrices.ids):
+        nombre, imagen = matrices.nombres.get(g_id, (None, None))
+        fila = {
+            "_id": g_id, "nombre": nombre, "imagen": imagen,
+            "apariciones": int(resultado["apariciones"][i]),
+            "suma_posiciones": float(resultado["suma_posiciones"][i]),
+            "num_votos": int(resultado["num_votos"][i]),
+            "suma_estrellas": float(resultado["suma_estrellas"][i]),
+            "bayesiana": float(resultado["bayesiana"][i]),
+        }
+        fila.update(zip(CAMPOS_HISTOGRAMA, resultado["histograma"][i].tolist()))
+        lista.append(fila)
+    return lista
+
+
+def estadisticas_numpy(db):
+    matrices = cargar(db)
+    resultado = calcular(matrices)
+    lista = filas(matrices, resultado)
+
+    medias = np.round(resultado["media_estrellas"], 1)
+    candidatos = [g_id for g_id, es in zip(matrices.ids, (resultado["num_votos"] > 0) & (medias >= 4.0)) if es]
+    juegos = {str(g): (j.Name, j.ImagePath) for g, j in resolver_juegos(candidatos).items()}
+    return {
+        'ranking_global': _formatear_ranking_global(lista),
+        'juegos_votos': _formatear_votos(lista, juegos, matrices.comentarios),
+        'total_valoraciones': db.valoraciones.estimated_document_count(),
+        'promedios_categoria': _formatear_categorias(medias_categoria(matrices, resultado)),
+    }
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from app.metricas import registrar_cache
+from app.versiones import version
+
+# Versiones que forman la clave de los fragmentos {% cache %} de las plantillas: las tarjetas de juego van con la
+# del catálogo (invalidar_catalogo) y la lista de rankings de un usuario con la suya, que sube en cada escritura.
+# Los fragmentos viejos no se borran: dejan de pedirse y caducan por FRAGMENTOS_CACHE_TTL.
+
+
+def _clave_rankings(user_id):
+    return f"rankings:version:{user_id}"
+
+
+def fragmentos_ttl():
+    return getattr(settings, "FRAGMENTOS_CACHE_TTL", 600)
+
+
+def version_catalogo():
+    return version("games")
+
+
+def version_rankings(user_id):
+    return cache.get(_clave_rankings(user_id), 0)
+
+
+def invalidar_rankings_usuario(user_id):
+    # Llamar tras guardar o borrar rankings del usuario (guardar_ranking, guardar_rankings, eliminar_ranking)
+    clave = _clave_rankings(user_id)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, 1, None)
+
+
+def contexto_fragmentos(user_id=None):
+    # Variables que usan las plantillas en {% cache fragmentos_ttl "..." ... version %}
+    contexto = {"fragmentos_ttl": fragmentos_ttl(), "version_catalogo": version_catalogo()}
+    if user_id is not None:
+        contexto["version_rankings"] = version_rankings(user_id)
+    return contexto
+
+
+def rankings_de_usuario(user_id, construir):
+    """
+    Lista de rankings ya resuelta de mis_rankings, guardada por usuario bajo su versión y la del catálogo
+    (los nombres e imágenes salen de él). construir() se llama solo en un fallo.
+    """
+    clave = f"rankings:{user_id}:{version_rankings(user_id)}:{version_catalogo()}"
+    rankings = cache.get(clave)
+    registrar_cache("rankings_usuario", rankings is not None)
+    if rankings is None:
+        rankings = construir()
+        cache.set(clave, rankings, fragmentos_ttl())
+    return rankings
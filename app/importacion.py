@@ -0,0 +1,93 @@
+import csv
+import io
+import uuid
+
+from app.indices import INDICES
+
+# Cada importación escribe en su propia colección (prefijo + uuid): dos tareas a la vez no se borran ni se
+# mezclan los datos, y la que termina la última es la que queda como catálogo
+PREFIJO_STAGING = "games_importacion_"
+
+CAMPOS_ENTEROS = ("BGGId", "YearPublished", "MinPlayers", "MaxPlayers", "NumUserRatings", "NumExpansions")
+CAMPOS_DECIMALES = ("GameWeight", "AvgRating")
+CAMPOS_TEXTO = ("Name", "Description", "Family", "ImagePath")
+
+TAM_LOTE = 1000
+MAX_ERRORES_GUARDADOS = 100
+
+
+def _convertir_fila(row):
+    # Mismos valores por defecto que la importación original: campo vacío -> 0
+    doc = {}
+    for campo in CAMPOS_ENTEROS:
+        valor = (row.get(campo) or "").strip()
+        try:
+            doc[campo] = int(valor or 0)
+        except ValueError:
+            raise ValueError(f"{campo} no es un entero: {valor!r}")
+    for campo in CAMPOS_DECIMALES:
+        valor = (row.get(campo) or "").strip()
+        try:
+            doc[campo] = float(valor or 0.0)
+        except ValueError:
+            raise ValueError(f"{campo} no es un número: {valor!r}")
+    for campo in CAMPOS_TEXTO:
+        doc[campo] = row.get(campo) or ""
+    if not doc["Name"]:
+        raise ValueError("Name vacío")
+    doc["Family"] = doc["Family"] or None
+    return doc
+
+
+def leer_juegos(archivo, resultado):
+    # Generador: decodifica el fichero subido por bloques y valida cada fila sin cargarlo entero en memoria
+    texto = io.TextIOWrapper(archivo, encoding="utf-8-sig", newline="")
+    try:
+        for num_fila, row in enumerate(csv.DictReader(texto), start=2):
+            resultado["procesadas"] += 1
+            try:
+                yield _convertir_fila(row)
+            except ValueError as e:
+                resultado["total_errores"] += 1
+                if len(resultado["errores"]) < MAX_ERRORES_GUARDADOS:
+                    resultado["errores"].append((num_fila, str(e)))
+    finally:
+        texto.detach()
+
+
+def importar_catalogo(db, archivo, tam_lote=TAM_LOTE, progreso=None):
+    """
+    Importa el CSV en una colección temporal por lotes y, si hay al menos un juego válido,
+    la renombra a 'games' de una sola vez. Mientras tanto el catálogo actual sigue visible.
+    """
+    resultado = {"procesadas": 0, "importadas": 0, "total_errores": 0, "errores": []}
+    staging = db[f"{PREFIJO_STAGING}{uuid.uuid4().hex}"]
+
+    try:
+        lote = []
+        for doc in leer_juegos(archivo, resultado):
+            lote.append(doc)
+            if len(lote) >= tam_lote:
+                staging.insert_many(lote, ordered=False)
+                resultado["importadas"] += len(lote)
+                lote = []
+                if progreso:
+                    progreso(resultado)
+        if lote:
+            staging.insert_many(lote, ordered=False)
+            resultado["importadas"] += len(lote)
+        if progreso:
+            progreso(resultado)
+
+        if not resultado["importadas"]:
+            staging.drop()
+            return resultado
+
+        # Los índices se crean antes del cambio para que el catálogo nuevo nunca quede sin ellos
+        staging.create_indexes(INDICES["games"])
+        staging.rename("games", dropTarget=True)
+    except BaseException:
+        # Una importación a medias no deja su colección temporal
+        staging.drop()
+        raise
+    return resultado
@@ -0,0 +1,100 @@
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import PyMongoError
+
+from app.estadisticas import COLECCION_AGREGADO
+
+# Los modelos de Mongo son managed = False, así que los índices se declaran aquí
+INDICES = {
+    "ranking": [
+        # guardar_ranking / crear_ranking: un ranking por usuario y categoría; mis_rankings usa el prefijo user_id
+        IndexModel([("user_id", ASCENDING), ("category_id", ASCENDING)], name="user_id_category_id",
+                   unique=True, partialFilterExpression={"user_id": {"$exists": True}}),
+    ],
+    "valoraciones": [
+        # valorar_juego / obtener_valoracion: una valoración por usuario y juego
+        IndexModel([("game_id", ASCENDING), ("usuario", ASCENDING)], name="game_id_usuario", unique=True),
+        # obtener_comentarios_juego: páginas por cursor en orden de recientes y de estrellas
+        IndexModel([("game_id", ASCENDING), ("_id", DESCENDING)], name="game_id__id"),
+        IndexModel([("game_id", ASCENDING), ("estrellas", DESCENDING), ("_id", DESCENDING)],
+                   name="game_id_estrellas__id"),
+    ],
+    "games": [
+        IndexModel([("BGGId", ASCENDING)], name="BGGId"),
+        # Paginación por cursor (Name, BGGId) de /api/async/juegos/; las vistas síncronas usan app/catalogo.py
+        IndexModel([("Name", ASCENDING), ("BGGId", ASCENDING)], name="Name_BGGId"),
+    ],
+    COLECCION_AGREGADO: [
+        IndexModel([("media_posicion", ASCENDING), ("apariciones", DESCENDING)], name="media_posicion_apariciones"),
+    ],
+}
+
+# Consultas representativas de cada vista: (vista, colección, filtro, orden)
+CONSULTAS = [
+    ("crear_ranking", "ranking", {"user_id": 1, "category_id": ObjectId()}, None),
+    ("mis_rankings", "ranking", {"user_id": 1}, None),
+    ("obtener_valoracion", "valoraciones", {"game_id": 13, "usuario": "usuario"}, None),
+    ("obtener_comentarios_juego", "valoraciones", {"game_id": 13, "comentario": {"$ne": ""}}, [("_id", DESCENDING)]),
+    ("obtener_comentarios_juego", "valoraciones",
+     {"game_id": 13, "comentario": {"$ne": ""}, "$or": [{"estrellas": {"$lt": 4}},
+                                                       {"estrellas": 4, "_id": {"$lt": ObjectId()}}]},
+     [("estrellas", DESCENDING), ("_id", DESCENDING)]),
+    ("global_ranking", COLECCION_AGREGADO, {}, [("media_posicion", ASCENDING), ("apariciones", DESCENDING)]),
+    ("catalogo_async", "games", {"$or": [{"Name": {"$gt": "M"}}, {"Name": "M", "BGGId": {"$gt": 0}}]},
+     [("Name", ASCENDING), ("BGGId", ASCENDING)]),
+]
+
+
+def _direccion(direccion):
+    # Las numéricas pueden venir como 1 o 1.0; las de texto ("text", "2dsphere", "hashed") se comparan tal cual
+    return int(direccion) if isinstance(direccion, (int, float)) else direccion
+
+
+def _clave(spec):
+    return tuple((campo, _direccion(direccion)) for campo, direccion in spec)
+
+
+def indices_faltantes(db):
+    # Devuelve [(colección, IndexModel)] de los índices declarados que no existen
+    faltantes = []
+    for coleccion, modelos in INDICES.items():
+        existentes = {_clave(info["key"]) for info in db[coleccion].index_information().values()}
+        for modelo in modelos:
+            if _clave(modelo.document["key"].items()) not in existentes:
+                faltantes.append((coleccion, modelo))
+    return faltantes
+
+
+def asegurar_indices(db):
+    # Idempotente: solo crea los que faltan. Devuelve [(colección, nombre, error o None)]
+    resultado = []
+    for coleccion, modelo in indices_faltantes(db):
+        nombre = modelo.document["name"]
+        try:
+            db[coleccion].create_indexes([modelo])
+            resultado.append((coleccion, nombre, None))
+        except PyMongoError as e:
+            resultado.append((coleccion, nombre, str(e)))
+    return resultado
+
+
+def _etapas(plan):
+    yield plan.get("stage")
+    if "inputStage" in plan:
+        yield from _etapas(plan["inputStage"])
+    for sub in plan.get("inputStages", []):
+        yield from _etapas(sub)
+
+
+def explicar_consultas(db):
+    # Devuelve [(vista, colección, filtro, etapas del plan ganador)]
+    informes = []
+    for vista, coleccion, filtro, orden in CONSULTAS:
+        comando = {"find": coleccion, "filter": filtro}
+        if orden:
+            comando["sort"] = dict(orden)
+        plan = db.command("explain", comando, verbosity="queryPlanner")
+        ganador = plan["queryPlanner"]["winningPlan"]
+        ganador = ganador.get("queryPlan", ganador)  # planes del motor SBE
+        informes.append((vista, coleccion, filtro, [e for e in _etapas(ganador) if e]))
+    return informes
@@ -0,0 +1,164 @@
+import contextvars
+import json
+import logging
+import time
+from collections import Counter
+
+import bson
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Medición de la petición en curso; None fuera de una petición (tareas en segundo plano, comandos)
+_medicion = contextvars.ContextVar("medicion_peticion", default=None)
+
+_monitor_registrado = False
+
+
+class Medicion:
+    def __init__(self):
+        self.comandos = 0
+        self.errores = 0
+        self.duracion_us = 0
+        self.bytes = 0 if getattr(settings, "INSTRUMENTACION_BYTES", False) else None
+        self.sql = 0
+        self.por_comando = Counter()  # "find games" -> veces
+
+    def contar_sql(self, execute, sql, params, many, context):
+        self.sql += 1
+        return execute(sql, params, many, context)
+
+    def repetido(self):
+        # El comando que más se repite: la firma típica de un N+1
+        if not self.por_comando:
+            return None, 0
+        return self.por_comando.most_common(1)[0]
+
+    def server_timing(self, total_ms):
+        mongo = f"{self.comandos} cmd" if self.bytes is None else f"{self.comandos} cmd, {self.bytes / 1024:.1f} KiB"
+        return ", ".join([
+            f'mongo;dur={self.duracion_us / 1000:.1f};desc="{mongo}"',
+            f'sql;desc="{"?" if self.sql is None else self.sql} consultas"',
+            f"total;dur={total_ms:.1f}",
+        ])
+
+
+class MonitorComandos(monitoring.CommandListener):
+    """
+    Listener de PyMongo: ve tanto las consultas del ORM (Games.objects.using("mongodb")) como las de
+    connections['mongodb'].database, porque las dos salen por el mismo MongoClient.
+    """
+
+    def started(self, event):
+        medicion = _medicion.get()
+        if medicion is None:
+            return
+        medicion.comandos += 1
+        coleccion = event.command.get(event.command_name)
+        if not isinstance(coleccion, str):
+            coleccion = event.command.get("collection", "")  # getMore lleva el id del cursor
+        medicion.por_comando[f"{event.command_name} {coleccion}".strip()] += 1
+
+    def succeeded(self, event):
+        medicion = _medicion.get()
+        if medicion is None:
+            return
+        medicion.duracion_us += event.duration_micros
+        # Volver a serializar la respuesta cuesta tanto como la respuesta es grande: solo con INSTRUMENTACION_BYTES
+        if medicion.bytes is not None:
+            medicion.bytes += len(bson.encode(event.reply))
+
+    def failed(self, event):
+        medicion = _medicion.get()
+        if medicion is None:
+            return
+        medicion.duracion_us += event.duration_micros
+        medicion.errores += 1
+
+
+def registrar_monitor():
+    # Debe llamarse antes de que se cree el MongoClient (AppConfig.ready); los listeners globales no se añaden después
+    global _monitor_registrado
+    if not _monitor_registrado:
+        monitoring.register(MonitorComandos())
+        _monitor_registrado = True
+
+
+class InstrumentacionMiddleware:
+    """
+    Cuenta por petición los comandos de Mongo (número, tiempo y, con INSTRUMENTACION_BYTES, bytes de respuesta)
+    y las consultas SQL.
+    Escribe una línea JSON en DEBUG en el logger app.instrumentacion, avisa en WARNING si se supera
+    INSTRUMENTACION_PRESUPUESTO y, con INSTRUMENTACION_SERVER_TIMING, añade la cabecera Server-Timing.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "INSTRUMENTACION_ACTIVA", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.presupuesto = getattr(settings, "INSTRUMENTACION_PRESUPUESTO", None)
+        self.server_timing = getattr(settings, "INSTRUMENTACION_SERVER_TIMING", False)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medicion = Medicion()
+        token = _medicion.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            with connections['default'].execute_wrapper(medicion.contar_sql):
+                response = self.get_response(request)
+        finally:
+            _medicion.reset(token)
+        total_ms = (time.perf_counter() - inicio) * 1000
+
+        if self.server_timing:
+            response["Server-Timing"] = medicion.server_timing(total_ms)
+        self.registrar(request, response, medicion, total_ms)
+        return response
+
+    async def __acall__(self, request):
+        # Con ASGI el SQL corre en hilos de sync_to_async con sus propias conexiones: aquí solo se mide Mongo
+        medicion = Medicion()
+        medicion.sql = None
+        token = _medicion.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicion.reset(token)
+        total_ms = (time.perf_counter() - inicio) * 1000
+
+        if self.server_timing:
+            response["Server-Timing"] = medicion.server_timing(total_ms)
+        self.registrar(request, response, medicion, total_ms)
+        return response
+
+    def registrar(self, request, response, medicion, total_ms):
+        comando, veces = medicion.repetido()
+        linea = {
+            "metodo": request.method,
+            "ruta": request.path,
+            "estado": response.status_code,
+            "ms": round(total_ms, 1),
+            "mongo_comandos": medicion.comandos,
+            "mongo_ms": round(medicion.duracion_us / 1000, 1),
+            "mongo_bytes": medicion.bytes,
+            "mongo_errores": medicion.errores,
+            "sql": medicion.sql,
+            "mas_repetido": f"{comando} x{veces}" if comando else None,
+        }
+        if self.presupuesto is not None and medicion.comandos > self.presupuesto:
+            linea["presupuesto"] = self.presupuesto
+            logger.warning("Presupuesto de consultas superado %s", json.dumps(linea, ensure_ascii=False))
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps(linea, ensure_ascii=False))
@@ -0,0 +1,81 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.benchmark import ESCALA_POR_DEFECTO, EXCLUIDAS, MOTORES, comparar, ejecutar
+
+
+class Command(BaseCommand):
+    help = ("Mide cada vista con datos sintéticos sobre un Mongo local (nunca el de settings): "
+            "latencia p50/p95, operaciones contra Mongo y SQL y memoria pico.")
+
+    def add_arguments(self, parser):
+        for clave, valor in ESCALA_POR_DEFECTO.items():
+            parser.add_argument(f"--{clave}", type=int, default=valor, help=f"Cantidad de {clave} (por defecto {valor}).")
+        parser.add_argument(
+            "--motor", choices=MOTORES, default="mongomock",
+            help="mongomock (en proceso; no implementa $convert ni el $type que genera count() del ORM, así que "
+                 "esas vistas salen como ERROR), inmemory (mongod temporal de pymongo_inmemory) o uri (un mongod local)."
+        )
+        parser.add_argument("--uri", help="Cadena de conexión para --motor uri; se usa la base <NAME>_benchmark.")
+        parser.add_argument("--repeticiones", type=int, default=20)
+        parser.add_argument("--calentamiento", type=int, default=2)
+        parser.add_argument("--semilla", type=int, default=0)
+        parser.add_argument("--solo", nargs="+", help="Nombres de escenario a medir (por defecto todos).")
+        parser.add_argument("--guardar", help="Escribe el informe en este JSON para usarlo como línea base.")
+        parser.add_argument("--comparar", help="JSON de línea base; termina con error si hay regresiones.")
+        parser.add_argument(
+            "--tolerancia", type=float, default=0.2,
+            help="Aumento relativo del p95 admitido frente a la línea base (0.2 = 20%%)."
+        )
+
+    def handle(self, *args, **options):
+        base = None
+        if options["comparar"]:
+            try:
+                with open(options["comparar"], encoding="utf-8") as f:
+                    base = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer la línea base: {e}")
+
+        escala = {clave: options[clave] for clave in ESCALA_POR_DEFECTO}
+        self.stdout.write(f"Sembrando {escala} en {options['motor']}...")
+        self.stdout.write(f"{'escenario':<26} {'estado':<10} {'p50 ms':>9} {'p95 ms':>9} "
+                          f"{'mongo':>6} {'sql':>5} {'mem KiB':>9}")
+
+        def mostrar(nombre, datos):
+            if "error" in datos:
+                self.stdout.write(self.style.ERROR(f"{nombre:<26} ERROR  {datos['error']}"))
+                return
+            estados = ",".join(str(e) for e in datos["estados"])
+            self.stdout.write(f"{nombre:<26} {estados:<10} {datos['p50_ms']:>9.2f} {datos['p95_ms']:>9.2f} "
+                              f"{datos['mongo']:>6} {datos['sql']:>5} {datos['memoria_kib']:>9.1f}")
+
+        try:
+            informe = ejecutar(
+                escala=escala, motor=options["motor"], uri=options["uri"],
+                repeticiones=options["repeticiones"], calentamiento=options["calentamiento"],
+                semilla=options["semilla"], solo=options["solo"], progreso=mostrar,
+            )
+        except (ImportError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for ruta, motivo in EXCLUIDAS.items():
+            self.stdout.write(f"[-] {ruta}: no se mide ({motivo})")
+        for ruta in informe["meta"]["sin_escenario"]:
+            self.stdout.write(self.style.WARNING(f"[!] La ruta '{ruta}' no tiene escenario"))
+
+        if options["guardar"]:
+            with open(options["guardar"], "w", encoding="utf-8") as f:
+                json.dump(informe, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"[OK] Línea base guardada en {options['guardar']}"))
+
+        if base is not None:
+            if base.get("meta", {}).get("escala") != informe["meta"]["escala"]:
+                self.stdout.write(self.style.WARNING("[!] La línea base se tomó con otra escala"))
+            regresiones = comparar(informe, base, options["tolerancia"])
+            for vista, motivo in regresiones:
+                self.stdout.write(self.style.ERROR(f"[REGRESIÓN] {vista}: {motivo}"))
+            if regresiones:
+                raise CommandError(f"{len(regresiones)} regresiones frente a {options['comparar']}.")
+            self.stdout.write(self.style.SUCCESS("[OK] Sin regresiones frente a la línea base."))
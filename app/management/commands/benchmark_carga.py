@@ -0,0 +1,57 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.benchmark import ESCALA_POR_DEFECTO, MOTORES, RUTAS_CARGA, prueba_carga
+
+
+class Command(BaseCommand):
+    help = ("Prueba de carga de las lecturas /api/async/: el mismo tráfico por el manejador WSGI (hilos) "
+            "y por el ASGI (bucle de eventos), con datos sintéticos sobre un Mongo local.")
+
+    def add_arguments(self, parser):
+        for clave, valor in ESCALA_POR_DEFECTO.items():
+            parser.add_argument(f"--{clave}", type=int, default=valor)
+        parser.add_argument(
+            "--motor", choices=MOTORES, default="mongomock",
+            help="Con mongomock no hay AsyncMongoClient posible y ASGI mide la ruta síncrona de respaldo; "
+                 "para comparar de verdad use inmemory o uri."
+        )
+        parser.add_argument("--uri")
+        parser.add_argument("--peticiones", type=int, default=500)
+        parser.add_argument("--concurrencia", type=int, default=20)
+        parser.add_argument("--semilla", type=int, default=0)
+        parser.add_argument("--rutas", nargs="+", choices=list(RUTAS_CARGA))
+        parser.add_argument("--guardar", help="Escribe el resultado en este JSON.")
+
+    def handle(self, *args, **options):
+        escala = {clave: options[clave] for clave in ESCALA_POR_DEFECTO}
+        self.stdout.write(f"{options['peticiones']} peticiones, {options['concurrencia']} simultáneas, "
+                          f"motor {options['motor']}")
+        self.stdout.write(f"{'ruta':<14} {'modo':<5} {'estado':<8} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'hilos':>6}")
+
+        def mostrar(ruta, modo, datos):
+            if "error" in datos:
+                self.stdout.write(self.style.ERROR(f"{ruta:<14} {modo:<5} ERROR  {datos['error']}"))
+                return
+            estados = ",".join(str(e) for e in datos["estados"])
+            self.stdout.write(f"{ruta:<14} {modo:<5} {estados:<8} {datos['rps']:>8.1f} {datos['p50_ms']:>9.2f} "
+                              f"{datos['p95_ms']:>9.2f} {datos['hilos_max']:>6}")
+
+        try:
+            resultado = prueba_carga(
+                escala=escala, motor=options["motor"], uri=options["uri"], peticiones=options["peticiones"],
+                concurrencia=options["concurrencia"], semilla=options["semilla"], rutas=options["rutas"],
+                progreso=mostrar,
+            )
+        except (ImportError, ValueError) as e:
+            raise CommandError(str(e))
+
+        if not resultado["meta"]["cliente_async"]:
+            self.stdout.write(self.style.WARNING(
+                "[!] Sin AsyncMongoClient: las vistas ASGI han usado su versión síncrona (sync_to_async)."
+            ))
+        if options["guardar"]:
+            with open(options["guardar"], "w", encoding="utf-8") as f:
+                json.dump(resultado, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"[OK] Resultado guardado en {options['guardar']}"))
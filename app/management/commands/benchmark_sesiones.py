@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.benchmark import ESCALA_POR_DEFECTO, MOTORES, prueba_sesiones
+
+
+class Command(BaseCommand):
+    help = ("Coste de la autenticación por petición: cada SESSION_ENGINE con y sin caché del Usuario, "
+            "con datos sintéticos sobre un Mongo local y una base 'default' de pruebas.")
+
+    def add_arguments(self, parser):
+        for clave, valor in ESCALA_POR_DEFECTO.items():
+            parser.add_argument(f"--{clave}", type=int, default=valor)
+        parser.add_argument("--motor", choices=MOTORES, default="mongomock")
+        parser.add_argument("--uri")
+        parser.add_argument("--repeticiones", type=int, default=200)
+        parser.add_argument("--calentamiento", type=int, default=5)
+        parser.add_argument("--semilla", type=int, default=0)
+        parser.add_argument("--usuario-ttl", type=int, default=60, help="USUARIO_CACHE_TTL de las pruebas con caché.")
+        parser.add_argument("--guardar", help="Escribe el resultado en este JSON.")
+
+    def handle(self, *args, **options):
+        escala = {clave: options[clave] for clave in ESCALA_POR_DEFECTO}
+        self.stdout.write(f"{'combinación':<28} {'ruta':<20} {'estado':<8} {'p50 ms':>9} {'p95 ms':>9} {'sql':>5}")
+        referencia = {}
+
+        def mostrar(combinacion, ruta, datos):
+            if "error" in datos:
+                self.stdout.write(self.style.ERROR(f"{combinacion:<28} {ruta:<20} ERROR  {datos['error']}"))
+                return
+            # La primera combinación de cada ruta es la de partida (sesión en SQLite, Usuario sin caché)
+            base = referencia.setdefault(ruta, datos["p50_ms"])
+            estados = ",".join(str(e) for e in datos["estados"])
+            self.stdout.write(f"{combinacion:<28} {ruta:<20} {estados:<8} {datos['p50_ms']:>9.2f} "
+                              f"{datos['p95_ms']:>9.2f} {datos['sql']:>5}  ({datos['p50_ms'] - base:+.2f} ms)")
+
+        try:
+            resultado = prueba_sesiones(
+                escala=escala, motor=options["motor"], uri=options["uri"], repeticiones=options["repeticiones"],
+                calentamiento=options["calentamiento"], semilla=options["semilla"],
+                usuario_ttl=options["usuario_ttl"], progreso=mostrar,
+            )
+        except (ImportError, ValueError) as e:
+            raise CommandError(str(e))
+
+        if options["guardar"]:
+            with open(options["guardar"], "w", encoding="utf-8") as f:
+                json.dump(resultado, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"[OK] Resultado guardado en {options['guardar']}"))
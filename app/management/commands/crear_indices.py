@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from app.indices import asegurar_indices, explicar_consultas, indices_faltantes
+
+
+class Command(BaseCommand):
+    help = "Crea los índices que necesitan las vistas en las colecciones de MongoDB."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--comprobar", action="store_true",
+            help="No crea nada; lista los índices que faltan y termina con error si hay alguno."
+        )
+        parser.add_argument(
+            "--explicar", action="store_true",
+            help="Muestra el plan de ejecución de la consulta de cada vista y marca los COLLSCAN."
+        )
+
+    def handle(self, *args, **options):
+        db = connections['mongodb'].database
+
+        if options["comprobar"]:
+            faltantes = indices_faltantes(db)
+            for coleccion, modelo in faltantes:
+                self.stdout.write(f"[!] Falta {coleccion}.{modelo.document['name']} {dict(modelo.document['key'])}")
+            if faltantes:
+                raise CommandError(f"Faltan {len(faltantes)} índices.")
+            self.stdout.write(self.style.SUCCESS("[OK] Todos los índices declarados existen."))
+        else:
+            creados = asegurar_indices(db)
+            for coleccion, nombre, error in creados:
+                if error:
+                    self.stderr.write(f"[!] No se pudo crear {coleccion}.{nombre}: {error}")
+                else:
+                    self.stdout.write(f"[OK] Creado {coleccion}.{nombre}")
+            if not creados:
+                self.stdout.write(self.style.SUCCESS("[OK] No faltaba ningún índice."))
+
+        if options["explicar"]:
+            scans = 0
+            for vista, coleccion, filtro, etapas in explicar_consultas(db):
+                linea = f"{vista:<28} {coleccion:<15} {' <- '.join(etapas)}  {filtro}"
+                if "COLLSCAN" in etapas:
+                    scans += 1
+                    self.stdout.write(self.style.WARNING(f"[COLLSCAN] {linea}"))
+                else:
+                    self.stdout.write(f"[OK] {linea}")
+            if scans:
+                raise CommandError(f"{scans} consultas recorren la colección completa.")
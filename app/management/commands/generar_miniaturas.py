@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.catalogo import obtener_catalogo
+from app.miniaturas import generar_catalogo, tamanos
+
+
+class Command(BaseCommand):
+    help = ("Descarga la imagen de cada juego del catálogo y genera sus miniaturas en MINIATURAS_DIR "
+            "(las ya generadas se saltan). Necesita Pillow.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrencia", type=int, help="Descargas simultáneas (por defecto MINIATURAS_CONCURRENCIA).")
+        parser.add_argument("--forzar", action="store_true", help="Vuelve a descargar y generar todas.")
+        parser.add_argument("--limite", type=int, help="Solo los primeros N juegos (para probar).")
+
+    def handle(self, *args, **options):
+        juegos = [(juego.BGGId, juego.ImagePath) for juego in obtener_catalogo().ordenados]
+        if options["limite"]:
+            juegos = juegos[:options["limite"]]
+        self.stdout.write(f"{len(juegos)} juegos, tamaños {tamanos()}")
+
+        inicio = time.perf_counter()
+        try:
+            resultado = generar_catalogo(
+                juegos, concurrencia=options["concurrencia"], forzar=options["forzar"],
+                progreso=lambda r: self.stdout.write(f"  {r['generadas'] + r['fallidas']}/{r['total']}"),
+            )
+        except ImportError as e:
+            raise CommandError(str(e))
+
+        for error in resultado["errores"]:
+            self.stdout.write(self.style.WARNING(f"[!] {error}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"[OK] {resultado['generadas']} imágenes con miniatura, {resultado['fallidas']} fallidas "
+            f"en {time.perf_counter() - inicio:.1f} s"
+        ))
@@ -0,0 +1,72 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from app.consultas import normalizar_game_id, resolver_juegos
+
+
+class Command(BaseCommand):
+    help = ("Informe offline de rankings y valoraciones con el motor vectorizado (numpy): posición media, "
+            "media de estrellas, media bayesiana, histograma y medias por categoría.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=20, help="Juegos a listar, por media bayesiana.")
+        parser.add_argument(
+            "--bayes-minimo", type=float,
+            help="Votos de peso de la media global en la media bayesiana (por defecto la mediana de votos)."
+        )
+        parser.add_argument("--guardar", help="Escribe el informe completo (todos los juegos) en este JSON.")
+
+    def handle(self, *args, **options):
+        try:
+            from app import estadisticas_numpy
+        except ImportError:
+            raise CommandError("El informe necesita numpy (pip install numpy).")
+
+        db = connections['mongodb'].database
+        matrices = estadisticas_numpy.cargar(db)
+        inicio = time.perf_counter()
+        resultado = estadisticas_numpy.calcular(matrices, options["bayes_minimo"])
+        categorias = estadisticas_numpy.medias_categoria(matrices, resultado)
+        calculo = time.perf_counter() - inicio
+
+        filas = estadisticas_numpy.filas(matrices, resultado)
+        self.stdout.write(f"{len(matrices)} juegos, {len(matrices.pos_juego)} puestos, "
+                          f"{len(matrices.voto_juego)} votos. Carga {matrices.segundos:.2f} s, cálculo {calculo:.3f} s")
+        self.stdout.write(f"Media global {resultado['media_global']:.2f}, "
+                          f"m = {resultado['bayes_minimo']:.1f} votos")
+
+        self.stdout.write(f"\n{'BGGId':>8} {'nombre':<32} {'votos':>6} {'media':>6} {'bayes':>6} "
+                          f"{'pos. media':>10} {'1º':>4}  histograma 1-5")
+        con_votos = sorted((f for f in filas if f["num_votos"]), key=lambda f: (-f["bayesiana"], f["_id"]))
+        top = con_votos[:options["top"]]
+        # Los juegos que nadie ha puesto en un ranking no traen nombre: se toma del catálogo
+        catalogo = resolver_juegos(fila["_id"] for fila in top)
+        for fila in top:
+            i = matrices.indices[fila["_id"]]
+            media_pos = resultado["media_posicion"][i]
+            juego = catalogo.get(normalizar_game_id(fila["_id"]))
+            nombre = fila["nombre"] or (juego.Name if juego else "")
+            self.stdout.write(
+                f"{fila['_id']:>8} {nombre[:32]:<32} {fila['num_votos']:>6} "
+                f"{fila['suma_estrellas'] / fila['num_votos']:>6.2f} {fila['bayesiana']:>6.2f} "
+                f"{'-' if media_pos != media_pos else f'{media_pos:.2f}':>10} {int(resultado['puestos'][i][0]):>4}  "
+                f"{resultado['histograma'][i].tolist()}"
+            )
+
+        self.stdout.write(f"\n{'categoría':<32} {'votos':>7} {'media':>6}")
+        for cat in sorted(categorias, key=lambda c: -c["volumen"]):
+            media = cat["suma"] / cat["volumen"] if cat["volumen"] else 0
+            self.stdout.write(f"{(cat['nombre'] or '')[:32]:<32} {cat['volumen']:>7} {media:>6.2f}")
+
+        if options["guardar"]:
+            with open(options["guardar"], "w", encoding="utf-8") as f:
+                json.dump({
+                    "media_global": resultado["media_global"],
+                    "bayes_minimo": resultado["bayes_minimo"],
+                    "juegos": filas,
+                    "categorias": categorias,
+                }, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"[OK] Informe guardado en {options['guardar']}"))
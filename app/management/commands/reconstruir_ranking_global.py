@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from app.estadisticas import COLECCION_AGREGADO, comprobar_agregado, reconstruir_agregado
+
+
+class Command(BaseCommand):
+    help = (f"Reconstruye la colección '{COLECCION_AGREGADO}' desde ranking y valoraciones, "
+            "o comprueba que coincide con el cálculo por escaneo.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--comprobar", action="store_true",
+            help="No modifica nada; compara el agregado con el escaneo completo y lista las diferencias."
+        )
+
+    def handle(self, *args, **options):
+        db = connections['mongodb'].database
+
+        if options["comprobar"]:
+            diferencias = comprobar_agregado(db)
+            for g_id, campo, esperado, actual in diferencias:
+                self.stdout.write(f"[!] Juego {g_id}: {campo} escaneo={esperado} agregado={actual}")
+            if diferencias:
+                raise CommandError(f"El agregado tiene {len(diferencias)} discrepancias con el escaneo.")
+            self.stdout.write(self.style.SUCCESS("[OK] El agregado coincide con el escaneo."))
+            return
+
+        total = reconstruir_agregado(db)
+        self.stdout.write(self.style.SUCCESS(f"[OK] Agregado reconstruido: {total} juegos."))
@@ -0,0 +1,235 @@
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from pymongo import monitoring
+
+# Contadores en proceso para /metrics en formato de texto de Prometheus. Cada proceso (worker) tiene los suyos;
+# Prometheus los distingue por la instancia que raspa.
+
+CUBETAS_PETICION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CUBETAS_MONGO = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+REGISTRO = []
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas(nombres, valores, extra=None):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class _Metrica:
+    tipo = "untyped"
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+        self._valores = {}
+        REGISTRO.append(self)
+
+    def _clave(self, etiquetas):
+        return tuple(str(etiquetas.get(e, "")) for e in self.etiquetas)
+
+    def cabecera(self):
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+
+    def reiniciar(self):
+        with self._lock:
+            self._valores.clear()
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def inc(self, cantidad=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def valores(self):
+        with self._lock:
+            return dict(self._valores)
+
+    def lineas(self):
+        return [f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}"
+                for clave, valor in sorted(self.valores().items())]
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), cubetas=CUBETAS_PETICION):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.cubetas = tuple(cubetas)
+
+    def observar(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            serie = self._valores.get(clave)
+            if serie is None:
+                serie = self._valores[clave] = [[0] * len(self.cubetas), 0.0, 0]
+            for i, limite in enumerate(self.cubetas):
+                if valor <= limite:
+                    serie[0][i] += 1
+                    break
+            serie[1] += valor
+            serie[2] += 1
+
+    def lineas(self):
+        with self._lock:
+            copia = {clave: (list(c), s, n) for clave, (c, s, n) in self._valores.items()}
+        lineas = []
+        for clave, (cubetas, suma, total) in sorted(copia.items()):
+            acumulado = 0
+            for limite, cantidad in zip(self.cubetas, cubetas):
+                acumulado += cantidad
+                le = _etiquetas(self.etiquetas, clave, 'le="%s"' % limite)
+                lineas.append(f"{self.nombre}_bucket{le} {acumulado}")
+            le = _etiquetas(self.etiquetas, clave, 'le="+Inf"')
+            lineas.append(f"{self.nombre}_bucket{le} {total}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {total}")
+        return lineas
+
+
+class Medidor(_Metrica):
+    # Valor calculado al raspar: funcion() devuelve {tupla de etiquetas: valor}
+    tipo = "gauge"
+
+    def __init__(self, nombre, ayuda, etiquetas, funcion):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.funcion = funcion
+
+    def lineas(self):
+        return [f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}"
+                for clave, valor in sorted(self.funcion().items())]
+
+
+PETICIONES = Histograma(
+    "gamesranking_peticion_segundos", "Duración de las peticiones por nombre de URL.", ("vista", "metodo")
+)
+RESPUESTAS = Contador(
+    "gamesranking_respuestas_total", "Respuestas por nombre de URL y código de estado.", ("vista", "estado")
+)
+MONGO_COMANDOS = Histograma(
+    "gamesranking_mongo_comando_segundos", "Duración de los comandos de MongoDB (ORM y PyMongo) por colección.",
+    ("coleccion", "comando"), cubetas=CUBETAS_MONGO
+)
+MONGO_ERRORES = Contador(
+    "gamesranking_mongo_errores_total", "Comandos de MongoDB que han fallado.", ("coleccion", "comando")
+)
+CACHE = Contador(
+    "gamesranking_cache_total", "Lecturas de caché por resultado (acierto/fallo).", ("cache", "resultado")
+)
+
+
+def registrar_cache(nombre, acierto):
+    CACHE.inc(cache=nombre, resultado="acierto" if acierto else "fallo")
+
+
+def _ratio_cache():
+    totales = {}
+    for (nombre, resultado), valor in CACHE.valores().items():
+        aciertos, total = totales.get(nombre, (0, 0))
+        totales[nombre] = (aciertos + (valor if resultado == "acierto" else 0), total + valor)
+    return {(nombre,): aciertos / total for nombre, (aciertos, total) in totales.items() if total}
+
+
+def _cola_tareas():
+    from app.tareas import profundidad_cola
+    return {(estado,): cantidad for estado, cantidad in profundidad_cola().items()}
+
+
+Medidor("gamesranking_cache_ratio_aciertos", "Proporción de aciertos de cada caché desde el arranque.",
+        ("cache",), _ratio_cache)
+Medidor("gamesranking_tareas_cola", "Tareas de este proceso en cola o en ejecución.", ("estado",), _cola_tareas)
+
+
+def exponer():
+    lineas = []
+    for metrica in REGISTRO:
+        lineas.extend(metrica.cabecera())
+        lineas.extend(metrica.lineas())
+    return "\n".join(lineas) + "\n"
+
+
+class MonitorMetricas(monitoring.CommandListener):
+    # started y succeeded/failed de un mismo comando llegan en el mismo hilo con PyMongo síncrono
+    _en_curso = threading.local()
+
+    def _pendientes(self):
+        pendientes = getattr(self._en_curso, "comandos", None)
+        if pendientes is None:
+            pendientes = self._en_curso.comandos = {}
+        return pendientes
+
+    def started(self, event):
+        coleccion = event.command.get(event.command_name)
+        if not isinstance(coleccion, str):
+            coleccion = event.command.get("collection", "")
+        self._pendientes()[event.request_id] = (coleccion, event.command_name)
+
+    def succeeded(self, event):
+        coleccion, comando = self._pendientes().pop(event.request_id, ("", event.command_name))
+        MONGO_COMANDOS.observar(event.duration_micros / 1_000_000, coleccion=coleccion, comando=comando)
+
+    def failed(self, event):
+        coleccion, comando = self._pendientes().pop(event.request_id, ("", event.command_name))
+        MONGO_COMANDOS.observar(event.duration_micros / 1_000_000, coleccion=coleccion, comando=comando)
+        MONGO_ERRORES.inc(coleccion=coleccion, comando=comando)
+
+
+_monitor_registrado = False
+
+
+def registrar_monitor():
+    global _monitor_registrado
+    if not _monitor_registrado:
+        monitoring.register(MonitorMetricas())
+        _monitor_registrado = True
+
+
+class MetricasMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICAS_ACTIVAS", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        inicio = time.perf_counter()
+        response = self.get_response(request)
+        self.registrar(request, response, time.perf_counter() - inicio)
+        return response
+
+    async def __acall__(self, request):
+        inicio = time.perf_counter()
+        response = await self.get_response(request)
+        self.registrar(request, response, time.perf_counter() - inicio)
+        return response
+
+    def registrar(self, request, response, duracion):
+        coincidencia = getattr(request, "resolver_match", None)
+        vista = (coincidencia.url_name or coincidencia.view_name) if coincidencia else "sin_ruta"
+        PETICIONES.observar(duracion, vista=vista, metodo=request.method)
+        RESPUESTAS.inc(vista=vista, estado=response.status_code)
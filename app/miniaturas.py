@@ -0,0 +1,256 @@
+import hashlib
+import ipaddress
+import logging
+import os
+import socket
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+
+# Miniaturas locales de Games.ImagePath. Cada imagen original se descarga una vez, se guarda reducida a cada
+# tamaño de MINIATURAS_TAMANOS con el hash de su contenido en el nombre (<hash>_<tamaño>.jpg) y se sirve con
+# caché larga: si la imagen cambia, cambia el nombre. urls/<sha1 de la URL> guarda el hash de cada URL ya
+# descargada. Necesita Pillow, que es opcional (pip install Pillow); sin él se usa la imagen original.
+# ImagePath viene de CSV y de la API externa: solo se descarga por http(s) de los hosts de MINIATURAS_HOSTS
+# y nunca de una dirección que no sea pública (ver descargar).
+
+logger = logging.getLogger(__name__)
+
+FORMATO = "JPEG"
+EXTENSION = "jpg"
+CALIDAD = 85
+TAM_TROZO = 64 * 1024
+MAX_REDIRECCIONES = 3
+# Segundos que una URL queda reservada mientras se genera o, si ha fallado, hasta el siguiente intento
+ESPERA_REINTENTO = 300
+
+
+def _parametro(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+def tamanos():
+    # nombre -> lado máximo en píxeles
+    return _parametro("MINIATURAS_TAMANOS", {"mini": 150, "tarjeta": 320})
+
+
+def _directorio():
+    return Path(_parametro("MINIATURAS_DIR", None) or settings.BASE_DIR / "miniaturas")
+
+
+def _clave_url(url):
+    return hashlib.sha1(url.encode()).hexdigest()
+
+
+def nombre_archivo(hash_contenido, tamano):
+    return f"{hash_contenido}_{tamano}.{EXTENSION}"
+
+
+def ruta_archivo(nombre):
+    return _directorio() / nombre[:2] / nombre
+
+
+def _ruta_indice(url):
+    return _directorio() / "urls" / _clave_url(url)
+
+
+def hash_de_url(url):
+    # Hash del contenido de la imagen de url si ya se ha descargado; None si no
+    clave = f"miniatura:{_clave_url(url)}"
+    hash_contenido = cache.get(clave)
+    if hash_contenido is None:
+        try:
+            hash_contenido = _ruta_indice(url).read_text().strip()
+        except OSError:
+            return None
+        cache.set(clave, hash_contenido, 3600)
+    return hash_contenido
+
+
+def url_origen(url):
+    # MINIATURAS_ORIGENES = {prefijo: sustituto} descarga de otro servidor, p. ej. un "python -m http.server"
+    # local con copias de las imágenes para pruebas
+    for prefijo, sustituto in _parametro("MINIATURAS_ORIGENES", {}).items():
+        if url.startswith(prefijo):
+            return sustituto + url[len(prefijo):]
+    return url
+
+
+def comprobar_url(url):
+    # Solo http(s) y hosts de MINIATURAS_HOSTS o sus subdominios
+    partes = urlsplit(url)
+    host = (partes.hostname or "").lower()
+    if partes.scheme not in ("http", "https") or not host:
+        raise ValueError(f"URL de imagen no admitida: {url}")
+    permitidos = _parametro("MINIATURAS_HOSTS", [])
+    if not any(host == permitido or host.endswith("." + permitido) for permitido in permitidos):
+        raise ValueError(f"Host de imagen no permitido: {host}")
+
+
+def comprobar_direccion(url):
+    # El host tiene que resolver solo a direcciones públicas: ni localhost, ni la red interna, ni 169.254.x.
+    # requests vuelve a resolver al conectar; la lista de hosts es la protección principal y esto la completa
+    partes = urlsplit(url)
+    puerto = partes.port or (443 if partes.scheme == "https" else 80)
+    try:
+        direcciones = socket.getaddrinfo(partes.hostname, puerto, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise ValueError(f"No se puede resolver {partes.hostname}: {e}")
+    for *_, direccion in direcciones:
+        if not ipaddress.ip_address(direccion[0]).is_global:
+            raise ValueError(f"{partes.hostname} resuelve a una dirección no pública ({direccion[0]})")
+
+
+def descargar(url):
+    # Las redirecciones se siguen a mano para comprobar cada salto. Un destino de MINIATURAS_ORIGENES es
+    # configuración del servidor y no pasa por comprobar_direccion (p. ej. un servidor local de pruebas)
+    maximo = _parametro("MINIATURAS_MAX_BYTES", 10 * 1024 * 1024)
+    for _ in range(MAX_REDIRECCIONES + 1):
+        comprobar_url(url)
+        destino = url_origen(url)
+        if destino == url:
+            comprobar_direccion(destino)
+        with requests.get(destino, timeout=_parametro("MINIATURAS_TIMEOUT", 10), stream=True,
+                          allow_redirects=False) as respuesta:
+            if respuesta.is_redirect:
+                url = urljoin(url, respuesta.headers["Location"])
+                continue
+            respuesta.raise_for_status()
+            datos = bytearray()
+            for trozo in respuesta.iter_content(TAM_TROZO):
+                datos += trozo
+                if len(datos) > maximo:
+                    raise ValueError(f"La imagen supera {maximo} bytes")
+        return bytes(datos)
+    raise ValueError(f"Más de {MAX_REDIRECCIONES} redirecciones")
+
+
+def _modulo_imagen():
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ImportError("Las miniaturas necesitan Pillow (pip install Pillow).")
+    return Image
+
+
+def redimensionar(datos, lado):
+    Image = _modulo_imagen()
+    with Image.open(BytesIO(datos)) as imagen:
+        imagen = imagen.convert("RGB")  # JPEG no admite transparencia ni paleta
+        imagen.thumbnail((lado, lado))
+        salida = BytesIO()
+        imagen.save(salida, FORMATO, quality=CALIDAD, optimize=True)
+    return salida.getvalue()
+
+
+def _escribir(ruta, datos):
+    # Fichero temporal y os.replace: dos peticiones que generan la misma miniatura no dejan un fichero a medias
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporal = tempfile.mkstemp(dir=ruta.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as destino:
+        destino.write(datos)
+    os.replace(temporal, ruta)
+
+
+def _completa(hash_contenido):
+    return all(ruta_archivo(nombre_archivo(hash_contenido, tamano)).exists() for tamano in tamanos())
+
+
+def generar(url, forzar=False):
+    """
+    Descarga url (una sola vez) y escribe sus miniaturas en todos los tamaños. Devuelve el hash del contenido.
+    Lanza ImportError sin Pillow, requests.RequestException si falla la descarga, ValueError si la URL no está
+    permitida y OSError/ValueError si el fichero no es una imagen válida.
+    """
+    if not forzar:
+        existente = hash_de_url(url)
+        if existente and _completa(existente):
+            return existente
+
+    _modulo_imagen()  # antes de descargar nada
+    datos = descargar(url)
+    hash_contenido = hashlib.sha256(datos).hexdigest()[:32]
+    for tamano, lado in tamanos().items():
+        ruta = ruta_archivo(nombre_archivo(hash_contenido, tamano))
+        if forzar or not ruta.exists():
+            _escribir(ruta, redimensionar(datos, lado))
+    _escribir(_ruta_indice(url), hash_contenido.encode())
+    cache.set(f"miniatura:{_clave_url(url)}", hash_contenido, 3600)
+    return hash_contenido
+
+
+def hash_disponible(url, tamano):
+    # Hash del contenido si la miniatura de ese tamaño ya está en disco; None si no
+    hash_contenido = hash_de_url(url)
+    if hash_contenido and ruta_archivo(nombre_archivo(hash_contenido, tamano)).exists():
+        return hash_contenido
+    return None
+
+
+def _clave_reserva(url):
+    return f"miniatura:reserva:{_clave_url(url)}"
+
+
+def reservar(url):
+    # True solo para la primera petición que la pide: las demás (y las de los ESPERA_REINTENTO segundos
+    # siguientes a un fallo) sirven la imagen original sin volver a encolarla
+    return cache.add(_clave_reserva(url), True, ESPERA_REINTENTO)
+
+
+def generar_reservada(url):
+    # Para tareas.en_segundo_plano tras reservar(url): si falla, la reserva se queda hasta el siguiente intento
+    try:
+        generar(url)
+    except Exception as e:
+        logger.warning("No se pudo generar la miniatura de %s: %s", url, e)
+        cache.set(_clave_reserva(url), True, ESPERA_REINTENTO)
+        return
+    cache.delete(_clave_reserva(url))
+
+
+def url_miniatura(bgg_id, url, tamano):
+    # Para las plantillas: el fichero con hash si ya existe (caché larga); si no, la vista que lo genera
+    if not url:
+        return ""
+    hash_contenido = hash_disponible(url, tamano)
+    if hash_contenido:
+        return reverse("archivo_miniatura", args=[nombre_archivo(hash_contenido, tamano)])
+    if bgg_id is None or bgg_id == "":
+        return url
+    return reverse("miniatura", args=[tamano, bgg_id])
+
+
+def generar_catalogo(juegos, concurrencia=None, forzar=False, progreso=None):
+    """
+    Genera las miniaturas de juegos ([(BGGId, ImagePath)]) con varias descargas a la vez. Las URL repetidas
+    se descargan una vez. Devuelve {"total", "generadas", "fallidas", "errores"} (hasta 20 errores).
+    """
+    _modulo_imagen()
+    urls = sorted({url for _, url in juegos if url})
+    resultado = {"total": len(urls), "generadas": 0, "fallidas": 0, "errores": []}
+
+    def una(url):
+        try:
+            generar(url, forzar=forzar)
+            return None
+        except Exception as e:  # una imagen rota (o demasiado grande para Pillow) no para el lote
+            return f"{url}: {e}"
+
+    with ThreadPoolExecutor(max_workers=concurrencia or _parametro("MINIATURAS_CONCURRENCIA", 8)) as executor:
+        for i, error in enumerate(executor.map(una, urls), start=1):
+            if error:
+                resultado["fallidas"] += 1
+                if len(resultado["errores"]) < 20:
+                    resultado["errores"].append(error)
+            else:
+                resultado["generadas"] += 1
+            if progreso and (i % 50 == 0 or i == len(urls)):
+                progreso({k: resultado[k] for k in ("total", "generadas", "fallidas")})
+    return resultado
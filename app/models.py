@@ -115,4 +115,49 @@ class Valoracion(models.Model):
 
     class Meta:
         managed = False
-        db_table = 'valoraciones'
\ No newline at end of file
+        db_table = 'valoraciones'
+
+class Tarea(models.Model):
+    # Trabajos en segundo plano (importación CSV, sincronización API); se guarda en la BD 'default'
+    PENDIENTE = 'pendiente'
+    EN_CURSO = 'en_curso'
+    COMPLETADA = 'completada'
+    FALLIDA = 'fallida'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (EN_CURSO, 'En curso'),
+        (COMPLETADA, 'Completada'),
+        (FALLIDA, 'Fallida'),
+    ]
+
+    tipo = models.CharField(max_length=50)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    usuario = models.CharField(max_length=100, blank=True)
+    progreso = models.JSONField(default=dict)
+    resultado = models.JSONField(default=dict)
+    error = models.TextField(blank=True)
+    creada = models.DateTimeField(auto_now_add=True)
+    actualizada = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'tareas'
+        ordering = ['-creada']
+
+    def __str__(self):
+        return f"#{self.pk} {self.tipo} ({self.estado})"
+
+    @property
+    def terminada(self):
+        return self.estado in (self.COMPLETADA, self.FALLIDA)
+
+    def to_dict(self):
+        return {
+            "id": self.pk,
+            "tipo": self.tipo,
+            "estado": self.estado,
+            "progreso": self.progreso,
+            "resultado": self.resultado,
+            "error": self.error,
+            "creada": self.creada.isoformat() if self.creada else None,
+            "actualizada": self.actualizada.isoformat() if self.actualizada else None,
+        }
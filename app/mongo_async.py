@@ -0,0 +1,61 @@
+import asyncio
+import threading
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+
+# Un AsyncMongoClient por proceso, compartido por todas las peticiones ASGI (su pool de conexiones incluido).
+# Queda ligado al bucle de eventos en el que se usa por primera vez, que bajo uvicorn/daphne es el del worker.
+_estado = {"cliente": None, "bucle": None, "nombre": None, "desactivado": False}
+_lock = threading.Lock()
+
+
+def _crear_cliente():
+    try:
+        from pymongo import AsyncMongoClient  # PyMongo >= 4.9
+    except ImportError:
+        return None
+    conexion = settings.DATABASES["mongodb"]
+    params = {"host": conexion.get("HOST") or None, **conexion.get("OPTIONS", {})}
+    if conexion.get("USER"):
+        params["username"] = conexion["USER"]
+    if conexion.get("PASSWORD"):
+        params["password"] = conexion["PASSWORD"]
+    if conexion.get("PORT"):
+        params["port"] = int(conexion["PORT"])
+    params.setdefault("maxPoolSize", getattr(settings, "MONGO_ASYNC_MAX_POOL", 100))
+    return AsyncMongoClient(**params)
+
+
+def usar_cliente(cliente, nombre):
+    # Sustituye el cliente compartido (benchmark con un Mongo local); cliente=None fuerza la ruta síncrona
+    with _lock:
+        _estado.update(cliente=cliente, bucle=None, nombre=nombre, desactivado=cliente is None)
+
+
+def restablecer():
+    with _lock:
+        _estado.update(cliente=None, bucle=None, nombre=None, desactivado=False)
+
+
+def base_async(request):
+    """
+    Base de datos del cliente asíncrono, o None si la vista debe usar la versión síncrona: petición WSGI
+    (cada una correría en un bucle nuevo), MONGO_ASYNC desactivado o PyMongo sin AsyncMongoClient.
+    """
+    if not getattr(settings, "MONGO_ASYNC", True) or not isinstance(request, ASGIRequest):
+        return None
+    bucle = asyncio.get_running_loop()
+    with _lock:
+        if _estado["desactivado"]:
+            return None
+        if _estado["cliente"] is None:
+            _estado["cliente"] = _crear_cliente()
+            if _estado["cliente"] is None:
+                _estado["desactivado"] = True
+                return None
+        if _estado["bucle"] is None:
+            _estado["bucle"] = bucle
+        if _estado["bucle"] is not bucle:
+            return None
+        return _estado["cliente"][_estado["nombre"] or settings.DATABASES["mongodb"]["NAME"]]
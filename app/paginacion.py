@@ -0,0 +1,108 @@
+import base64
+import json
+import math
+
+from app.busqueda import buscar_juegos
+
+SIGUIENTE = "sig"
+ULTIMA = "fin"
+POSICION = "pos"  # PaginadorLista: solo lleva el número de página
+# SIGUIENTE lleva además (Name, BGGId) para el keyset de /api/async/juegos/
+
+
+def codificar_cursor(direccion, numero, nombre=None, bgg_id=None):
+    datos = {"d": direccion, "p": numero}
+    if nombre is not None:
+        datos.update({"n": nombre, "id": bgg_id})
+    texto = json.dumps(datos, separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor):
+    # Un cursor ilegible equivale a la primera página, igual que Paginator.get_page con un número inválido
+    if not cursor:
+        return None
+    try:
+        texto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        datos = json.loads(texto)
+        if datos["d"] not in (SIGUIENTE, ULTIMA, POSICION):
+            return None
+        if datos["d"] == SIGUIENTE:
+            datos["n"], datos["id"] = str(datos["n"]), int(datos["id"])
+        datos["p"] = max(int(datos.get("p", 1)), 1)
+        return datos
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class PaginaKeyset:
+    # Misma interfaz que django.core.paginator.Page para las plantillas, con cursores en lugar de números
+    def __init__(self, object_list, paginator, number, cursor, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.number = number
+        self.cursor = cursor or ""
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def last_cursor(self):
+        return codificar_cursor(ULTIMA, self.paginator.num_pages or 1)
+
+
+class PaginadorLista:
+    # Pagina una lista de BGGId ya ordenada (p. ej. por relevancia) y carga solo los juegos de la página
+    def __init__(self, ids, per_page, cargar):
+        self.ids = ids
+        self.per_page = per_page
+        self.cargar = cargar
+        self.count = len(ids)
+
+    @property
+    def num_pages(self):
+        return max(math.ceil(self.count / self.per_page), 1)
+
+    def get_page(self, cursor):
+        datos = decodificar_cursor(cursor)
+        numero = 1
+        if datos and datos["d"] == ULTIMA:
+            numero = self.num_pages
+        elif datos:
+            numero = min(datos["p"], self.num_pages)
+
+        ids_pagina = self.ids[(numero - 1) * self.per_page:numero * self.per_page]
+        juegos = {juego.BGGId: juego for juego in self.cargar(ids_pagina)} if ids_pagina else {}
+        filas = [juegos[g] for g in ids_pagina if g in juegos]
+
+        siguiente = codificar_cursor(POSICION, numero + 1) if numero < self.num_pages else None
+        anterior = codificar_cursor(POSICION, numero - 1) if numero > 1 else None
+        return PaginaKeyset(filas, self, numero, cursor, siguiente, anterior)
+
+
+def paginar_juegos(catalogo, ids, per_page, cursor, busqueda=""):
+    """
+    Pagina BGGId de la instantánea del catálogo, que ya vienen en orden (Name, BGGId). Con texto de búsqueda,
+    el índice en memoria da el orden por relevancia y solo se quedan los juegos de ids.
+    """
+    if busqueda:
+        permitidos = set(ids)
+        ids = [g for g in buscar_juegos(busqueda) if g in permitidos]
+    return PaginadorLista(ids, per_page, cargar=catalogo.juegos).get_page(cursor)
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+
+from app.metricas import registrar_cache
+
+# Todas las vistas son @login_required: sin esto cada petición lee de SQLite la fila de la sesión y la del Usuario
+# antes de tocar Mongo. La sesión la resuelve SESSION_ENGINE (settings); aquí se cachea el Usuario.
+# Dentro de una petición ya lo reutiliza AuthenticationMiddleware (request.user es perezoso y se guarda en
+# request._cached_user); entre peticiones se guarda USUARIO_CACHE_TTL segundos en la caché compartida.
+
+
+def _ttl():
+    return getattr(settings, "USUARIO_CACHE_TTL", 60)
+
+
+def _clave(user_id):
+    return f"usuario:{user_id}"
+
+
+class BackendUsuarioCacheado(ModelBackend):
+    """
+    ModelBackend que sirve get_user desde la caché. Guardar o borrar un Usuario invalida su entrada en este
+    proceso; con LocMemCache y varios procesos el TTL acota cuánto puede durar una copia desfasada.
+    """
+
+    def get_user(self, user_id):
+        ttl = _ttl()
+        if not ttl:
+            return super().get_user(user_id)
+        clave = _clave(user_id)
+        usuario = cache.get(clave)
+        registrar_cache("usuario", usuario is not None)
+        if usuario is None:
+            usuario = super().get_user(user_id)
+            if usuario is not None:
+                cache.set(clave, usuario, ttl)
+        return usuario
+
+
+def invalidar_usuario(sender, instance, **kwargs):
+    # login() actualiza last_login con save(), así que cada inicio de sesión también refresca la copia
+    cache.delete(_clave(instance.pk))
+
+
+def conectar_senales():
+    modelo = get_user_model()
+    post_save.connect(invalidar_usuario, sender=modelo, dispatch_uid="sesiones_invalidar_guardado")
+    post_delete.connect(invalidar_usuario, sender=modelo, dispatch_uid="sesiones_invalidar_borrado")
@@ -0,0 +1,125 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from pymongo import UpdateOne
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CONFIG_POR_DEFECTO = {
+    "url": "https://freetestapi.com/api/v1/games",
+    "tam_pagina": 50,
+    "concurrencia": 4,
+    "timeout": 10,
+    "reintentos": 3,
+    "backoff": 0.5,
+    "max_paginas": 200,
+}
+
+# Los ids de la API se desplazan para no chocar con los BGGId reales
+DESPLAZAMIENTO_ID = 9000
+
+
+def configuracion(**cambios):
+    conf = dict(CONFIG_POR_DEFECTO)
+    conf.update(getattr(settings, "SINCRONIZACION_API", {}))
+    conf.update({k: v for k, v in cambios.items() if v is not None})
+    return conf
+
+
+def crear_sesion(conf):
+    # Sesión con pool de conexiones del tamaño de la concurrencia y reintentos con backoff exponencial
+    reintentos = Retry(
+        total=conf["reintentos"], backoff_factor=conf["backoff"],
+        status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET",)
+    )
+    adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=conf["concurrencia"], max_retries=reintentos)
+    sesion = requests.Session()
+    sesion.mount("http://", adaptador)
+    sesion.mount("https://", adaptador)
+    return sesion
+
+
+def descargar_pagina(sesion, conf, pagina):
+    response = sesion.get(
+        conf["url"], params={"page": pagina, "limit": conf["tam_pagina"]}, timeout=conf["timeout"]
+    )
+    response.raise_for_status()
+    datos = response.json()
+    if isinstance(datos, dict):
+        datos = datos.get("results", datos.get("data", []))
+    return datos or []
+
+
+def iterar_paginas(sesion, conf):
+    # Descarga las páginas en tandas de 'concurrencia' hasta encontrar una incompleta o vacía
+    with ThreadPoolExecutor(max_workers=conf["concurrencia"], thread_name_prefix="sincronizacion") as pool:
+        pagina = 1
+        while pagina <= conf["max_paginas"]:
+            tanda = list(range(pagina, min(pagina + conf["concurrencia"], conf["max_paginas"] + 1)))
+            futuros = [pool.submit(descargar_pagina, sesion, conf, num) for num in tanda]
+            for num, futuro in zip(tanda, futuros):
+                items = futuro.result()
+                yield num, items
+                if len(items) < conf["tam_pagina"]:
+                    return
+            pagina += len(tanda)
+
+
+def juego_desde_item(item):
+    return {
+        "BGGId": int(item.get('id', 0) + DESPLAZAMIENTO_ID),
+        "Name": item.get('title', 'Juego Desconocido'),
+        "Description": item.get('description', 'Sin descripción'),
+        "YearPublished": item.get('release_year', 2024),
+        "GameWeight": 2.5,
+        "AvgRating": item.get('rating', 0.0),
+        "MinPlayers": 1,
+        "MaxPlayers": 4,
+        "NumUserRatings": 0,
+        "NumExpansions": 0,
+        "Family": None,
+        "ImagePath": item.get('cover_image', ''),
+    }
+
+
+def guardar_pagina(db, items):
+    # Una consulta $in para toda la página y un bulk_write con los juegos que faltan
+    juegos = {}
+    for item in items:
+        juego = juego_desde_item(item)
+        juegos.setdefault(juego["BGGId"], juego)
+    if not juegos:
+        return 0
+
+    existentes = {doc["BGGId"] for doc in db.games.find({"BGGId": {"$in": list(juegos)}}, {"BGGId": 1})}
+    operaciones = [
+        # $setOnInsert: si otra sincronización lo insertó entretanto, no se duplica ni se pisa
+        UpdateOne({"BGGId": bgg_id}, {"$setOnInsert": {k: v for k, v in juego.items() if k != "BGGId"}}, upsert=True)
+        for bgg_id, juego in juegos.items() if bgg_id not in existentes
+    ]
+    if not operaciones:
+        return 0
+    return db.games.bulk_write(operaciones, ordered=False).upserted_count
+
+
+def sincronizar_juegos(db, progreso=None, sesion=None, **cambios):
+    # Devuelve {"paginas", "recibidos", "nuevos"}; un fallo de red tras los reintentos se propaga
+    conf = configuracion(**cambios)
+    sesion = sesion or crear_sesion(conf)
+    resultado = {"paginas": 0, "recibidos": 0, "nuevos": 0}
+
+    vistos = set()
+    for _, items in iterar_paginas(sesion, conf):
+        ids = {item.get('id') for item in items}
+        if ids and ids <= vistos:
+            # La API ignora el parámetro page y repite la misma página: no hay más datos
+            break
+        vistos |= ids
+        resultado["paginas"] += 1
+        resultado["recibidos"] += len(items)
+        resultado["nuevos"] += guardar_pagina(db, items)
+        if progreso:
+            progreso(dict(resultado))
+
+    return resultado
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from app.metricas import registrar_cache
+from app.models import Usuario
+
+CLAVE_CACHE = "supervision:resumen"
+USUARIOS_POR_PAGINA = 50
+VALORACIONES_RECIENTES = 10
+CAMPOS_USUARIO = ('pk', 'nombre', 'email', 'rol', 'is_active', 'last_login')
+
+
+def _ttl():
+    return getattr(settings, "SUPERVISION_CACHE_TTL", 30)
+
+
+def _cargar_resumen(db):
+    # Los totales salen de los metadatos de la colección (estimated_document_count), no de recorrerla
+    recientes = list(db.valoraciones.find(
+        {}, {"_id": 0, "usuario": 1, "estrellas": 1, "game_id": 1}
+    ).sort("_id", -1).limit(VALORACIONES_RECIENTES))
+    return {
+        "total_usuarios": Usuario.objects.count(),
+        "total_rankings": db.ranking.estimated_document_count(),
+        "total_valoraciones": db.valoraciones.estimated_document_count(),
+        "valoraciones_recientes": recientes,
+    }
+
+
+def resumen_supervision(db):
+    # Contadores y últimas valoraciones del panel en una sola entrada de caché de SUPERVISION_CACHE_TTL segundos
+    resumen = cache.get(CLAVE_CACHE)
+    registrar_cache("supervision", resumen is not None)
+    if resumen is None:
+        resumen = _cargar_resumen(db)
+        cache.set(CLAVE_CACHE, resumen, _ttl())
+    return resumen
+
+
+def pagina_usuarios(desde=None, por_pagina=USUARIOS_POR_PAGINA):
+    """
+    Página de usuarios por clave primaria (keyset): pk > desde, en orden. Devuelve (usuarios, siguiente),
+    donde siguiente es el pk desde el que empieza la página siguiente o None si es la última.
+    """
+    consulta = Usuario.objects.order_by('pk')
+    try:
+        if desde:
+            consulta = consulta.filter(pk__gt=int(desde))
+    except (TypeError, ValueError):
+        pass
+    usuarios = list(consulta.values(*CAMPOS_USUARIO)[:por_pagina + 1])
+    siguiente = usuarios[por_pagina - 1]['pk'] if len(usuarios) > por_pagina else None
+    return usuarios[:por_pagina], siguiente
@@ -0,0 +1,214 @@
+import importlib.util
+import logging
+import os
+import tempfile
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.utils import timezone
+
+from app.busqueda import reconstruir_indice
+from app.catalogo import invalidar_catalogo
+from app.models import Tarea
+
+logger = logging.getLogger(__name__)
+
+# Registro tipo -> función(tarea, *args). Las funciones devuelven el dict de resultado.
+FUNCIONES = {}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Tareas de este proceso esperando hilo o ejecutándose (para /metrics)
+_cola = {"pendiente": 0, "en_curso": 0}
+_cola_lock = threading.Lock()
+
+# Las tareas creadas antes de esto son de un proceso anterior (ver recuperar_interrumpidas)
+_ARRANQUE = timezone.now()
+
+
+class ErrorTarea(Exception):
+    # Fallo con resultado: la tarea queda fallida pero se guarda también el resultado (p. ej. errores por fila)
+    def __init__(self, mensaje, resultado):
+        super().__init__(mensaje)
+        self.resultado = resultado
+
+
+def registrar(tipo):
+    def decorador(funcion):
+        FUNCIONES[tipo] = funcion
+        return funcion
+    return decorador
+
+
+def recuperar_interrumpidas():
+    """
+    Marca como fallidas las tareas pendientes o en curso que ya no va a ejecutar nadie: la cola vive en memoria
+    y se pierde al reiniciar el proceso. Con TAREAS_ABANDONADAS_TRAS = 0 son todas las anteriores al arranque
+    (un solo proceso); con varios procesos, las que llevan ese número de segundos sin avanzar. No se reintentan
+    porque sus argumentos (el CSV subido) no se guardan: hay que lanzarlas de nuevo.
+    """
+    espera = getattr(settings, "TAREAS_ABANDONADAS_TRAS", 0)
+    limite = timezone.now() - timedelta(seconds=espera) if espera else _ARRANQUE
+    recuperadas = Tarea.objects.filter(
+        estado__in=[Tarea.PENDIENTE, Tarea.EN_CURSO], actualizada__lt=limite
+    ).update(estado=Tarea.FALLIDA, error="Interrumpida al reiniciar el servidor", actualizada=timezone.now())
+    if recuperadas:
+        logger.warning("%s tareas interrumpidas marcadas como fallidas", recuperadas)
+    return recuperadas
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            recuperar_interrumpidas()
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "TAREAS_MAX_WORKERS", 2),
+                thread_name_prefix="tareas"
+            )
+        return _executor
+
+
+def _mover_en_cola(origen, destino):
+    with _cola_lock:
+        if origen:
+            _cola[origen] -= 1
+        if destino:
+            _cola[destino] += 1
+
+
+def profundidad_cola():
+    with _cola_lock:
+        return dict(_cola)
+
+
+def actualizar_progreso(tarea, progreso):
+    tarea.progreso = progreso
+    # actualizada también: recuperar_interrumpidas distingue así las tareas que siguen avanzando
+    Tarea.objects.filter(pk=tarea.pk).update(progreso=progreso, actualizada=timezone.now())
+
+
+def _ejecutar(tarea_id, args):
+    _mover_en_cola("pendiente", "en_curso")
+    close_old_connections()
+    tarea = Tarea.objects.get(pk=tarea_id)
+    tarea.estado = Tarea.EN_CURSO
+    tarea.save(update_fields=["estado", "actualizada"])
+    try:
+        tarea.resultado = FUNCIONES[tarea.tipo](tarea, *args) or {}
+        tarea.estado = Tarea.COMPLETADA
+    except Exception as e:
+        logger.error("Tarea %s falló:\n%s", tarea_id, traceback.format_exc())
+        tarea.estado = Tarea.FALLIDA
+        tarea.error = str(e)
+        tarea.resultado = getattr(e, "resultado", None) or {}
+    finally:
+        _mover_en_cola("en_curso", None)
+        tarea.save(update_fields=["estado", "resultado", "error", "actualizada"])
+        # Cada hilo abre sus propias conexiones; las cerramos para no acumularlas
+        if not getattr(settings, "TAREAS_SINCRONAS", False):
+            connections.close_all()
+
+
+def encolar(tipo, *args, usuario=""):
+    if tipo not in FUNCIONES:
+        raise ValueError(f"Tipo de tarea desconocido: {tipo}")
+    tarea = Tarea.objects.create(tipo=tipo, usuario=usuario)
+    _mover_en_cola(None, "pendiente")
+    if getattr(settings, "TAREAS_SINCRONAS", False):
+        _ejecutar(tarea.pk, args)
+        tarea.refresh_from_db()
+    else:
+        _get_executor().submit(_ejecutar, tarea.pk, args)
+    return tarea
+
+
+def _ejecutar_funcion(funcion, args):
+    _mover_en_cola("pendiente", "en_curso")
+    try:
+        funcion(*args)
+    except Exception:
+        logger.error("%s falló:\n%s", funcion.__name__, traceback.format_exc())
+    finally:
+        _mover_en_cola("en_curso", None)
+        if not getattr(settings, "TAREAS_SINCRONAS", False):
+            connections.close_all()
+
+
+def en_segundo_plano(funcion, *args):
+    """
+    Trabajos cortos que no necesitan seguimiento (p. ej. generar la miniatura que acaba de pedir una página):
+    mismo executor y misma cola de /metrics que encolar, pero sin fila en Tarea para no llenar el panel.
+    Con TAREAS_SINCRONAS se ejecutan en el momento.
+    """
+    _mover_en_cola(None, "pendiente")
+    if getattr(settings, "TAREAS_SINCRONAS", False):
+        _ejecutar_funcion(funcion, args)
+    else:
+        _get_executor().submit(_ejecutar_funcion, funcion, args)
+
+
+def guardar_subida(archivo):
+    # El fichero subido desaparece al terminar la petición; lo copiamos a disco para la tarea
+    fd, ruta = tempfile.mkstemp(prefix="importacion_", suffix=".csv", dir=getattr(settings, "TAREAS_DIR", None))
+    with os.fdopen(fd, "wb") as destino:
+        for chunk in archivo.chunks():
+            destino.write(chunk)
+    return ruta
+
+
+@registrar("importar_csv")
+def tarea_importar_csv(tarea, ruta):
+    from app.importacion import importar_catalogo
+
+    try:
+        with open(ruta, "rb") as archivo:
+            resultado = importar_catalogo(
+                connections['mongodb'].database, archivo,
+                progreso=lambda r: actualizar_progreso(tarea, {
+                    "procesadas": r["procesadas"], "importadas": r["importadas"],
+                    "total_errores": r["total_errores"]
+                })
+            )
+    finally:
+        os.remove(ruta)
+    if not resultado["importadas"]:
+        raise ErrorTarea("El CSV no contiene ningún juego válido; el catálogo no se ha modificado.", resultado)
+    invalidar_catalogo()
+    reconstruir_indice()
+    encolar_miniaturas(tarea.usuario)
+    return resultado
+
+
+@registrar("sincronizar_api")
+def tarea_sincronizar_api(tarea):
+    from app.sincronizacion import sincronizar_juegos
+
+    resultado = sincronizar_juegos(
+        connections['mongodb'].database, progreso=lambda r: actualizar_progreso(tarea, r)
+    )
+    if resultado["nuevos"]:
+        invalidar_catalogo()
+        reconstruir_indice()
+        encolar_miniaturas(tarea.usuario)
+    return resultado
+
+
+def encolar_miniaturas(usuario=""):
+    # Tras cambiar el catálogo, las miniaturas nuevas se generan en bloque en otra tarea (si hay Pillow)
+    if getattr(settings, "MINIATURAS_TRAS_IMPORTAR", True) and importlib.util.find_spec("PIL"):
+        encolar("generar_miniaturas", usuario=usuario)
+
+
+@registrar("generar_miniaturas")
+def tarea_generar_miniaturas(tarea, forzar=False):
+    from app.catalogo import obtener_catalogo
+    from app.miniaturas import generar_catalogo
+
+    juegos = [(juego.BGGId, juego.ImagePath) for juego in obtener_catalogo().ordenados]
+    return generar_catalogo(juegos, forzar=forzar, progreso=lambda r: actualizar_progreso(tarea, r))
@@ -0,0 +1,11 @@
+from django import template
+
+from app.miniaturas import url_miniatura
+
+register = template.Library()
+
+
+@register.simple_tag
+def miniatura(bgg_id, url, tamano="tarjeta"):
+    # {% miniatura game.BGGId game.ImagePath "mini" as src %}; cadena vacía si el juego no tiene imagen
+    return url_miniatura(bgg_id, url, tamano)
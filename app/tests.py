@@ -1,3 +1,927 @@
-from django.test import TestCase
+import base64
+import importlib.util
+import json
+import os
+import tempfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from pathlib import Path
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+import requests
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from pymongo import MongoClient
+
+from app.benchmark import Contadores, mongo_sustituto
+from app.busqueda import IndiceJuegos, buscar_juegos, obtener_indice
+from app.catalogo import JuegoCatalogo, invalidar_catalogo, obtener_catalogo
+from app.categorias import obtener_categorias
+from app.estadisticas import (BACKENDS, COLECCION_AGREGADO, calcular_estadisticas, comprobar_agregado,
+                              eliminar_ranking_con_delta, guardar_ranking_con_delta, guardar_rankings_con_delta,
+                              reconstruir_agregado, valorar_con_delta)
+from app import consenso, importacion, metricas
+from app.miniaturas import generar, generar_catalogo, generar_reservada, nombre_archivo, ruta_archivo
+from app.models import Tarea, Usuario
+from app.paginacion import POSICION, ULTIMA, PaginadorLista, codificar_cursor, decodificar_cursor
+from app.sesiones import BackendUsuarioCacheado
+from app.sincronizacion import DESPLAZAMIENTO_ID, sincronizar_juegos
+from app.tareas import encolar, guardar_subida, recuperar_interrumpidas
+from app.views import _construir_mis_rankings
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+# Las pruebas usan un Mongo en memoria (mongomock, dependencia de desarrollo como en el benchmark);
+# la conexión 'mongodb' de settings no se toca
+requiere_mongomock = skipUnless(mongomock, "Las pruebas necesitan mongomock (pip install mongomock)")
+
+
+@requiere_mongomock
+class PruebaMongo(TestCase):
+    # Cada prueba tiene una base vacía, que también ven las vistas a través de connections['mongodb']
+
+    def setUp(self):
+        self.contadores = Contadores()
+        self.db = self.enterContext(mongo_sustituto(mongomock.MongoClient(), "pruebas", self.contadores))
+
+    def entrar(self, nombre="u", **campos):
+        usuario = Usuario.objects.create_user(f"{nombre}@pruebas.local", nombre, "cliente", "clave")
+        if campos:
+            Usuario.objects.filter(pk=usuario.pk).update(**campos)
+            usuario.refresh_from_db()
+        self.client.force_login(usuario)
+        return usuario
+
+
+@contextmanager
+def servidor_local(manejador):
+    # Servidor HTTP en un puerto libre de 127.0.0.1 que hace de API o de origen de imágenes; devuelve su URL base
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), manejador)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{servidor.server_port}"
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+class ManejadorSilencioso(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def _posiciones(*juegos):
+    return {str(i): {"id": g_id, "name": f"Juego {g_id}", "image": ""} for i, g_id in enumerate(juegos, start=1)}
+
+
+class AgregadoRankingTests(PruebaMongo):
+
+    def _guardar(self, user_id, categoria, positions):
+        guardar_ranking_con_delta(
+            self.db, {"user_id": user_id, "category_id": categoria},
+            {"$set": {"positions": positions, "category_id": categoria}}
+        )
+
+    def _agregado(self):
+        return {doc["_id"]: doc for doc in self.db[COLECCION_AGREGADO].find()}
+
+    def test_deltas_coinciden_con_la_reconstruccion(self):
+        self._guardar(1, "a", _posiciones(10, 20, 30))
+        self._guardar(2, "a", _posiciones(20, 10))
+        self._guardar(1, "a", _posiciones(30, 40))  # sustituye al primero
+        guardar_rankings_con_delta(self.db, 3, [("a", {"positions": _posiciones(40, 10)}),
+                                                ("b", {"positions": _posiciones(50)})])
+        eliminar_ranking_con_delta(self.db, {"user_id": 2, "category_id": "a"})
+        valorar_con_delta(self.db, {"game_id": 10, "usuario": "u1"}, {"$set": {"estrellas": 5, "comentario": "Bueno"}})
+        valorar_con_delta(self.db, {"game_id": 10, "usuario": "u1"}, {"$set": {"estrellas": 3, "comentario": ""}})
+
+        self.assertEqual(comprobar_agregado(self.db), [])
+        por_deltas = self._agregado()
+        self.assertEqual(por_deltas["10"]["suma_posiciones"], 2)
+        self.assertEqual(por_deltas["10"]["votos_3"], 1)
+        self.assertNotIn("20", {g for g, doc in por_deltas.items() if doc["apariciones"]})
+
+        reconstruir_agregado(self.db)
+        self.assertEqual(comprobar_agregado(self.db), [])
+        reconstruido = self._agregado()
+        for g_id, doc in reconstruido.items():
+            self.assertEqual(doc["media_posicion"], por_deltas[g_id]["media_posicion"])
+
+    def _valorar(self, usuario, estrellas, comentario=""):
+        valorar_con_delta(self.db, {"game_id": 10, "usuario": usuario},
+                          {"$set": {"estrellas": estrellas, "comentario": comentario}})
+
+    def test_cambiar_una_valoracion_mueve_el_histograma(self):
+        self._valorar("u1", 3, "Regular")
+        self._valorar("u2", 4, "Bien")
+        self._valorar("u1", 5, "Bueno")
+        doc = self._agregado()["10"]
+        self.assertEqual((doc["num_votos"], doc["suma_estrellas"]), (2, 9))
+        self.assertEqual([doc[f"votos_{n}"] for n in (3, 4, 5)], [0, 1, 1])
+        self.assertEqual([(c["usuario"], c["comentario"]) for c in doc["comentarios_top"]],
+                         [("u1", "Bueno"), ("u2", "Bien")])
+
+        self._valorar("u1", 5, "Muy bueno")  # sustituye su entrada, no añade otra
+        doc = self._agregado()["10"]
+        self.assertEqual([(c["usuario"], c["comentario"]) for c in doc["comentarios_top"]],
+                         [("u1", "Muy bueno"), ("u2", "Bien")])
+        self.assertEqual(comprobar_agregado(self.db), [])
+
+    def test_estrellas_guardadas_que_no_son_numero(self):
+        # El escaneo no cuenta esa valoración; al cambiarla se suma como voto nuevo sin restar nada
+        self.db.valoraciones.insert_one({"game_id": 10, "usuario": "u1", "estrellas": "muchas"})
+        self._valorar("u2", 4)
+        self._valorar("u1", 2)
+        doc = self._agregado()["10"]
+        self.assertEqual((doc["num_votos"], doc["suma_estrellas"], doc["votos_2"]), (2, 6, 1))
+        self.assertEqual(comprobar_agregado(self.db), [])
+
+    def test_nombre_e_imagen_no_se_evaluan(self):
+        positions = {"1": {"id": 7, "name": "$apariciones", "image": "$$ROOT"}}
+        self._guardar(1, "a", positions)
+        doc = self._agregado()["7"]
+        self.assertEqual((doc["nombre"], doc["imagen"]), ("$apariciones", "$$ROOT"))
+
+        reconstruir_agregado(self.db)
+        doc = self._agregado()["7"]
+        self.assertEqual((doc["nombre"], doc["imagen"]), ("$apariciones", "$$ROOT"))
+
+
+class GuardarRankingTests(PruebaMongo):
+
+    def setUp(self):
+        super().setUp()
+        self.entrar()
+        self.categoria = self.db.categoria.insert_one({"nombre": "Cat", "lista_juegos": [7]}).inserted_id
+
+    def test_rechaza_nombre_o_imagen_que_no_son_texto(self):
+        for juego in ({"id": 7, "name": {"$toUpper": "abc"}}, {"id": 7, "image": ["x"]}):
+            respuesta = self.client.post("/guardar_ranking/", json.dumps({
+                "category_id": str(self.categoria), "ranking": {"1": juego},
+            }), content_type="application/json")
+            self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(self.db[COLECCION_AGREGADO].count_documents({}), 0)
+
+        respuesta = self.client.post("/guardar_rankings/", json.dumps({"rankings": [
+            {"category_id": str(self.categoria), "ranking": {"1": {"id": 7, "name": {"$literal": 1}}}},
+        ]}), content_type="application/json")
+        self.assertEqual(respuesta.json()["resultados"][0]["status"], "error")
+
+
+class TareasTests(PruebaMongo):
+
+    def test_importacion_sin_filas_validas_guarda_los_errores(self):
+        ruta = guardar_subida(SimpleUploadedFile("juegos.csv", b"BGGId,Name\nx,A\n3,\n"))
+        with self.settings(TAREAS_SINCRONAS=True), self.assertLogs("app.tareas", "ERROR"):
+            tarea = encolar("importar_csv", ruta)
+        self.assertEqual(tarea.estado, Tarea.FALLIDA)
+        self.assertEqual([fila for fila, _ in tarea.resultado["errores"]], [2, 3])
+
+    def test_recupera_las_tareas_interrumpidas(self):
+        anterior = Tarea.objects.create(tipo="importar_csv", estado=Tarea.EN_CURSO)
+        Tarea.objects.filter(pk=anterior.pk).update(actualizada=timezone.now() - timedelta(hours=1))
+        actual = Tarea.objects.create(tipo="importar_csv")
+        self.assertEqual(recuperar_interrumpidas(), 1)
+        anterior.refresh_from_db()
+        actual.refresh_from_db()
+        self.assertEqual((anterior.estado, actual.estado), (Tarea.FALLIDA, Tarea.PENDIENTE))
+
+
+def _api_paginada(juegos, fallos):
+    # API de pruebas: ?page=&limit= sobre la lista juegos; fallos[page] = respuestas 503 antes de contestar bien
+    pedidas = Counter()
+
+    class Manejador(ManejadorSilencioso):
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            pagina, limite = int(query["page"][0]), int(query["limit"][0])
+            pedidas[pagina] += 1
+            if pedidas[pagina] <= fallos.get(pagina, 0):
+                self.send_response(503)
+                self.end_headers()
+                return
+            cuerpo = json.dumps(juegos[(pagina - 1) * limite:pagina * limite]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+    return Manejador, pedidas
+
+
+class SincronizacionTests(PruebaMongo):
+    juegos = [{"id": i, "title": f"Juego {i}"} for i in range(1, 8)]  # 7 juegos: páginas de 2 -> 4 páginas
+
+    def _sincronizar(self, url):
+        return sincronizar_juegos(self.db, url=url, tam_pagina=2, concurrencia=3, backoff=0, timeout=5)
+
+    def test_reintentos_tandas_y_sin_duplicados(self):
+        manejador, pedidas = _api_paginada(self.juegos, fallos={2: 2})
+        self.db.games.insert_one({"BGGId": DESPLAZAMIENTO_ID + 1, "Name": "Ya estaba"})
+
+        with servidor_local(manejador) as url:
+            resultado = self._sincronizar(url)
+            # La página 2 falla dos veces y se reintenta; la 4 viene incompleta y corta en la segunda tanda
+            # (4, 5, 6): no se llega a pedir la 7
+            self.assertEqual(resultado, {"paginas": 4, "recibidos": 7, "nuevos": 6})
+            self.assertEqual(pedidas[2], 3)
+            self.assertEqual(sorted(pedidas), [1, 2, 3, 4, 5, 6])
+
+            # Otra sincronización no inserta nada ni pisa el juego que ya existía
+            self.assertEqual(self._sincronizar(url)["nuevos"], 0)
+        self.assertEqual(self.db.games.count_documents({}), 7)
+        self.assertEqual(self.db.games.find_one({"BGGId": DESPLAZAMIENTO_ID + 1})["Name"], "Ya estaba")
+
+    def test_falla_tras_agotar_los_reintentos(self):
+        manejador, pedidas = _api_paginada(self.juegos, fallos={1: 10})
+        with servidor_local(manejador) as url, self.assertRaises(requests.RequestException):
+            self._sincronizar(url)
+        self.assertEqual(pedidas[1], 4)  # la petición y 3 reintentos
+        self.assertEqual(self.db.games.count_documents({}), 0)
+
+
+class ComentariosTests(PruebaMongo):
+
+    def setUp(self):
+        super().setUp()
+        self.entrar()
+        estrellas = [5, 3, 5, 4, 2, 4, 5]
+        self.db.valoraciones.insert_many(
+            [{"game_id": 5, "usuario": f"u{i}", "estrellas": e, "comentario": f"c{i}"} for i, e in enumerate(estrellas)]
+            + [{"game_id": 5, "usuario": "sin_texto", "estrellas": 5, "comentario": ""},
+               {"game_id": 6, "usuario": "otro", "estrellas": 5, "comentario": "otro juego"}]
+        )
+
+    def _recorrer(self, orden):
+        comentarios, cursor, paginas = [], "", 0
+        while True:
+            datos = self.client.get("/api/comentarios/5/", {"orden": orden, "limite": 3, "cursor": cursor}).json()
+            comentarios += datos["comentarios"]
+            paginas += 1
+            cursor = datos["siguiente"]
+            if not cursor:
+                return comentarios, paginas
+
+    def test_recorre_todas_las_paginas_sin_repetir(self):
+        recientes, paginas = self._recorrer("recientes")
+        self.assertEqual(paginas, 3)
+        self.assertEqual([c["comentario"] for c in recientes], [f"c{i}" for i in range(6, -1, -1)])
+
+        por_estrellas, _ = self._recorrer("estrellas")
+        self.assertEqual([(c["estrellas"], c["comentario"]) for c in por_estrellas], [
+            (5, "c6"), (5, "c2"), (5, "c0"), (4, "c5"), (4, "c3"), (3, "c1"), (2, "c4"),
+        ])
+
+    def test_cursor_con_operador_es_la_primera_pagina(self):
+        ultimo = self.db.valoraciones.find_one({"comentario": "c0"})
+        datos = {"o": "estrellas", "id": str(ultimo["_id"]), "e": {"$ne": None}}
+        cursor = base64.urlsafe_b64encode(json.dumps(datos).encode()).decode().rstrip("=")
+        respuesta = self.client.get("/api/comentarios/5/", {"orden": "estrellas", "limite": 3, "cursor": cursor})
+        self.assertEqual([c["comentario"] for c in respuesta.json()["comentarios"]], ["c6", "c2", "c0"])
+
+
+class CatalogoTests(PruebaMongo):
+
+    def setUp(self):
+        super().setUp()
+        self.db.games.insert_many([
+            {"BGGId": 1, "Name": "Catán", "YearPublished": 1995, "MinPlayers": 3, "MaxPlayers": 4},
+            {"BGGId": 2, "Name": "Azul", "YearPublished": 2017, "MinPlayers": 2, "MaxPlayers": 4},
+            {"BGGId": 3, "Name": "Brass", "YearPublished": 2017, "MinPlayers": 2, "MaxPlayers": 4},
+            {"BGGId": 4, "Name": "Dixit", "YearPublished": 2008, "MinPlayers": 3, "MaxPlayers": 6},
+            {"BGGId": 5, "Name": "Azul", "YearPublished": 2017, "MinPlayers": 2, "MaxPlayers": 4},
+            {"BGGId": 6, "Name": "Sin datos"},
+        ])
+
+    def test_filtros_por_year_y_jugadores(self):
+        catalogo = obtener_catalogo()
+        self.assertEqual(catalogo.filtrar(), [2, 5, 3, 1, 4, 6])  # por (Name, BGGId)
+        self.assertEqual(catalogo.filtrar(year=2017), [2, 5, 3])
+        self.assertEqual(catalogo.filtrar(year="2017", min_players=2, max_players=4), [2, 5, 3])
+        self.assertEqual(catalogo.filtrar(min_players=3), [1, 4])
+        self.assertEqual(catalogo.filtrar(max_players=4), [2, 5, 3, 1, 6])
+        self.assertEqual(catalogo.filtrar(min_players=3, max_players=5), [1])
+        self.assertEqual(catalogo.filtrar(year=1990), [])
+        self.assertEqual(catalogo.filtrar(year="x", min_players=""), catalogo.filtrar())
+        self.assertEqual(catalogo.filtrar(year=2017, ids=[3, 4, 99], excluir=[5]), [3])
+
+    def test_siguientes_continua_tras_el_cursor(self):
+        catalogo = obtener_catalogo()
+        self.assertEqual([j.BGGId for j in catalogo.siguientes(None, None, 2)], [2, 5])
+        self.assertEqual([j.BGGId for j in catalogo.siguientes("Azul", 5, 2)], [3, 1])
+        self.assertEqual(catalogo.siguientes("Sin datos", 6, 2), [])
+
+    def test_se_rehace_al_cambiar_la_version_o_caducar(self):
+        catalogo = obtener_catalogo()
+        self.assertIs(obtener_catalogo(), catalogo)
+
+        self.db.games.insert_one({"BGGId": 7, "Name": "Eclipse"})
+        self.assertIsNone(obtener_catalogo().juego(7))
+        invalidar_catalogo()
+        nuevo = obtener_catalogo()
+        self.assertIsNot(nuevo, catalogo)
+        self.assertEqual(nuevo.juego(7).Name, "Eclipse")
+
+        with self.settings(CATALOGO_TTL=0), mock.patch("app.catalogo.time.monotonic", return_value=nuevo.creado + 1):
+            self.assertIsNot(obtener_catalogo(), nuevo)
+
+
+class PaginadorListaTests(SimpleTestCase):
+
+    def setUp(self):
+        self.cargadas = []
+
+        def cargar(ids):
+            self.cargadas.append(list(ids))
+            return [JuegoCatalogo({"BGGId": g, "Name": str(g)}) for g in ids if g != 4]
+
+        self.paginador = PaginadorLista([7, 1, 4, 3, 9, 2, 8], 3, cargar)
+
+    def _ids(self, pagina):
+        return [juego.BGGId for juego in pagina]
+
+    def test_ida_y_vuelta_con_cursores(self):
+        primera = self.paginador.get_page(None)
+        self.assertEqual((primera.number, self._ids(primera)), (1, [7, 1]))  # el 4 ya no existe
+        self.assertFalse(primera.has_previous())
+
+        segunda = self.paginador.get_page(primera.next_cursor)
+        tercera = self.paginador.get_page(segunda.next_cursor)
+        self.assertEqual((segunda.number, self._ids(segunda)), (2, [3, 9, 2]))
+        self.assertEqual((tercera.number, self._ids(tercera)), (3, [8]))
+        self.assertFalse(tercera.has_next())
+        self.assertEqual(self._ids(self.paginador.get_page(tercera.previous_cursor)), [3, 9, 2])
+        self.assertEqual(self.cargadas[:3], [[7, 1, 4], [3, 9, 2], [8]])  # solo los juegos de cada página
+
+    def test_ultima_y_cursores_fuera_de_rango(self):
+        self.assertEqual(self.paginador.get_page(None).last_cursor, codificar_cursor(ULTIMA, 3))
+        self.assertEqual(self.paginador.get_page(codificar_cursor(ULTIMA, 1)).number, 3)
+        self.assertEqual(self.paginador.get_page(codificar_cursor(POSICION, 50)).number, 3)
+        self.assertEqual(self.paginador.get_page("no-es-un-cursor").number, 1)
+        # "ant" era una dirección que nunca se generaba: ahora es un cursor ilegible
+        self.assertIsNone(decodificar_cursor(codificar_cursor("ant", 2, "Azul", 5)))
+
+    def test_lista_vacia(self):
+        pagina = PaginadorLista([], 3, cargar=lambda ids: self.fail("no debería cargar nada")).get_page(None)
+        self.assertEqual((pagina.number, len(pagina), pagina.has_other_pages()), (1, 0, False))
+
+
+def _sembrar_irregulares(db):
+    # Datos con las irregularidades que el escaneo admite: ids como texto o no numéricos, estrellas como texto,
+    # nulas o sin campo, más comentarios top de los que se muestran y juegos repetidos en una categoría
+    db.games.insert_many([{"BGGId": g, "Name": f"Juego {g}", "ImagePath": ""} for g in (1, 2, 3)])
+    db.ranking.insert_many([
+        {"positions": {"1": {"id": "1", "name": "Uno"}, "2": {"id": 2}, "3": None, "x": {"id": 3}}},
+        {"positions": {"1": {"id": "promo-a", "name": "Promo"}, "2": {"id": 1, "name": "Otro nombre"}}},
+    ])
+    db.valoraciones.insert_many([
+        {"game_id": 1, "usuario": "a", "estrellas": 5, "comentario": "viejo"},
+        {"game_id": "1", "usuario": "b", "estrellas": "4.5", "comentario": "texto"},
+        {"game_id": 1, "usuario": "c", "estrellas": 4, "comentario": "nuevo"},
+        {"game_id": 2, "usuario": "a", "estrellas": None, "comentario": "nulo"},
+        {"game_id": 2, "usuario": "b", "comentario": "sin estrellas"},
+        {"game_id": 2, "usuario": "c", "estrellas": "mal", "comentario": "ilegible"},
+        {"game_id": "promo-a", "usuario": "a", "estrellas": 5, "comentario": "promo"},
+        {"game_id": 3, "usuario": "a", "estrellas": 3, "comentario": "regular"},
+    ])
+    db.categoria.insert_many([
+        {"nombre": "Cat", "lista_juegos": [1, 2, "promo-a"]},
+        {"nombre": "Repetidos", "lista_juegos": ["3", 3, 2]},
+    ])
+
+
+class EstadisticasNumpyTests(PruebaMongo):
+
+    @skipUnless("numpy" in BACKENDS, "El backend numpy necesita numpy (pip install numpy)")
+    def test_coincide_con_el_escaneo(self):
+        _sembrar_irregulares(self.db)
+        escaneo = calcular_estadisticas(self.db, "escaneo")
+        self.assertEqual(calcular_estadisticas(self.db, "numpy"), escaneo)
+        juego_1 = next(j for j in escaneo["juegos_votos"] if j["nombre"] == "Juego 1")
+        self.assertEqual((juego_1["total_votos"], juego_1["comentarios"]), (3, ["nuevo", "texto"]))
+        repetidos = next(c for c in escaneo["promedios_categoria"] if c["nombre"] == "Repetidos")
+        self.assertEqual(repetidos["volumen"], 3)  # el voto de 3 dos veces y el de 2 sin campo estrellas
+
+
+# mongomock no implementa $convert: el backend pipeline solo se puede probar contra un servidor de verdad
+PRUEBAS_MONGO_URI = os.environ.get("PRUEBAS_MONGO_URI")
+
+
+@skipUnless(PRUEBAS_MONGO_URI, "Necesita un MongoDB real: PRUEBAS_MONGO_URI=mongodb://localhost:27017")
+class EstadisticasPipelineTests(TestCase):
+
+    def setUp(self):
+        cliente = MongoClient(PRUEBAS_MONGO_URI)
+        self.addCleanup(cliente.close)
+        self.db = self.enterContext(mongo_sustituto(cliente, "juegosrankings_pruebas", Contadores()))
+
+    def test_coincide_con_el_escaneo(self):
+        _sembrar_irregulares(self.db)
+        self.assertEqual(calcular_estadisticas(self.db, "pipeline"), calcular_estadisticas(self.db, "escaneo"))
+
+
+class ConsensoTests(SimpleTestCase):
+    # Puntuaciones calculadas a mano para tres rankings pequeños
+    listas = [["a", "b", "c"], ["a", "c"], ["b", "a", "c"]]
+
+    def _redondear(self, puntuaciones):
+        return {g: round(p, 4) for g, p in puntuaciones.items()}
+
+    def test_media_usa_el_puesto_guardado(self):
+        self.assertEqual(consenso.media([["a", "b"], ["b"]], [[1, 5], [2]]), {"a": 1.0, "b": 3.5})
+        self.assertEqual(consenso.media([["a", "b"], ["b"]]), {"a": 1.0, "b": 1.5})
+
+    def test_borda(self):
+        # (k - p + 1) / k: a = 1 + 1 + 2/3, b = 2/3 + 1, c = 1/3 + 1/2 + 1/3
+        self.assertEqual(self._redondear(consenso.borda(self.listas)), {"a": 2.6667, "b": 1.6667, "c": 1.1667})
+
+    @override_settings(CONSENSO_PRIOR=3)
+    def test_bayesiana(self):
+        # Posiciones relativas a: 0, 0, 0.5; b: 0.5, 0; c: 1, 1, 1; media global 4/8. 1 - (suma + 3 * 0.5) / (n + 3)
+        self.assertEqual(self._redondear(consenso.bayesiana(self.listas)), {"a": 0.6667, "b": 0.6, "c": 0.25})
+
+    def test_schulze(self):
+        # a y b empatan (1 a 1) y ambos ganan a c: un duelo cada uno más Borda / (rankings + 1)
+        self.assertEqual(self._redondear(consenso.schulze(self.listas)), {"a": 1.6667, "b": 1.4167, "c": 0.2917})
+
+        # Ciclo a > b (5-2), b > c (5-2), c > a (4-3): por el camino más fuerte a > c vale 5 y gana
+        ciclo = [["a", "b", "c"]] * 3 + [["b", "c", "a"]] * 2 + [["c", "a", "b"]] * 2
+        self.assertEqual({g: int(p) for g, p in consenso.schulze(ciclo).items()}, {"a": 2, "b": 1, "c": 0})
+
+    def test_plackett_luce(self):
+        # Con un solo duelo y el prior Gamma(2, 1) el punto fijo es a = 2s / (1 + s), b = s / (1 + s), s = 2
+        fuerza = consenso.plackett_luce([["a", "b"]])
+        self.assertAlmostEqual(fuerza["a"], 4 / 3, places=4)
+        self.assertAlmostEqual(fuerza["b"], 2 / 3, places=4)
+
+        fuerza = consenso.plackett_luce(self.listas)
+        self.assertEqual(sorted(fuerza, key=fuerza.get, reverse=True), ["a", "b", "c"])
+
+
+class CalcularConsensoTests(PruebaMongo):
+
+    def test_media_con_huecos_en_los_puestos(self):
+        self.db.ranking.insert_many([
+            {"positions": {"1": {"id": 1, "name": "A"}, "3": {"id": 2, "name": "B"}}},
+            {"positions": {"2": {"id": 2, "name": "B"}}},
+        ])
+        resultado = consenso.calcular_consenso(self.db, "media")
+        self.assertEqual([(r["nombre"], r["puntuacion"], r["apariciones"]) for r in resultado],
+                         [("A", 1.0, 1), ("B", 2.5, 2)])
+
+
+def _png(color, lado=600):
+    from PIL import Image
+
+    salida = BytesIO()
+    Image.new("RGB", (lado, lado // 2), color).save(salida, "PNG")
+    return salida.getvalue()
+
+
+def _origen_imagenes(archivos):
+    # Servidor de imágenes de pruebas: archivos = {ruta: bytes o URL a la que redirigir}; el resto da 404
+    pedidas = Counter()
+
+    class Manejador(ManejadorSilencioso):
+        def do_GET(self):
+            pedidas[self.path] += 1
+            if self.path not in archivos:
+                self.send_response(404)
+                self.end_headers()
+                return
+            if isinstance(archivos[self.path], str):
+                self.send_response(302)
+                self.send_header("Location", archivos[self.path])
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(archivos[self.path])))
+            self.end_headers()
+            self.wfile.write(archivos[self.path])
+
+    return Manejador, pedidas
+
+
+ORIGEN = "https://imagenes.pruebas"
+
+
+@skipUnless(importlib.util.find_spec("PIL"), "Las miniaturas necesitan Pillow (pip install Pillow)")
+class MiniaturasTests(PruebaMongo):
+    # Las URL del catálogo apuntan a ORIGEN y MINIATURAS_ORIGENES las lleva al servidor local
+
+    def setUp(self):
+        super().setUp()
+        roja = _png("red")
+        manejador, self.pedidas = _origen_imagenes({
+            "/roja.png": roja, "/copia.png": roja, "/azul.png": _png("blue"), "/rota.png": b"no es una imagen",
+            "/salto.png": "/roja.png",
+        })
+        self.local = self.enterContext(servidor_local(manejador))
+        directorio = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(self.settings(
+            MINIATURAS_DIR=Path(directorio), MINIATURAS_ORIGENES={ORIGEN: self.local},
+            MINIATURAS_HOSTS=["imagenes.pruebas"], MINIATURAS_TAMANOS={"mini": 150, "tarjeta": 320},
+            TAREAS_SINCRONAS=True,
+        ))
+
+    def test_generar_guarda_cada_tamano_una_vez_por_contenido(self):
+        from PIL import Image
+
+        hash_roja = generar(f"{ORIGEN}/roja.png")
+        for tamano, lado in (("mini", 150), ("tarjeta", 320)):
+            with Image.open(ruta_archivo(nombre_archivo(hash_roja, tamano))) as imagen:
+                self.assertEqual((imagen.format, max(imagen.size)), ("JPEG", lado))
+
+        # Ya generada: no se vuelve a descargar; otra URL con el mismo contenido da el mismo fichero
+        self.assertEqual(generar(f"{ORIGEN}/roja.png"), hash_roja)
+        self.assertEqual(self.pedidas["/roja.png"], 1)
+        self.assertEqual(generar(f"{ORIGEN}/copia.png"), hash_roja)
+        self.assertNotEqual(generar(f"{ORIGEN}/azul.png"), hash_roja)
+
+    def test_generar_catalogo_sigue_tras_los_fallos(self):
+        juegos = [(1, f"{ORIGEN}/roja.png"), (2, f"{ORIGEN}/roja.png"), (3, f"{ORIGEN}/azul.png"),
+                  (4, f"{ORIGEN}/rota.png"), (5, f"{ORIGEN}/no_existe.png"), (6, "")]
+        resultado = generar_catalogo(juegos, concurrencia=2)
+        self.assertEqual({k: resultado[k] for k in ("total", "generadas", "fallidas")},
+                         {"total": 4, "generadas": 2, "fallidas": 2})
+        self.assertEqual(self.pedidas["/roja.png"], 1)
+
+    def test_vista_redirige_al_fichero_o_a_la_imagen_original(self):
+        self.entrar()
+        self.db.games.insert_many([
+            {"BGGId": 1, "Name": "Roja", "ImagePath": f"{ORIGEN}/roja.png"},
+            {"BGGId": 2, "Name": "Rota", "ImagePath": f"{ORIGEN}/rota.png"},
+        ])
+
+        respuesta = self.client.get("/miniaturas/mini/1/")
+        self.assertEqual(respuesta.status_code, 302)
+        archivo = self.client.get(respuesta["Location"])
+        self.assertEqual(archivo["Content-Type"], "image/jpeg")
+        self.assertIn("immutable", archivo["Cache-Control"])
+        archivo.close()
+
+        # Una imagen rota redirige a la original y el fallo se recuerda: la segunda vez no se descarga
+        with self.assertLogs("app.miniaturas", "WARNING"):
+            respuesta = self.client.get("/miniaturas/mini/2/")
+        self.assertEqual(respuesta["Location"], f"{ORIGEN}/rota.png")
+        self.client.get("/miniaturas/mini/2/")
+        self.assertEqual(self.pedidas["/rota.png"], 1)
+
+        self.assertEqual(self.client.get("/miniaturas/enorme/1/").status_code, 404)
+        self.assertEqual(self.client.get("/miniaturas/mini/3/").status_code, 404)
+
+    def test_vista_genera_en_segundo_plano_una_vez(self):
+        self.entrar()
+        self.db.games.insert_one({"BGGId": 1, "Name": "Roja", "ImagePath": f"{ORIGEN}/roja.png"})
+        with self.settings(TAREAS_SINCRONAS=False), mock.patch("app.views.en_segundo_plano") as en_segundo_plano:
+            for _ in range(2):
+                self.assertEqual(self.client.get("/miniaturas/mini/1/")["Location"], f"{ORIGEN}/roja.png")
+        en_segundo_plano.assert_called_once_with(generar_reservada, f"{ORIGEN}/roja.png")
+        self.assertEqual(self.pedidas["/roja.png"], 0)
+
+    def test_solo_descarga_de_hosts_permitidos_y_publicos(self):
+        for url in ("ftp://imagenes.pruebas/roja.png", "https://otro.host/roja.png", "file:///etc/passwd",
+                    f"{self.local}/roja.png"):
+            with self.subTest(url=url), self.assertRaises(ValueError):
+                generar(url)
+        with self.settings(MINIATURAS_HOSTS=["imagenes.pruebas", "127.0.0.1", "localhost"]):
+            for url in (f"{self.local}/roja.png", self.local.replace("127.0.0.1", "localhost") + "/roja.png"):
+                with self.subTest(url=url), self.assertRaisesRegex(ValueError, "no pública"):
+                    generar(url)
+        self.assertEqual(self.pedidas["/roja.png"], 0)
+
+    def test_cada_redireccion_se_comprueba(self):
+        # Una redirección relativa sigue en el mismo host; una a otro host no se sigue
+        self.assertEqual(generar(f"{ORIGEN}/salto.png"), generar(f"{ORIGEN}/roja.png"))
+        with mock.patch("app.miniaturas.requests.get") as get:
+            get.return_value.__enter__.return_value = mock.Mock(
+                is_redirect=True, headers={"Location": f"{self.local}/roja.png"}
+            )
+            with self.assertRaisesRegex(ValueError, "no permitido"):
+                generar(f"{ORIGEN}/otra.png")
+        get.assert_called_once()
+
+    def test_la_tarjeta_cambia_al_generar_la_miniatura(self):
+        self.entrar()
+        self.db.games.insert_one({"BGGId": 1, "Name": "Roja", "ImagePath": f"{ORIGEN}/roja.png"})
+        self.assertContains(self.client.get("/ver_juegos/"), 'src="/miniaturas/tarjeta/1/"')
+        hash_roja = generar(f"{ORIGEN}/roja.png")
+        self.assertContains(self.client.get("/ver_juegos/"),
+                            f'src="/miniaturas/archivo/{nombre_archivo(hash_roja, "tarjeta")}"')
+
+
+class ResolucionPorLotesTests(PruebaMongo):
+
+    def setUp(self):
+        super().setUp()
+        self.usuario = self.entrar()
+        self.db.games.insert_many([
+            {"BGGId": g, "Name": f"Juego {g}", "ImagePath": f"https://img/{g}.png"} for g in (1, 2, 3)
+        ])
+        self.categoria = self.db.categoria.insert_one({"nombre": "Cat", "lista_juegos": [1, 2, 3]}).inserted_id
+
+    def _ranking(self, positions, **campos):
+        campos.setdefault("category_id", self.categoria)
+        return self.db.ranking.insert_one({
+            "user": "u", "user_id": self.usuario.pk, "category_name": "Cat", "positions": positions, **campos
+        }).inserted_id
+
+    def _mis_rankings(self):
+        obtener_catalogo()
+        obtener_categorias()
+        self.contadores.reiniciar()
+        rankings = _construir_mis_rankings(self.db, self.usuario.pk)
+        return rankings, self.contadores.mongo
+
+    def test_mis_rankings_resuelve_ids_mezclados_y_que_faltan(self):
+        # Ids como texto y como número, uno que no está en el catálogo, uno que no es un número y huecos;
+        # el ranking antiguo guarda el id suelto y solo el nombre de la categoría
+        con_categoria = self._ranking({"1": {"id": "2"}, "2": {"id": 999}, "3": None, "4": {"id": "abc"},
+                                       "5": {"id": 1}, "11": {"id": 3}})
+        antiguo = self._ranking({"1": "3", "2": "null"}, category_id=None)
+        self._ranking({"1": {"id": 999}})  # ningún juego del catálogo: no se muestra
+
+        rankings, consultas = self._mis_rankings()
+        self.assertEqual(rankings, [
+            {"ranking_id": str(con_categoria), "categoria_id": self.categoria, "categoria": "Cat", "juegos": [
+                {"puesto": 1, "bgg_id": 2, "nombre": "Juego 2", "imagen": "https://img/2.png"},
+                {"puesto": 5, "bgg_id": 1, "nombre": "Juego 1", "imagen": "https://img/1.png"},
+            ]},
+            {"ranking_id": str(antiguo), "categoria_id": str(self.categoria), "categoria": "Cat", "juegos": [
+                {"puesto": 1, "bgg_id": 3, "nombre": "Juego 3", "imagen": "https://img/3.png"},
+            ]},
+        ])
+        self.assertEqual(consultas, 1)  # solo la de ranking: juegos y categorías salen de las instantáneas
+
+        # Más rankings no son más consultas
+        for _ in range(5):
+            self._ranking({"1": {"id": 1}, "2": {"id": "2"}, "3": {"id": 3}})
+        rankings, consultas = self._mis_rankings()
+        self.assertEqual((len(rankings), consultas), (7, 1))
+
+    def test_mis_rankings_por_user_id_aunque_se_repita_el_nombre(self):
+        propio = self._ranking({"1": {"id": 1}})
+        tocayo = Usuario.objects.create_user("otro@pruebas.local", "u", "cliente", "clave")
+        ajeno = self._ranking({"1": {"id": 2}}, user_id=tocayo.pk, category_id=None)
+
+        respuesta = self.client.get("/mis_rankings/")
+        self.assertEqual([r["ranking_id"] for r in respuesta.context["rankings"]], [str(propio)])
+        self.client.force_login(tocayo)
+        respuesta = self.client.get("/mis_rankings/")
+        self.assertEqual([r["ranking_id"] for r in respuesta.context["rankings"]], [str(ajeno)])
+
+    def test_crear_ranking_refresca_nombres_e_imagenes(self):
+        self._ranking({"1": {"id": "1", "name": "Viejo", "image": ""}, "2": {"id": 999, "name": "Borrado"},
+                       "3": None})
+        respuesta = self.client.get(f"/crear_ranking/{self.categoria}/")
+        self.assertEqual(json.loads(respuesta.context["ranking_previo"]), {
+            "1": {"id": "1", "name": "Juego 1", "image": "https://img/1.png"},
+            "2": {"id": 999, "name": "Borrado"},
+            "3": None,
+        })
+
+
+def _csv(*filas):
+    return BytesIO(("BGGId,Name,YearPublished,AvgRating\n" + "\n".join(filas) + "\n").encode("utf-8-sig"))
+
+
+class ImportacionTests(PruebaMongo):
+
+    def setUp(self):
+        super().setUp()
+        self.db.games.insert_one({"BGGId": 99, "Name": "Catálogo anterior"})
+
+    def _colecciones_temporales(self):
+        return [c for c in self.db.list_collection_names() if c.startswith(importacion.PREFIJO_STAGING)]
+
+    def test_importa_por_lotes_y_sustituye_el_catalogo(self):
+        progreso = []
+        resultado = importacion.importar_catalogo(
+            self.db, _csv("1,Uno,2001,7.5", "2,Dos,,", "x,Mal,2003,1", "3,,2004,1", "4,Cuatro,2004,abc",
+                          "5,Cinco,2005,8", "6,Seis,2006,6"),
+            tam_lote=2, progreso=lambda r: progreso.append(r["importadas"])
+        )
+        self.assertEqual(progreso, [2, 4, 4])
+        self.assertEqual({k: resultado[k] for k in ("procesadas", "importadas", "total_errores")},
+                         {"procesadas": 7, "importadas": 4, "total_errores": 3})
+        self.assertEqual([fila for fila, _ in resultado["errores"]], [4, 5, 6])
+        self.assertIn("BGGId", resultado["errores"][0][1])
+
+        # El catálogo anterior se sustituye entero (dropTarget), con sus índices y sin colecciones temporales
+        self.assertEqual(sorted(doc["BGGId"] for doc in self.db.games.find()), [1, 2, 5, 6])
+        self.assertEqual(self.db.games.find_one({"BGGId": 2})["YearPublished"], 0)
+        self.assertIn("Name_BGGId", self.db.games.index_information())
+        self.assertEqual(self._colecciones_temporales(), [])
+
+    def test_guarda_como_mucho_max_errores(self):
+        with mock.patch.object(importacion, "MAX_ERRORES_GUARDADOS", 2):
+            resultado = importacion.importar_catalogo(self.db, _csv("x,A,,", "y,B,,", "z,C,,", "1,Uno,,"))
+        self.assertEqual((resultado["total_errores"], len(resultado["errores"])), (3, 2))
+
+    def test_sin_filas_validas_no_toca_el_catalogo(self):
+        resultado = importacion.importar_catalogo(self.db, _csv("x,A,,", "2,,,"))
+        self.assertEqual(resultado["importadas"], 0)
+        self.assertEqual([doc["Name"] for doc in self.db.games.find()], ["Catálogo anterior"])
+        self.assertEqual(self._colecciones_temporales(), [])
+
+    def test_un_fallo_a_medias_borra_la_coleccion_temporal(self):
+        def fallar(resultado):
+            raise RuntimeError("fallo en el segundo lote")
+
+        with self.assertRaises(RuntimeError):
+            importacion.importar_catalogo(self.db, _csv("1,Uno,,", "2,Dos,,", "3,Tres,,"), tam_lote=2,
+                                          progreso=fallar)
+        self.assertEqual([doc["Name"] for doc in self.db.games.find()], ["Catálogo anterior"])
+        self.assertEqual(self._colecciones_temporales(), [])
+
+
+class IndiceJuegosTests(SimpleTestCase):
+
+    def setUp(self):
+        self.indice = IndiceJuegos([
+            (1, "Catán", "Comercio en una isla"),
+            (2, "Catacumbas", "Exploración"),
+            (3, "Carcassonne", "Losetas de Catán y castillos"),
+            (4, "Ticket to Ride", "Trenes por Europa"),
+            (5, "Ride the Rails", "Trenes"),
+            (6, "7 Wonders", "Cartas"),
+        ])
+
+    def test_acentos_y_mayusculas(self):
+        self.assertEqual(self.indice.buscar("CATAN")[0], 1)
+        self.assertEqual(self.indice.buscar("exploracion"), [2])
+
+    def test_prefijos_y_relevancia(self):
+        # Nombre completo (3) > prefijo en el nombre (3 * 0.7) > palabra en la descripción (1)
+        self.assertEqual(self.indice.buscar("catan"), [1, 3])
+        self.assertEqual(self.indice.buscar("cata"), [2, 1, 3])  # empate entre prefijos: por nombre
+        self.assertEqual(self.indice.buscar("trenes"), [5, 4])
+
+    def test_todas_las_palabras_deben_aparecer(self):
+        self.assertEqual(self.indice.buscar("ride ticket"), [4])
+        self.assertEqual(self.indice.buscar("ride trenes"), [5, 4])  # empate: por nombre
+
+    def test_subcadena_si_no_hay_palabras(self):
+        self.assertEqual(self.indice.buscar("cassonn"), [3])
+        self.assertEqual(self.indice.buscar("et to r"), [4])
+        self.assertEqual(self.indice.buscar("zzz"), [])
+        self.assertEqual(self.indice.buscar("  ¿? "), [])
+
+
+class BusquedaCatalogoTests(PruebaMongo):
+
+    def test_se_rehace_al_cambiar_el_catalogo(self):
+        self.db.games.insert_one({"BGGId": 1, "Name": "Azul", "Description": ""})
+        self.assertEqual(buscar_juegos("azul"), [1])
+        indice = obtener_indice()
+        self.assertIs(obtener_indice(), indice)
+
+        self.db.games.insert_one({"BGGId": 2, "Name": "Azul: Pabellón", "Description": ""})
+        self.assertEqual(buscar_juegos("azul"), [1])  # sin invalidar sigue la instantánea anterior
+        invalidar_catalogo()
+        self.assertEqual(buscar_juegos("azul"), [1, 2])
+        self.assertIsNot(obtener_indice(), indice)
+
+    def test_se_rehace_al_caducar(self):
+        self.db.games.insert_one({"BGGId": 1, "Name": "Azul", "Description": ""})
+        indice = obtener_indice()
+        with self.settings(BUSQUEDA_TTL=0), mock.patch("app.busqueda.time.monotonic", return_value=indice.creado + 1):
+            self.assertIsNot(obtener_indice(), indice)
+
+
+class InstrumentacionTests(TestCase):
+
+    def test_linea_por_peticion_solo_en_debug(self):
+        with self.assertLogs("app.instrumentacion", "DEBUG") as registro:
+            self.client.get("/login/")
+        self.assertEqual([r.levelname for r in registro.records], ["DEBUG"])
+        self.assertEqual(json.loads(registro.records[0].getMessage())["ruta"], "/login/")
+
+        with self.assertNoLogs("app.instrumentacion", "INFO"):
+            self.client.get("/login/")
+
+    @override_settings(INSTRUMENTACION_PRESUPUESTO=-1)
+    def test_aviso_al_superar_el_presupuesto(self):
+        with self.assertLogs("app.instrumentacion", "WARNING") as registro:
+            self.client.get("/login/")
+        self.assertIn("Presupuesto de consultas superado", registro.output[0])
+
+
+class SesionesTests(PruebaMongo):
+
+    def test_guardar_invalida_el_usuario_cacheado(self):
+        usuario = self.entrar(is_superuser=True)
+        self.assertEqual(self.client.get("/admin_view/").status_code, 200)
+        backend = BackendUsuarioCacheado()
+        self.assertTrue(backend.get_user(usuario.pk).is_superuser)
+        with self.assertNumQueries(0):
+            backend.get_user(usuario.pk)
+
+        usuario.is_superuser = False
+        usuario.save()
+        with self.assertNumQueries(1):
+            self.assertFalse(backend.get_user(usuario.pk).is_superuser)
+        self.assertRedirects(self.client.get("/admin_view/"), "/home/?next=/admin_view/", fetch_redirect_response=False)
+
+        usuario.delete()
+        self.assertIsNone(backend.get_user(usuario.pk))
+
+    @override_settings(USUARIO_CACHE_TTL=0)
+    def test_sin_ttl_lee_siempre_de_la_base(self):
+        usuario = self.entrar()
+        backend = BackendUsuarioCacheado()
+        for _ in range(2):
+            with self.assertNumQueries(1):
+                self.assertEqual(backend.get_user(usuario.pk), usuario)
+        self.assertIsNone(cache.get(f"usuario:{usuario.pk}"))
+
+
+class MetricasTests(TestCase):
+
+    def _metrica(self, metrica):
+        self.addCleanup(metricas.REGISTRO.remove, metrica)
+        return metrica
+
+    def test_formato_de_texto(self):
+        contador = self._metrica(metricas.Contador("prueba_total", "Ayuda.", ("ruta",)))
+        contador.inc(ruta='a"b\\c\nd')
+        contador.inc(2, ruta="x")
+        contador.inc(ruta="x")
+        self.assertEqual(contador.cabecera(), ["# HELP prueba_total Ayuda.", "# TYPE prueba_total counter"])
+        self.assertEqual(contador.lineas(), ['prueba_total{ruta="a\\"b\\\\c\\nd"} 1', 'prueba_total{ruta="x"} 3'])
+
+        histograma = self._metrica(metricas.Histograma("prueba_segundos", "Ayuda.", cubetas=(0.1, 1.0)))
+        for valor in (0.05, 0.5, 0.5, 3.0):
+            histograma.observar(valor)
+        self.assertEqual(histograma.lineas(), [
+            'prueba_segundos_bucket{le="0.1"} 1',
+            'prueba_segundos_bucket{le="1.0"} 3',
+            'prueba_segundos_bucket{le="+Inf"} 4',
+            "prueba_segundos_sum 4.05",
+            "prueba_segundos_count 4",
+        ])
+        self.assertIn("# TYPE prueba_segundos histogram\nprueba_segundos_bucket", metricas.exponer())
+
+    def test_vista_restringida_por_ip(self):
+        self.client.get("/login/")
+        respuesta = self.client.get("/metrics")
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        texto = respuesta.content.decode()
+        self.assertTrue(texto.endswith("\n"))
+        self.assertIn('gamesranking_respuestas_total{vista="login",estado="200"} ', texto)
+        self.assertIn('gamesranking_peticion_segundos_bucket{vista="login",metodo="GET",le="+Inf"} ', texto)
+
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.5").status_code, 403)
+        with self.settings(METRICAS_IPS=["10.0.0.5"]):
+            self.assertEqual(self.client.get("/metrics").status_code, 403)
+            self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.5").status_code, 200)
+
+
+class EtagTests(PruebaMongo):
+
+    def setUp(self):
+        super().setUp()
+        self.entrar(is_superuser=True)
+        self.db.games.insert_many([{"BGGId": g, "Name": f"Juego {g}"} for g in (1, 2)])
+        self.categoria = self.db.categoria.insert_one({"nombre": "Cat", "lista_juegos": [1, 2]}).inserted_id
+        self.client.get("/ver_juegos/")  # la primera página fija la cookie CSRF, que forma parte del ETag
+
+    def _etag(self, url):
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=respuesta["ETag"]).status_code, 304)
+        return respuesta["ETag"]
+
+    def test_las_escrituras_cambian_el_etag(self):
+        antes = self._etag("/estadisticas/")
+        self.client.post("/valorar_juego/", json.dumps({"game_id": 1, "estrellas": 4}),
+                         content_type="application/json")
+        tras_valorar = self._etag("/estadisticas/")
+        self.client.post("/guardar_ranking/", json.dumps({
+            "category_id": str(self.categoria), "ranking": {"1": {"id": 2}},
+        }), content_type="application/json")
+        tras_ranking = self._etag("/estadisticas/")
+        self.client.post("/eliminar_juego/2/", follow=True)
+        tras_eliminar = self._etag("/estadisticas/")
+        self.assertEqual(len({antes, tras_valorar, tras_ranking, tras_eliminar}), 4)
+
+    def test_sin_304_con_mensajes_pendientes(self):
+        etag = self._etag("/ver_juegos/")
+        # Sin cambios en games el ETag sería el mismo; el mensaje del redirect tiene que llegar igualmente
+        respuesta = self.client.post("/eliminar_juego/99/", follow=True, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotIn("ETag", respuesta)
+        self.assertContains(respuesta, "ELEMENTO NO ENCONTRADO")
+        self.assertEqual(self._etag("/ver_juegos/"), etag)
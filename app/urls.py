@@ -14,14 +14,16 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.urls import path
+from django.urls import path, re_path
 
 from app.views import (ranking_view, login_usuario, registrar_usuario, home_view, lista_juegos, crear_ranking,
-                       guardar_ranking, admin_view, editar_categoria, cargar_datos, detalle_categoria,
+                       guardar_ranking, guardar_rankings, admin_view, editar_categoria, cargar_datos, detalle_categoria,
                        eliminar_categoria,
                        elegir_categoria_ranking, valorar_juego, obtener_valoracion, mis_rankings, eliminar_ranking,
                        obtener_comentarios_juego, global_ranking, inicio,
-                       sincronizar_api, supervision_admin, eliminar_juego_completo)
+                       sincronizar_api, supervision_admin, eliminar_juego_completo, estado_tarea, metricas,
+                       miniatura, archivo_miniatura,
+                       obtener_valoracion_async, obtener_comentarios_juego_async, estadisticas_async, catalogo_async)
 
 urlpatterns = [
     path('ranking/', ranking_view, name='ranking'),
@@ -35,6 +37,7 @@ urlpatterns = [
     path('crear_tierlist/', login_usuario, name='crear_tierlist'),
     path("crear_ranking/", crear_ranking, name="crear_ranking"),
     path("guardar_ranking/", guardar_ranking, name="guardar_ranking"),
+    path("guardar_rankings/", guardar_rankings, name="guardar_rankings"),
     path('admin_view/', admin_view, name='admin_view'),
     path('editar_categoria/', editar_categoria, name='editar_categoria'),
     path('detalle_categoria/<str:idcat>/', detalle_categoria, name='detalle_categoria'),
@@ -53,4 +56,18 @@ urlpatterns = [
     path('sincronizar_api/', sincronizar_api, name='sincronizar_api'),  # RF5
     path('supervision/', supervision_admin, name='supervision_admin'),  # RF10
     path('eliminar_juego/<int:game_id>/', eliminar_juego_completo, name='eliminar_juego'),  # RF4
+    path('tareas/<int:tarea_id>/', estado_tarea, name='estado_tarea'),
+    path('metrics', metricas, name='metricas'),
+
+    # Miniaturas de ImagePath (app/miniaturas.py); en producción el servidor web puede servir MINIATURAS_DIR
+    path('miniaturas/<slug:tamano>/<int:bgg_id>/', miniatura, name='miniatura'),
+    re_path(r'^miniaturas/archivo/(?P<nombre>[0-9a-f]{32}_[a-z0-9]+\.jpg)$', archivo_miniatura,
+            name='archivo_miniatura'),
+
+    # Lecturas asíncronas para despliegues ASGI (GamesRanking/asgi.py)
+    path('api/async/valoracion/<int:game_id>/', obtener_valoracion_async, name='obtener_valoracion_async'),
+    path('api/async/comentarios/<int:game_id>/', obtener_comentarios_juego_async,
+         name='obtener_comentarios_juego_async'),
+    path('api/async/estadisticas/', estadisticas_async, name='estadisticas_async'),
+    path('api/async/juegos/', catalogo_async, name='catalogo_async'),
 ]
\ No newline at end of file
@@ -0,0 +1,74 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
+
+# Contadores de cambios por colección en la caché compartida. Los incrementan las escrituras:
+#   games        invalidar_catalogo (cargar_datos, sincronizar_api, eliminar_juego)
+#   ranking      aplicar_deltas_ranking (guardar_ranking, guardar_rankings, eliminar_ranking)
+#   valoraciones valorar_con_delta (valorar_juego)
+#   categoria    invalidar_categorias (editar_categoria, eliminar_categoria, detalle_categoria)
+# Con ellos se invalidan las instantáneas en memoria y se calculan los ETag de las vistas de lectura.
+
+
+def _clave(coleccion):
+    return f"version:{coleccion}"
+
+
+def version(coleccion):
+    return cache.get(_clave(coleccion), 0)
+
+
+def incrementar_version(coleccion):
+    clave = _clave(coleccion)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, 1, None)
+
+
+def _etag_ttl():
+    # Con LocMemCache cada proceso tiene sus contadores y no ve las escrituras de los demás: el ETag cambia
+    # igualmente cada ETAG_TTL segundos para que ningún cliente se quede con un 304 desfasado indefinidamente
+    return getattr(settings, "ETAG_TTL", 60)
+
+
+def etag_versiones(*colecciones, extra=None):
+    """
+    etag_func para django.views.decorators.http.condition. Resume la URL con su query string, el usuario, la
+    cookie CSRF (las páginas llevan el token) y las versiones de las colecciones de las que depende la vista;
+    extra(request, *args, **kwargs) añade una versión más fina, p. ej. la de los comentarios de un juego.
+    Con mensajes pendientes no hay ETag: un 304 los perdería (p. ej. el redirect de eliminar_juego a ver_juegos).
+    """
+    def etag(request, *args, **kwargs):
+        if len(get_messages(request)):
+            return None
+        ttl = _etag_ttl()
+        partes = [
+            request.get_full_path(),
+            str(request.user.pk),
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+            str(int(time.time() // ttl) if ttl else 0),
+        ]
+        partes += [f"{coleccion}={version(coleccion)}" for coleccion in colecciones]
+        if extra is not None:
+            partes.append(str(extra(request, *args, **kwargs)))
+        return hashlib.md5("|".join(partes).encode()).hexdigest()
+    return etag
+
+
+def condicional(*colecciones, extra=None):
+    """
+    GET condicional para vistas de lectura de un usuario: ETag por versiones y 304 si el navegador ya tiene la
+    respuesta. Son páginas con datos de la sesión, así que van como private (un proxy no las comparte),
+    no-cache (el navegador revalida siempre) y Vary: Cookie.
+    """
+    def decorador(vista):
+        vista = condition(etag_func=etag_versiones(*colecciones, extra=extra))(vista)
+        return vary_on_cookie(cache_control(private=True, no_cache=True)(vista))
+    return decorador
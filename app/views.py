@@ -1,22 +1,39 @@
-import csv
-import io
 import json
-import requests
+from asgiref.sync import sync_to_async
 from urllib.parse import urlencode
 from bson.errors import InvalidId
 from bson import ObjectId
 from django.contrib.auth import authenticate, login, logout
-from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
 from django.views.decorators.csrf import csrf_exempt
+from django.conf import settings
 from django.contrib import messages
 from django.db import connections
 
+from app.estadisticas import (BACKENDS as BACKENDS_ESTADISTICAS, calcular_estadisticas, guardar_ranking_con_delta,
+                              guardar_rankings_con_delta,
+                              eliminar_ranking_con_delta, valorar_con_delta, estadisticas_desde_agregado_async,
+                              resumen_valoraciones)
+from app.catalogo import invalidar_catalogo, obtener_catalogo
+from app.comentarios import invalidar_comentarios, pagina_comentarios, pagina_comentarios_async, version_comentarios
+from app.consenso import METODOS as METODOS_CONSENSO, calcular_consenso
+from app.categorias import categorias_con_juegos, invalidar_categorias, obtener_categoria, obtener_categorias
+from app.consultas import game_id_de_posicion, normalizar_game_id, resolver_categorias, resolver_juegos
 from app.forms import RegistroForm, LoginForm
+from app.fragmentos import contexto_fragmentos, invalidar_rankings_usuario, rankings_de_usuario
+from app.metricas import exponer as exponer_metricas
+from app.miniaturas import (generar_reservada as generar_miniatura_reservada, hash_disponible as hash_miniatura,
+                            nombre_archivo, reservar as reservar_miniatura, ruta_archivo, tamanos as tamanos_miniatura)
 from app.models import *
+from app.mongo_async import base_async
+from app.paginacion import SIGUIENTE, codificar_cursor, decodificar_cursor, paginar_juegos
+from app.supervision import pagina_usuarios, resumen_supervision
+from app.tareas import en_segundo_plano, encolar, guardar_subida
+from app.versiones import condicional
 
 
 def es_admin(user):
@@ -30,7 +47,17 @@ def inicio(request):
 @login_required(login_url='login/')
 @user_passes_test(es_admin, login_url='home')
 def admin_view(request):
-    return render(request, "html/admin_panel.html")
+    tareas = Tarea.objects.all()[:5]
+    return render(request, "html/admin_panel.html", {"tareas": tareas})
+
+
+@login_required(login_url='login/')
+@user_passes_test(es_admin, login_url='home')
+def estado_tarea(request, tarea_id):
+    tarea = Tarea.objects.filter(pk=tarea_id).first()
+    if not tarea:
+        return JsonResponse({"error": "Tarea no encontrada"}, status=404)
+    return JsonResponse(tarea.to_dict())
 
 
 @login_required(login_url='login/')
@@ -86,29 +113,25 @@ def logout_usuario(request):
 
 
 @login_required(login_url='login/')
+@condicional("games", "valoraciones")
 def lista_juegos(request):
-    # Ya incluimos el order_by para quitar el warning de paginación
-    juegos = Games.objects.using("mongodb").all().order_by('Name')
     nombre = request.GET.get("nombre", "")
     year = request.GET.get("year", "")
     min_players = request.GET.get("min_players", "")
     max_players = request.GET.get("max_players", "")
 
-    if nombre:
-        juegos = juegos.filter(Name__icontains=nombre)
-    if year:
-        juegos = juegos.filter(YearPublished=year)
-    if min_players:
-        juegos = juegos.filter(MinPlayers__gte=min_players)
-    if max_players:
-        juegos = juegos.filter(MaxPlayers__lte=max_players)
+    # Filtros y paginación sobre la instantánea en memoria; con texto se ordena por relevancia
+    catalogo = obtener_catalogo()
+    ids = catalogo.filtrar(year=year, min_players=min_players, max_players=max_players)
+    page_obj = paginar_juegos(catalogo, ids, 10, request.GET.get("cursor"), busqueda=nombre)
 
-    paginator = Paginator(juegos, 10)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    # Media de los usuarios de la web: una lectura por _id del resumen que mantiene valorar_juego
+    resumen = resumen_valoraciones(connections['mongodb'].database, [juego.BGGId for juego in page_obj])
 
     return render(request, "html/games.html", {
+        **contexto_fragmentos(),
         "page_obj": page_obj,
+        "filas": [(juego, resumen.get(juego.BGGId)) for juego in page_obj],
         "nombre": nombre,
         "year": year,
         "min_players": min_players,
@@ -140,12 +163,13 @@ def guardar_ranking(request):
                 "$set": {
                     "user": nombre_usuario,
                     "category_name": data.get("category_name", "General"),
-                    "positions": data["ranking"],
+                    "positions": _validar_posiciones(data.get("ranking")),
                     "category_id": cat_obj_id
                 }
             }
 
-            result = db.ranking.update_one(filtro, datos_actualizar, upsert=True)
+            guardar_ranking_con_delta(db, filtro, datos_actualizar)
+            invalidar_rankings_usuario(request.user.id)
             return JsonResponse({"status": "ok"})
 
         except Exception as e:
@@ -155,10 +179,104 @@ def guardar_ranking(request):
     return JsonResponse({"error": "Método no permitido"}, status=405)
 
 
+def _validar_posiciones(ranking):
+    # Devuelve el ranking ({posición: {id, name, image} o null}) o lanza ValueError con el motivo
+    if not isinstance(ranking, dict):
+        raise ValueError("Falta ranking")
+    for posicion, juego in ranking.items():
+        if not str(posicion).isdigit():
+            raise ValueError(f"Posición no válida: {posicion}")
+        if not juego:
+            continue
+        if not isinstance(juego, dict) or juego.get("id") is None:
+            raise ValueError(f"Juego no válido en la posición {posicion}")
+        # name e image acaban en el agregado: solo texto, nunca objetos
+        for campo in ("name", "image"):
+            if juego.get(campo) is not None and not isinstance(juego[campo], str):
+                raise ValueError(f"{campo} no válido en la posición {posicion}")
+    return ranking
+
+
+def _validar_ranking(item):
+    # Devuelve (category_id, ranking) de un elemento del lote o lanza ValueError con el motivo
+    if not isinstance(item, dict):
+        raise ValueError("El elemento no es un objeto")
+    try:
+        cat_obj_id = ObjectId(item.get("category_id"))
+    except (InvalidId, TypeError):
+        raise ValueError("category_id no válido")
+    return cat_obj_id, _validar_posiciones(item.get("ranking"))
+
+
+@login_required(login_url='login')
+def guardar_rankings(request):
+    """
+    Guarda varios rankings del usuario en una petición: {"rankings": [{category_id, category_name, ranking}, ...]}.
+    Cada elemento se valida por separado y la respuesta trae su estado en el mismo orden.
+    A diferencia de guardar_ranking, exige el token CSRF (cabecera X-CSRFToken).
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Método no permitido"}, status=405)
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "JSON no válido"}, status=400)
+
+    items = data.get("rankings") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return JsonResponse({"status": "error", "message": "Falta la lista rankings"}, status=400)
+    maximo = getattr(settings, "RANKINGS_LOTE_MAXIMO", 100)
+    if len(items) > maximo:
+        return JsonResponse({"status": "error", "message": f"Máximo {maximo} rankings por petición"}, status=400)
+
+    db = connections['mongodb'].database
+    nombre_usuario = getattr(request.user, 'nombre', getattr(request.user, 'email', str(request.user)))
+
+    resultados = []
+    validos = {}  # category_id -> índice en resultados
+    for indice, item in enumerate(items):
+        resultado = {"indice": indice, "category_id": item.get("category_id") if isinstance(item, dict) else None}
+        try:
+            cat_obj_id, ranking = _validar_ranking(item)
+            if cat_obj_id in validos:
+                raise ValueError("Categoría repetida en el lote")
+            validos[cat_obj_id] = indice
+            resultado["_datos"] = {
+                "user": nombre_usuario,
+                "category_name": item.get("category_name", "General"),
+                "positions": ranking,
+                "category_id": cat_obj_id,
+            }
+        except ValueError as e:
+            resultado.update(status="error", message=str(e))
+        resultados.append(resultado)
+
+    existentes = {doc["_id"] for doc in db.categoria.find({"_id": {"$in": list(validos)}}, {"_id": 1})}
+    for cat_obj_id, indice in list(validos.items()):
+        if cat_obj_id not in existentes:
+            resultados[indice].pop("_datos")
+            resultados[indice].update(status="error", message="La categoría no existe")
+            del validos[cat_obj_id]
+
+    escritos = guardar_rankings_con_delta(
+        db, request.user.id, [(cat_obj_id, resultados[indice].pop("_datos")) for cat_obj_id, indice in validos.items()]
+    )
+    if validos:
+        invalidar_rankings_usuario(request.user.id)
+    for indice, (creado, error) in zip(validos.values(), escritos):
+        if error:
+            resultados[indice].update(status="error", message=error)
+        else:
+            resultados[indice].update(status="ok", creado=creado)
+
+    correctos = sum(1 for r in resultados if r["status"] == "ok")
+    estado = "ok" if correctos == len(resultados) else ("parcial" if correctos else "error")
+    return JsonResponse({"status": estado, "resultados": resultados}, status=200 if correctos else 400)
+
+
 @login_required(login_url='login/')
 def elegir_categoria_ranking(request):
-    categorias = Categoria.objects.using("mongodb").all()
-    categorias_validas = [c for c in categorias if c.lista_juegos]
+    categorias_validas = categorias_con_juegos()
     return render(request, "html/elegir_categoria.html", {"categorias": categorias_validas})
 
 
@@ -168,12 +286,13 @@ def crear_ranking(request, idcat):
 
     try:
         obj_id = ObjectId(idcat)
-        categoria = db.categoria.find_one({"_id": obj_id})
-        if not categoria:
-            return redirect('elegir_categoria_ranking')
     except (InvalidId, TypeError):
         return redirect('elegir_categoria_ranking')
 
+    categoria = obtener_categoria(obj_id)
+    if not categoria:
+        return redirect('elegir_categoria_ranking')
+
     user_id = request.user.id
 
     ranking_existente = db.ranking.find_one({
@@ -192,32 +311,35 @@ def crear_ranking(request, idcat):
 
     if ranking_existente:
         edit_id = str(ranking_existente['_id'])
-        positions_data = ranking_existente.get('positions', {})
+        positions_data = ranking_existente.get('positions') or {}
+
+        # Refrescamos nombre e imagen guardados con el catálogo actual en una sola consulta
+        juegos_previos = resolver_juegos(game_id_de_posicion(p) for p in positions_data.values())
+        for pos_data in positions_data.values():
+            if isinstance(pos_data, dict):
+                juego_info = juegos_previos.get(normalizar_game_id(pos_data.get('id')))
+                if juego_info:
+                    pos_data['name'] = juego_info.Name
+                    pos_data['image'] = juego_info.ImagePath
         ranking_previo_json = json.dumps(positions_data)
 
-    lista_juegos_ids = categoria.get('lista_juegos', [])
-    juegos_base = Games.objects.using("mongodb").filter(BGGId__in=lista_juegos_ids)
+    catalogo = obtener_catalogo()
+    ids_categoria = catalogo.filtrar(ids=categoria['lista_juegos'])
 
-    total_juegos_reales = juegos_base.count()
+    total_juegos_reales = len(ids_categoria)
     limit = min(total_juegos_reales, 10)
     positions = list(range(1, limit + 1))
 
     nombre_busqueda = request.GET.get('nombre', '')
-    juegos_filtrados = juegos_base
-    if nombre_busqueda:
-        juegos_filtrados = juegos_filtrados.filter(Name__icontains=nombre_busqueda)
-
-    juegos_filtrados = juegos_filtrados.order_by('Name')
-
-    paginator = Paginator(juegos_filtrados, 12)
-    page_obj = paginator.get_page(request.GET.get('page'))
+    page_obj = paginar_juegos(catalogo, ids_categoria, 12, request.GET.get('cursor'), busqueda=nombre_busqueda)
 
     context = {
+        **contexto_fragmentos(),
         'positions': positions,
         'total_juegos': total_juegos_reales,
         'categoria': {
-            'id': str(categoria['_id']),
-            'nombre': categoria.get('nombre')
+            'id': categoria['id'],
+            'nombre': categoria['nombre']
         },
         'page_obj': page_obj,
         'ranking_previo': ranking_previo_json,
@@ -233,38 +355,10 @@ def cargar_datos(request):
     if request.method == 'POST' and request.FILES.get('csv_file'):
         csv_file = request.FILES['csv_file']
         try:
-            decoded_file = csv_file.read().decode('utf-8-sig')
-            io_string = io.StringIO(decoded_file)
-            reader = csv.DictReader(io_string)
-
-            Games.objects.using("mongodb").all().delete()
-
-            nuevos_juegos = []
-            for row in reader:
-                try:
-                    bgg_id = int(row.get('BGGId', 0) or 0)
-                except ValueError:
-                    bgg_id = 0
-
-                juego = Games(
-                    BGGId=bgg_id,
-                    Name=row.get('Name', ''),
-                    Description=row.get('Description', ''),
-                    YearPublished=int(row.get('YearPublished', 0) or 0),
-                    GameWeight=float(row.get('GameWeight', 0) or 0.0),
-                    AvgRating=float(row.get('AvgRating', 0) or 0.0),
-                    MinPlayers=int(row.get('MinPlayers', 0) or 0),
-                    MaxPlayers=int(row.get('MaxPlayers', 0) or 0),
-                    NumUserRatings=int(row.get('NumUserRatings', 0) or 0),
-                    NumExpansions=int(row.get('NumExpansions', 0) or 0),
-                    ImagePath=row.get('ImagePath', '')
-                )
-                nuevos_juegos.append(juego)
-
-            if nuevos_juegos:
-                Games.objects.using("mongodb").bulk_create(nuevos_juegos)
-                messages.success(request,
-                                 f"Se han importado {len(nuevos_juegos)} juegos correctamente con sus IDs reales.")
+            # La importación corre en segundo plano; el panel de admin consulta su estado
+            ruta = guardar_subida(csv_file)
+            tarea = encolar("importar_csv", ruta, usuario=request.user.nombre)
+            messages.success(request, f"[OK] Importación encolada como tarea #{tarea.pk}.")
             return redirect('admin_view')
 
         except Exception as e:
@@ -284,10 +378,11 @@ def editar_categoria(request):
                 "nombre": nombre,
                 "lista_juegos": []
             })
+            invalidar_categorias()
             messages.success(request, f"Categoría '{nombre}' creada con éxito.")
             return redirect('editar_categoria')
 
-    categorias = Categoria.objects.using("mongodb").all()
+    categorias = obtener_categorias()
     return render(request, 'html/editar_categoria.html', {'categorias': categorias})
 
 
@@ -298,6 +393,7 @@ def eliminar_categoria(request, idcat):
     try:
         target_id = ObjectId(idcat) if len(idcat) == 24 else idcat
         resultado = db.categoria.delete_one({"_id": target_id})
+        invalidar_categorias()
         if resultado.deleted_count > 0:
             messages.success(request, "Categoría eliminada correctamente.")
         else:
@@ -314,29 +410,14 @@ def detalle_categoria(request, idcat):
     db = connections['mongodb'].database
     categoria_obj = None
 
-    # Intentamos obtener la categoría por ID (String o ObjectId)
-    try:
-        if len(idcat) == 24:
-            categoria_obj = Categoria.objects.using("mongodb").get(pk=ObjectId(idcat))
-    except:
-        try:
-            categoria_obj = Categoria.objects.using("mongodb").get(pk=idcat)
-        except:
-            pass
-
-    # Fallback con PyMongo directo si el ORM falla
-    if not categoria_obj:
-        try:
-            query_id = ObjectId(idcat) if len(idcat) == 24 else idcat
-            doc = db.categoria.find_one({"_id": query_id})
-            if doc:
-                categoria_obj = Categoria(
-                    id=str(doc['_id']),
-                    nombre=doc.get('nombre'),
-                    lista_juegos=doc.get('lista_juegos', [])
-                )
-        except Exception as e:
-            pass
+    # La categoría sale de la caché (se invalida en cada modificación de abajo)
+    datos_categoria = obtener_categoria(idcat)
+    if datos_categoria:
+        categoria_obj = Categoria(
+            id=datos_categoria['id'],
+            nombre=datos_categoria['nombre'],
+            lista_juegos=datos_categoria['lista_juegos']
+        )
 
     if not categoria_obj:
         messages.error(request, "[!] ERROR: NO SE PUDO LOCALIZAR LA CATEGORÍA.")
@@ -362,6 +443,7 @@ def detalle_categoria(request, idcat):
                         {"_id": target_id},
                         {"$addToSet": {"lista_juegos": game_id_int}}  # $addToSet da doble seguridad en Mongo
                     )
+                    invalidar_categorias()
                     messages.success(request, "[OK] MÓDULO VINCULADO CORRECTAMENTE.")
 
             elif "remove_game" in request.POST:
@@ -369,6 +451,7 @@ def detalle_categoria(request, idcat):
                     {"_id": target_id},
                     {"$pull": {"lista_juegos": game_id_int}}
                 )
+                invalidar_categorias()
                 messages.success(request, "[OK] MÓDULO PURGADO DE LA CATEGORÍA.")
 
         # Recogemos los parámetros de búsqueda para mantenerlos tras recargar
@@ -377,7 +460,7 @@ def detalle_categoria(request, idcat):
             'year': request.POST.get('year', ''),
             'min_players': request.POST.get('min_players', ''),
             'max_players': request.POST.get('max_players', ''),
-            'page': request.POST.get('page', '')
+            'cursor': request.POST.get('cursor', '')
         }
         querystring = urlencode({k: v for k, v in params.items() if v})
         base_url = reverse('detalle_categoria', args=[idcat])
@@ -392,20 +475,13 @@ def detalle_categoria(request, idcat):
     min_p = request.GET.get("min_players", "")
     max_p = request.GET.get("max_players", "")
 
-    filtros = {}
-    if nombre: filtros["Name__icontains"] = nombre
-    if year: filtros["YearPublished"] = int(year)
-    if min_p: filtros["MinPlayers__gte"] = int(min_p)
-    if max_p: filtros["MaxPlayers__lte"] = int(max_p)
-
     # Buscamos los juegos excluyendo los que YA están en la lista
-    juegos_busqueda = Games.objects.using("mongodb").filter(**filtros).exclude(BGGId__in=lista_actual).order_by('Name')
+    catalogo = obtener_catalogo()
+    ids_busqueda = catalogo.filtrar(year=year, min_players=min_p, max_players=max_p, excluir=lista_actual)
+    page_obj = paginar_juegos(catalogo, ids_busqueda, 8, request.GET.get("cursor"), busqueda=nombre)
 
-    paginator = Paginator(juegos_busqueda, 8)
-    page_obj = paginator.get_page(request.GET.get("page"))
-
-    # Cargamos los juegos que sí están en la lista para mostrarlos arriba
-    juegos_actuales = Games.objects.using("mongodb").filter(BGGId__in=lista_actual).order_by('Name')
+    # Cargamos los juegos que sí están en la lista para mostrarlos arriba (ya en orden de nombre)
+    juegos_actuales = catalogo.juegos(catalogo.filtrar(ids=lista_actual))
 
     return render(request, 'html/detalle_categoria.html', {
         'categoria': categoria_obj,
@@ -430,7 +506,8 @@ def valorar_juego(request):
 
             db = connections['mongodb'].database
 
-            resultado = db.valoraciones.update_one(
+            anterior = valorar_con_delta(
+                db,
                 {
                     "game_id": gid,
                     "usuario": user_name
@@ -440,11 +517,12 @@ def valorar_juego(request):
                         "estrellas": estrellas,
                         "comentario": comentario,
                     }
-                },
-                upsert=True
+                }
             )
 
-            if resultado.matched_count > 0:
+            invalidar_comentarios(gid)
+
+            if anterior:
                 mensaje = "¡Tu valoración ha sido actualizada!"
             else:
                 mensaje = "¡Valoración creada con éxito!"
@@ -457,6 +535,7 @@ def valorar_juego(request):
 
 
 @login_required(login_url='login/')
+@condicional(extra=lambda request, game_id: version_comentarios(int(game_id)))
 def obtener_valoracion(request, game_id):
     db = connections['mongodb'].database
     val = db.valoraciones.find_one({
@@ -473,38 +552,38 @@ def obtener_valoracion(request, game_id):
     return JsonResponse({"existe": False})
 
 
-@login_required(login_url='login/')
-def mis_rankings(request):
-    db = connections['mongodb'].database
-    user_name = request.user.nombre
+def _construir_mis_rankings(db, user_id):
+    # Por user_id, que es lo que identifica al usuario al guardar; "user" (el nombre) se puede repetir
+    docs_rankings = list(db.ranking.find({"user_id": user_id}))
+
+    # Resolvemos todos los juegos y categorías de golpe en lugar de una consulta por puesto
+    juegos = resolver_juegos(
+        game_id_de_posicion((doc.get('positions') or {}).get(str(i)))
+        for doc in docs_rankings for i in range(1, 11)
+    )
+    categorias = resolver_categorias([
+        doc.get('category_name') for doc in docs_rankings if not doc.get('category_id')
+    ])
 
-    cursor_rankings = db.ranking.find({"user": user_name})
     rankings_finales = []
 
-    for doc in cursor_rankings:
+    for doc in docs_rankings:
         positions = doc.get('positions', {})
         juegos_lista = []
 
         for i in range(1, 11):
-            pos_key = str(i)
-            pos_data = positions.get(pos_key)
-
-            if pos_data and pos_data != "null":
-                game_id = pos_data.get('id') if isinstance(pos_data, dict) else pos_data
-                if game_id:
-                    juego_info = Games.objects.using("mongodb").filter(BGGId=game_id).first()
-                    if juego_info:
-                        juegos_lista.append({
-                            'puesto': i,
-                            'nombre': juego_info.Name,
-                            'imagen': juego_info.ImagePath
-                        })
-
-        cat_id = doc.get('category_id')
-        if not cat_id:
-            cat_doc = db.categoria.find_one({"nombre": doc.get('category_name')})
-            if cat_doc:
-                cat_id = str(cat_doc['_id'])
+            game_id = game_id_de_posicion(positions.get(str(i)))
+            if game_id:
+                juego_info = juegos.get(normalizar_game_id(game_id))
+                if juego_info:
+                    juegos_lista.append({
+                        'puesto': i,
+                        'bgg_id': juego_info.BGGId,
+                        'nombre': juego_info.Name,
+                        'imagen': juego_info.ImagePath
+                    })
+
+        cat_id = doc.get('category_id') or categorias.get(doc.get('category_name'))
 
         if juegos_lista:
             rankings_finales.append({
@@ -513,8 +592,20 @@ def mis_rankings(request):
                 'categoria': doc.get('category_name', 'Ranking Personal'),
                 'juegos': juegos_lista
             })
+    return rankings_finales
 
-    return render(request, 'html/mis_rankings.html', {'rankings': rankings_finales})
+
+@login_required(login_url='login/')
+def mis_rankings(request):
+    db = connections['mongodb'].database
+    user_id = request.user.id
+
+    # Solo se va a Mongo cuando el usuario ha cambiado algún ranking o ha cambiado el catálogo
+    rankings_finales = rankings_de_usuario(user_id, lambda: _construir_mis_rankings(db, user_id))
+    return render(request, 'html/mis_rankings.html', {
+        'rankings': rankings_finales,
+        **contexto_fragmentos(request.user.id),
+    })
 
 
 @login_required(login_url='login/')
@@ -522,8 +613,9 @@ def eliminar_ranking(request, ranking_id):
     if request.method == "POST":
         db = connections['mongodb'].database
         try:
-            resultado = db.ranking.delete_one({"_id": ObjectId(ranking_id)})
-            if resultado.deleted_count > 0:
+            eliminado = eliminar_ranking_con_delta(db, {"_id": ObjectId(ranking_id)})
+            if eliminado:
+                invalidar_rankings_usuario(eliminado.get("user_id", request.user.id))
                 messages.success(request, "Ranking eliminado correctamente.")
             else:
                 messages.error(request, "No se pudo encontrar el ranking a eliminar.")
@@ -532,165 +624,65 @@ def eliminar_ranking(request, ranking_id):
     return redirect('mis_rankings')
 
 
+def _respuesta_con_etag(request, pagina):
+    # Si el cliente ya tiene esta página (If-None-Match), 304 sin cuerpo
+    cuerpo, etag = pagina
+    no_modificada = get_conditional_response(request, etag=etag)
+    if no_modificada is not None:
+        return no_modificada
+    response = HttpResponse(cuerpo, content_type="application/json")
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
 @login_required(login_url='login/')
 def obtener_comentarios_juego(request, game_id):
+    # ?orden=recientes|estrellas&limite=N (máx. 50)&cursor=<campo siguiente de la página anterior>
     db = connections['mongodb'].database
-    cursor = db.valoraciones.find({
-        "game_id": int(game_id),
-        "comentario": {"$ne": ""}
-    })
-    comentarios = []
-    for doc in cursor:
-        comentarios.append({
-            "usuario": doc.get("usuario", "Anónimo"),
-            "comentario": doc.get("comentario", ""),
-            "estrellas": doc.get("estrellas", 0)
-        })
-    return JsonResponse({"comentarios": comentarios})
+    return _respuesta_con_etag(request, pagina_comentarios(db, int(game_id), request.GET))
 
 
 @login_required(login_url='login/')
+@condicional("games", "ranking", "valoraciones", "categoria")
 def global_ranking(request):
     db = connections['mongodb'].database
-
-
-    datos_global = {}
-    cursor_ranking = db.ranking.find()
-
-    for doc in cursor_ranking:
-        positions = doc.get("positions", {})
-        for pos_str, game_data in positions.items():
-            if not game_data or not isinstance(game_data, dict): continue
-            g_id = str(game_data.get("id"))
-            if not g_id: continue
-
-            if g_id not in datos_global:
-                datos_global[g_id] = {
-                    "suma_posiciones": 0, "apariciones": 0,
-                    "nombre": game_data.get("name", "Sin nombre"), "imagen": game_data.get("image", "")
-                }
-            try:
-                datos_global[g_id]["suma_posiciones"] += int(pos_str)
-                datos_global[g_id]["apariciones"] += 1
-            except:
-                pass
-
-    lista_ranking_global = []
-    for g_id, info in datos_global.items():
-        media = info["suma_posiciones"] / info["apariciones"]
-        lista_ranking_global.append({
-            "nombre": info["nombre"], "imagen": info["imagen"],
-            "apariciones": info["apariciones"], "media_posicion": round(media, 2)
-        })
-    lista_ranking_global = sorted(lista_ranking_global, key=lambda x: (x['media_posicion'], -x['apariciones']))
-
-
-    datos_votos = {}
-    cursor_votos = db.valoraciones.find()
-    for voto in cursor_votos:
-        try:
-            g_id = str(voto.get("game_id"))
-            estrellas = float(voto.get("estrellas", 0))
-            comentario = voto.get("comentario", "")
-
-            if g_id not in datos_votos:
-                juego_info = Games.objects.using("mongodb").filter(BGGId=int(g_id) if g_id.isdigit() else g_id).first()
-                datos_votos[g_id] = {
-                    "suma": 0, "count": 0, "comentarios": [],
-                    "nombre": juego_info.Name if juego_info else f"Juego {g_id}",
-                    "imagen": juego_info.ImagePath if juego_info else ""
-                }
-
-            datos_votos[g_id]["suma"] += estrellas
-            datos_votos[g_id]["count"] += 1
-
-            if comentario and estrellas >= 4.0:
-                datos_votos[g_id]["comentarios"].append(comentario)
-        except:
-            pass
-
-    lista_votos = []
-    for g_id, info in datos_votos.items():
-        media = round(info["suma"] / info["count"], 1)
-
-        if media >= 4.0:
-            lista_votos.append({
-                "nombre": info["nombre"],
-                "imagen": info["imagen"],
-                "media_usuarios": media,
-                "total_votos": info["count"],
-                "comentarios": info["comentarios"][:2]  # Cogemos máximo 2 comentarios top
-            })
-
-    lista_votos = sorted(lista_votos, key=lambda x: x['media_usuarios'], reverse=True)
-
-
-    total_valoraciones = db.valoraciones.count_documents({})
-    categorias = db.categoria.find()
-    promedios_categoria = []
-
-    for cat in categorias:
-        juegos_ids = cat.get('lista_juegos', [])
-        if juegos_ids:
-            votos_cat = db.valoraciones.find({"game_id": {"$in": juegos_ids}})
-            suma_cat = 0
-            count_cat = 0
-            for v in votos_cat:
-                suma_cat += float(v.get("estrellas", 0))
-                count_cat += 1
-
-            promedio = round(suma_cat / count_cat, 1) if count_cat > 0 else 0
-            promedios_categoria.append({
-                "nombre": cat.get("nombre"),
-                "promedio": promedio,
-                "volumen": count_cat
-            })
-
-    promedios_categoria = sorted(promedios_categoria, key=lambda x: x['promedio'], reverse=True)
-
-    return render(request, 'html/estadisticas.html', {
-        'ranking_global': lista_ranking_global,
-        'juegos_votos': lista_votos,
-        'total_valoraciones': total_valoraciones,
-        'promedios_categoria': promedios_categoria
+    # El backend se elige en settings.ESTADISTICAS_BACKEND; un admin puede forzarlo con ?backend= para comparar
+    backend = request.GET.get("backend") if es_admin(request.user) else None
+    if backend not in BACKENDS_ESTADISTICAS:
+        backend = None
+    contexto = calcular_estadisticas(db, backend)
+
+    # ?metodo= cambia el método de consenso y ?categoria= lo limita a los rankings de una categoría
+    metodo = request.GET.get("metodo", "media")
+    if metodo not in METODOS_CONSENSO:
+        metodo = "media"
+    categoria = request.GET.get("categoria") or None
+    if categoria and obtener_categoria(categoria) is None:
+        categoria = None
+    consenso = metodo != "media" or categoria is not None
+    if consenso:
+        contexto["ranking_global"] = calcular_consenso(db, metodo, categoria)
+
+    contexto.update({
+        "consenso": consenso,
+        "metodo": metodo,
+        "metodo_etiqueta": METODOS_CONSENSO[metodo][0],
+        "metodos": [(clave, datos[0]) for clave, datos in METODOS_CONSENSO.items()],
+        "categoria": categoria,
+        "categorias": categorias_con_juegos(),
     })
+    return render(request, 'html/estadisticas.html', contexto)
 
 
 @login_required(login_url='login/')
 @user_passes_test(es_admin, login_url='home')
 def sincronizar_api(request):
     try:
-        response = requests.get('https://freetestapi.com/api/v1/games?limit=5')
-        if response.status_code == 200:
-            datos_api = response.json()
-            nuevos_juegos = []
-
-            for item in datos_api:
-                bgg_id = int(item.get('id', 0) + 9000)
-                if not Games.objects.using("mongodb").filter(BGGId=bgg_id).exists():
-                    juego = Games(
-                        BGGId=bgg_id,
-                        Name=item.get('title', 'Juego Desconocido'),
-                        Description=item.get('description', 'Sin descripción'),
-                        YearPublished=item.get('release_year', 2024),
-                        GameWeight=2.5,
-                        AvgRating=item.get('rating', 0.0),
-                        MinPlayers=1,
-                        MaxPlayers=4,
-                        ImagePath=item.get('cover_image', '')
-                    )
-                    nuevos_juegos.append(juego)
-
-            if nuevos_juegos:
-                Games.objects.using("mongodb").bulk_create(nuevos_juegos)
-                messages.success(request,
-                                 f"[OK] Sincronización API exitosa: {len(nuevos_juegos)} elementos nuevos inyectados.")
-            else:
-                messages.warning(request, "[INFO] La API no devolvió elementos nuevos.")
-        else:
-            messages.error(request, "[!] Error al conectar con el endpoint de la API.")
+        tarea = encolar("sincronizar_api", usuario=request.user.nombre)
+        messages.success(request, f"[OK] Sincronización API encolada como tarea #{tarea.pk}.")
     except Exception as e:
-        messages.error(request, f"[!] Fallo crítico de conexión API: {e}")
+        messages.error(request, f"[!] No se pudo encolar la sincronización: {e}")
 
     return redirect('admin_view')
 
@@ -700,9 +692,10 @@ def sincronizar_api(request):
 def eliminar_juego_completo(request, game_id):
     if request.method == "POST":
         try:
-            juego = Games.objects.using("mongodb").filter(BGGId=game_id).first()
-            if juego:
-                juego.delete()
+            # Un solo delete_one en lugar de leer el juego con el ORM y borrarlo después
+            borrado = connections['mongodb'].database.games.delete_one({"BGGId": game_id})
+            if borrado.deleted_count:
+                invalidar_catalogo()
                 messages.success(request, "[OK] ELEMENTO PURGADO DE LA BBDD GLOBAL.")
             else:
                 messages.error(request, "[!] ELEMENTO NO ENCONTRADO.")
@@ -714,16 +707,140 @@ def eliminar_juego_completo(request, game_id):
 @login_required(login_url='login/')
 @user_passes_test(es_admin, login_url='home')
 def supervision_admin(request):
-    db = connections['mongodb'].database
-    usuarios = Usuario.objects.all().values('nombre', 'email', 'rol', 'is_active', 'last_login')
-    valoraciones_recientes = list(db.valoraciones.find().sort("_id", -1).limit(10))
-    for val in valoraciones_recientes:
-        val['_id'] = str(val['_id'])
-
-    total_rankings = db.ranking.count_documents({})
-
+    # ?desde=<pk del último usuario de la página anterior>
+    usuarios, siguiente = pagina_usuarios(request.GET.get('desde'))
     return render(request, 'html/supervision.html', {
+        **resumen_supervision(connections['mongodb'].database),
         'usuarios': usuarios,
-        'valoraciones_recientes': valoraciones_recientes,
-        'total_rankings': total_rankings
-    })
\ No newline at end of file
+        'siguiente': siguiente,
+        'primera_pagina': not request.GET.get('desde'),
+    })
+
+
+@login_required(login_url='login/')
+def miniatura(request, tamano, bgg_id):
+    # Redirige a la miniatura con hash si ya existe. Si no, la genera en segundo plano (una vez por URL) y mientras
+    # tanto redirige a la imagen original. Solo se descargan URL del catálogo: nunca una que venga en la petición
+    juego = obtener_catalogo().juego(bgg_id)
+    if tamano not in tamanos_miniatura() or not juego or not juego.ImagePath:
+        raise Http404("Miniatura no encontrada")
+    hash_contenido = hash_miniatura(juego.ImagePath, tamano)
+    if hash_contenido is None and reservar_miniatura(juego.ImagePath):
+        en_segundo_plano(generar_miniatura_reservada, juego.ImagePath)
+        hash_contenido = hash_miniatura(juego.ImagePath, tamano)  # ya está si TAREAS_SINCRONAS
+    if hash_contenido is None:
+        return redirect(juego.ImagePath)
+    response = redirect('archivo_miniatura', nombre_archivo(hash_contenido, tamano))
+    response["Cache-Control"] = "private, max-age=3600"
+    return response
+
+
+def archivo_miniatura(request, nombre):
+    # El nombre lleva el hash del contenido: el fichero no cambia nunca y se puede guardar un año
+    ruta = ruta_archivo(nombre)
+    if not ruta.is_file():
+        raise Http404("Miniatura no encontrada")
+    response = FileResponse(open(ruta, "rb"), content_type="image/jpeg")
+    response["Cache-Control"] = f"public, max-age={getattr(settings, 'MINIATURAS_MAX_AGE', 31536000)}, immutable"
+    return response
+
+
+def metricas(request):
+    # Para el scraper de Prometheus: sin sesión, restringido por IP
+    if not getattr(settings, "METRICAS_ACTIVAS", False):
+        return HttpResponse(status=404)
+    if request.META.get("REMOTE_ADDR") not in getattr(settings, "METRICAS_IPS", []):
+        return HttpResponse(status=403)
+    return HttpResponse(exponer_metricas(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# --- Lecturas asíncronas (ASGI) ---
+# Con ASGI usan el AsyncMongoClient compartido y no ocupan un hilo mientras esperan a Mongo.
+# Con WSGI (o sin AsyncMongoClient) delegan en la versión síncrona equivalente.
+
+CAMPOS_CATALOGO = {"_id": 0, "BGGId": 1, "Name": 1, "YearPublished": 1, "AvgRating": 1, "ImagePath": 1}
+TAM_PAGINA_CATALOGO = 20
+
+
+def _filtro_catalogo(cursor):
+    datos = decodificar_cursor(cursor)
+    if not datos or datos["d"] != SIGUIENTE:
+        return {}, 1
+    filtro = {"$or": [{"Name": {"$gt": datos["n"]}}, {"Name": datos["n"], "BGGId": {"$gt": datos["id"]}}]}
+    return filtro, datos["p"]
+
+
+def _respuesta_catalogo(docs, numero):
+    siguiente = None
+    if len(docs) > TAM_PAGINA_CATALOGO:
+        docs = docs[:TAM_PAGINA_CATALOGO]
+        siguiente = codificar_cursor(SIGUIENTE, numero + 1, docs[-1]["Name"], docs[-1]["BGGId"])
+    return JsonResponse({"pagina": numero, "juegos": docs, "siguiente": siguiente})
+
+
+def _catalogo_sync(cursor):
+    # Sin cliente asíncrono el mismo keyset sale de la instantánea en memoria
+    datos = decodificar_cursor(cursor)
+    if datos and datos["d"] == SIGUIENTE:
+        juegos, numero = obtener_catalogo().siguientes(datos["n"], datos["id"], TAM_PAGINA_CATALOGO + 1), datos["p"]
+    else:
+        juegos, numero = obtener_catalogo().siguientes(None, None, TAM_PAGINA_CATALOGO + 1), 1
+    docs = [{campo: getattr(juego, campo) for campo, incluir in CAMPOS_CATALOGO.items() if incluir}
+            for juego in juegos]
+    return _respuesta_catalogo(docs, numero)
+
+
+def _estadisticas_sync():
+    return JsonResponse(calcular_estadisticas(connections['mongodb'].database, "agregado"))
+
+
+@login_required(login_url='login/')
+async def obtener_valoracion_async(request, game_id):
+    db = base_async(request)
+    if db is None:
+        return await sync_to_async(obtener_valoracion)(request, game_id)
+
+    usuario = await request.auser()
+    val = await db.valoraciones.find_one(
+        {"game_id": int(game_id), "usuario": usuario.nombre},
+        {"_id": 0, "estrellas": 1, "comentario": 1}
+    )
+    if val:
+        return JsonResponse({
+            "existe": True,
+            "estrellas": val.get("estrellas", 0),
+            "comentario": val.get("comentario", "")
+        })
+    return JsonResponse({"existe": False})
+
+
+@login_required(login_url='login/')
+async def obtener_comentarios_juego_async(request, game_id):
+    db = base_async(request)
+    if db is None:
+        return await sync_to_async(obtener_comentarios_juego)(request, game_id)
+
+    return _respuesta_con_etag(request, await pagina_comentarios_async(db, int(game_id), request.GET))
+
+
+@login_required(login_url='login/')
+async def estadisticas_async(request):
+    # Mismos datos que /estadisticas/ (backend "agregado") en JSON
+    db = base_async(request)
+    if db is None:
+        return await sync_to_async(_estadisticas_sync)()
+    return JsonResponse(await estadisticas_desde_agregado_async(db))
+
+
+@login_required(login_url='login/')
+async def catalogo_async(request):
+    # Catálogo por cursor (Name, BGGId) en JSON, sin contar el total
+    cursor = request.GET.get("cursor")
+    db = base_async(request)
+    if db is None:
+        return await sync_to_async(_catalogo_sync)(cursor)
+
+    filtro, numero = _filtro_catalogo(cursor)
+    docs = await (db.games.find(filtro, CAMPOS_CATALOGO).sort([("Name", 1), ("BGGId", 1)])
+                  .limit(TAM_PAGINA_CATALOGO + 1).to_list(None))
+    return _respuesta_catalogo(docs, numero)